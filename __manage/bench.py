@@ -0,0 +1,311 @@
+"""
+Benchmarks for ``yamicache``.
+
+``python manage.py bench run`` runs the suite and writes the results to a JSON
+file; ``python manage.py bench compare old.json new.json`` shows the change
+of each result between two runs.
+
+Each benchmark returns a ``dict`` of results.  The unit is part of the name:
+results ending in ``_usec`` or ``_msec`` are times (lower is better), results
+ending in ``_per_sec`` are rates (higher is better), and results ending in
+``_bytes`` are sizes.
+"""
+
+# Imports #####################################################################
+import os
+import sys
+import json
+import time
+import shutil
+import timeit
+import platform
+import tempfile
+import itertools
+import threading
+import collections
+
+import click
+
+from yamicache import Cache, __version__
+
+
+# Globals #####################################################################
+REPEAT = 5
+BENCHMARKS = collections.OrderedDict()  # name: function(scale)
+
+
+def benchmark(function):
+    """Add ``function`` to the suite"""
+    BENCHMARKS[function.__name__[len("bench_"):]] = function
+    return function
+
+
+def function1(argument, power=4, addition=0, division=2):
+    return argument ** power + addition / division
+
+
+def function2(a, b, c, d, e, f, g, h):
+    return a
+
+
+def function3(*args, **kwargs):
+    return args
+
+
+def best_usec(func, number):
+    """Return the best time of ``func()`` in microseconds"""
+    timer = timeit.Timer(func)
+    return min(timer.repeat(repeat=REPEAT, number=number)) / number * 1e6
+
+
+def best_msec(func, setup, repeat=REPEAT):
+    """
+    Return the best time of ``func(setup())`` in milliseconds.  ``setup()``
+    isn't timed.
+    """
+    times = []
+    for _ in range(repeat):
+        argument = setup()
+        start = time.perf_counter()
+        func(argument)
+        times.append(time.perf_counter() - start)
+    return min(times) * 1e3
+
+
+@benchmark
+def bench_hit_latency(scale):
+    """The time of a cache hit, compared to calling the function"""
+    number = int(100000 * scale)
+    results = {"uncached_usec": best_usec(lambda: function1(1, 4, addition=0), number)}
+
+    for name, kwargs in [
+        ("hit_usec", {}),
+        ("hit_tuple_keys_usec", {"tuple_keys": True}),
+        ("hit_max_entries_usec", {"max_entries": 1000}),
+        ("hit_shards_usec", {"shards": 16}),
+    ]:
+        c = Cache(**kwargs)
+        cached = c.cached()(function1)
+        cached(1, 4, addition=0)  # Make sure the next calls are hits
+        results[name] = best_usec(lambda: cached(1, 4, addition=0), number)
+
+    return results
+
+
+@benchmark
+def bench_miss_overhead(scale):
+    """The time of a cache miss (key, lookup, and store) minus the function"""
+    number = int(20000 * scale)
+    results = {}
+    uncached = best_usec(lambda: function1(1, 4, addition=0), number)
+
+    for name, kwargs in [
+        ("miss_usec", {}),
+        ("miss_tuple_keys_usec", {"tuple_keys": True}),
+        ("miss_evict_usec", {"max_entries": 1000}),
+    ]:
+        c = Cache(**kwargs)
+        cached = c.cached()(function1)
+        counter = itertools.count()  # Every call is a new key
+        results[name] = (
+            best_usec(lambda: cached(next(counter), 4, addition=0), number) - uncached
+        )
+
+    return results
+
+
+@benchmark
+def bench_key_shapes(scale):
+    """The time to calculate the key for different arguments"""
+    number = int(20000 * scale)
+    shapes = [
+        ("int", function1, (1,), {}),
+        ("ints", function2, (1, 2, 3, 4, 5, 6, 7, 8), {}),
+        ("kwargs", function1, (1,), {"power": 2, "addition": 3, "division": 4}),
+        ("string", function1, ("x" * 1000,), {}),
+        ("nested", function1, ([1, (2, 3), [4, [5, 6]]],), {}),
+        ("dict", function1, ({"a": 1, "b": [2, 3], "c": {"d": 4}},), {}),
+        ("bytes_1mb", function1, (b"x" * (1 << 20),), {}),
+        # `*args` functions can't use the pre-calculated key builder
+        ("varargs", function3, (1, 2, 3), {"power": 2}),
+    ]
+
+    results = {}
+    for mode, kwargs in [("repr", {}), ("tuple", {"tuple_keys": True})]:
+        c = Cache(**kwargs)
+        for name, function, args, call_kwargs in shapes:
+            calculate_key = c._key_builder(function)
+            results["%s_%s_usec" % (mode, name)] = best_usec(
+                lambda: calculate_key(args, call_kwargs),
+                max(1, number // 100) if name == "bytes_1mb" else number,
+            )
+
+    return results
+
+
+@benchmark
+def bench_collect(scale):
+    """The time of ``collect()`` as the cache grows"""
+    results = {}
+    for size in [1000, 10000, 100000]:
+        size = max(100, int(size * scale))
+
+        def fill(expired):
+            # `expired` of every 10 items time out right away
+            c = Cache()
+            for index in range(size):
+                timeout = 0.001 if (index % 10) < expired else 3600
+                c[index] = c._new_item(index, timeout)
+            time.sleep(0.01)
+            return c
+
+        results["collect_none_%i_msec" % size] = best_msec(
+            lambda c: c.collect(), lambda: fill(0)
+        )
+        results["collect_10pct_%i_msec" % size] = best_msec(
+            lambda c: c.collect(), lambda: fill(1)
+        )
+
+    return results
+
+
+@benchmark
+def bench_thread_scaling(scale):
+    """Cache hits per second as the number of threads grows"""
+    calls_per_thread = int(20000 * scale)
+    num_keys = 1000
+    results = {}
+
+    for shards in [1, 16]:
+        for num_threads in [1, 2, 4, 8]:
+            c = Cache(shards=shards, max_entries=num_keys * 2)
+
+            @c.cached()
+            def square(value):
+                return value ** 2
+
+            for value in range(num_keys):
+                square(value)
+
+            barrier = threading.Barrier(num_threads + 1)
+
+            def target(offset):
+                barrier.wait()
+                for index in range(calls_per_thread):
+                    square((index + offset) % num_keys)
+
+            threads = [
+                threading.Thread(target=target, args=(x * 37,))
+                for x in range(num_threads)
+            ]
+            [x.start() for x in threads]
+
+            barrier.wait()
+            start = time.perf_counter()
+            [x.join() for x in threads]
+            elapsed = time.perf_counter() - start
+
+            results["shards_%i_threads_%i_per_sec" % (shards, num_threads)] = (
+                num_threads * calls_per_thread
+            ) / elapsed
+
+    return results
+
+
+@benchmark
+def bench_serialize(scale):
+    """Items per second written by ``serialize()`` and read by ``deserialize()``"""
+    size = max(100, int(100000 * scale))
+    directory = tempfile.mkdtemp()
+    filename = os.path.join(directory, "cache.pkl")
+
+    try:
+        c = Cache()
+        for index in range(size):
+            c[str(index)] = c._new_item({"index": index, "name": "x" * 32}, 3600)
+
+        write = best_msec(lambda c: c.serialize(filename), lambda: c, repeat=3)
+        read = best_msec(lambda c: c.deserialize(filename), Cache, repeat=3)
+
+        return {
+            "serialize_per_sec": size / write * 1e3,
+            "deserialize_per_sec": size / read * 1e3,
+            "file_bytes": os.path.getsize(filename),
+        }
+    finally:
+        shutil.rmtree(directory)
+
+
+def run_suite(names=None, scale=1.0):
+    """Run the benchmarks in ``names`` (default: all), and return the results"""
+    results = collections.OrderedDict()
+    for name, function in BENCHMARKS.items():
+        if names and (name not in names):
+            continue
+
+        click.echo("running %s..." % name)
+        results[name] = function(scale)
+
+    return {
+        "meta": {
+            "yamicache": __version__,
+            "python": sys.version.split()[0],
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "scale": scale,
+        },
+        "results": results,
+    }
+
+
+def format_value(value):
+    return ("%.0f" % value) if value >= 1000 else ("%.3f" % value)
+
+
+def run_bench(output, only, quick):
+    """Run the benchmark suite and write the results as JSON"""
+    unknown = set(only) - set(BENCHMARKS)
+    if unknown:
+        click.echo("unknown benchmarks: %s" % ", ".join(sorted(unknown)))
+        click.echo("choose from: %s" % ", ".join(BENCHMARKS))
+        raise click.Abort()
+
+    data = run_suite(only, 0.1 if quick else 1.0)
+    for name, results in data["results"].items():
+        click.echo(name)
+        for key, value in results.items():
+            click.echo("    %-32s %12s" % (key, format_value(value)))
+
+    with open(output, "w") as fh:
+        json.dump(data, fh, indent=2)
+    click.echo("...results written to %s" % output)
+
+
+def compare_bench(old, new):
+    """Compare the results of two benchmark runs"""
+    with open(old) as fh:
+        old_data = json.load(fh)
+    with open(new) as fh:
+        new_data = json.load(fh)
+
+    for key in ["yamicache", "python", "platform", "scale"]:
+        before, after = old_data["meta"].get(key), new_data["meta"].get(key)
+        if before != after:
+            click.echo("WARNING: %s differs: %s -> %s" % (key, before, after))
+
+    for name, results in new_data["results"].items():
+        old_results = old_data["results"].get(name, {})
+        click.echo(name)
+        for key, value in results.items():
+            before = old_results.get(key)
+            if before is None:
+                click.echo("    %-32s %12s %12s" % (key, "-", format_value(value)))
+                continue
+
+            change = ((value - before) / before * 100) if before else 0.0
+            click.echo(
+                "    %-32s %12s %12s %+8.1f%%"
+                % (key, format_value(before), format_value(value), change)
+            )
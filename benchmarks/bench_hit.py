@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""
+Measure the latency of a cache hit, and its overhead compared to calling the
+function without the cache.
+
+Run from the project root::
+
+    python benchmarks/bench_hit.py
+"""
+
+# Imports #####################################################################
+import timeit
+from yamicache import Cache
+
+
+# Globals #####################################################################
+NUMBER = 100000
+REPEAT = 5
+
+
+def function1(argument, power=4, addition=0, division=2):
+    return argument ** power + addition / division
+
+
+def best_usec(func):
+    timer = timeit.Timer(lambda: func(1, 4, addition=0))
+    return min(timer.repeat(repeat=REPEAT, number=NUMBER)) / NUMBER * 1e6
+
+
+def bench(**kwargs):
+    c = Cache(**kwargs)
+    cached = c.cached()(function1)
+    cached(1, 4, addition=0)  # Make sure the next calls are hits
+    return best_usec(cached)
+
+
+def main():
+    uncached = best_usec(function1)
+    print("%-32s : %.2f usec per call" % ("uncached", uncached))
+
+    for kwargs in [
+        {"hashing": True},
+        {"hashing": False},
+        {"hashing": False, "max_entries": 1000},
+        {"tuple_keys": True},
+    ]:
+        name = ", ".join("%s=%s" % x for x in kwargs.items())
+        hit = bench(**kwargs)
+        print(
+            "%-32s : %.2f usec per hit (%.2f usec overhead)"
+            % (name, hit, hit - uncached)
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""
+Compare the hit ratio of the eviction policies.
+
+The trace is a Zipf-distributed workload with a one-time *scan* of keys that
+are never used again (e.g. a nightly batch job) in the middle.
+
+Run from the project root::
+
+    python benchmarks/bench_policy.py
+"""
+
+# Imports #####################################################################
+import random
+import itertools
+from yamicache import Cache
+
+
+# Globals #####################################################################
+NUM_KEYS = 100000
+CAPACITY = 1000
+ZIPF_S = 0.9
+ZIPF_REQUESTS = 200000
+SCAN_KEYS = 50000
+
+
+def zipf_trace(count, rng):
+    weights = [1.0 / (rank ** ZIPF_S) for rank in range(1, NUM_KEYS + 1)]
+    cum_weights = list(itertools.accumulate(weights))
+    return rng.choices(range(NUM_KEYS), cum_weights=cum_weights, k=count)
+
+
+def traces():
+    rng = random.Random(42)
+    zipf = zipf_trace(ZIPF_REQUESTS, rng)
+    scan = list(range(NUM_KEYS, NUM_KEYS + SCAN_KEYS))
+    half = len(zipf) // 2
+
+    return {
+        "zipf": zipf,
+        "zipf+scan": zipf[:half] + scan + zipf[half:],
+    }
+
+
+def hit_ratio(policy, trace):
+    c = Cache(max_entries=CAPACITY, policy=policy)
+    misses = [0]
+
+    @c.cached()
+    def lookup(key):
+        misses[0] += 1
+        return key
+
+    for key in trace:
+        lookup(key)
+
+    return 1 - (misses[0] / len(trace))
+
+
+def main():
+    print("capacity=%i, keys=%i" % (CAPACITY, NUM_KEYS))
+    for name, trace in traces().items():
+        for policy in ["lru", "tinylfu"]:
+            ratio = hit_ratio(policy, trace)
+            print("%-10s %-8s hit ratio: %.3f" % (name, policy, ratio))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""
+Measure cache hit throughput as the number of threads grows, with and
+without sharding.
+
+Run from the project root::
+
+    python benchmarks/bench_threads.py
+"""
+
+# Imports #####################################################################
+import time
+import threading
+from yamicache import Cache
+
+
+# Globals #####################################################################
+THREADS = [1, 2, 4, 8, 16, 32]
+SHARDS = [1, 16]
+CALLS_PER_THREAD = 20000
+NUM_KEYS = 1000
+
+
+def throughput(num_threads, shards):
+    c = Cache(shards=shards, max_entries=NUM_KEYS * 2)
+
+    @c.cached()
+    def square(value):
+        return value ** 2
+
+    for value in range(NUM_KEYS):
+        square(value)
+
+    barrier = threading.Barrier(num_threads + 1)
+
+    def target(offset):
+        barrier.wait()
+        for index in range(CALLS_PER_THREAD):
+            square((index + offset) % NUM_KEYS)
+
+    threads = [
+        threading.Thread(target=target, args=(x * 37,)) for x in range(num_threads)
+    ]
+    [x.start() for x in threads]
+
+    barrier.wait()
+    tstart = time.perf_counter()
+    [x.join() for x in threads]
+    elapsed = time.perf_counter() - tstart
+
+    return (num_threads * CALLS_PER_THREAD) / elapsed
+
+
+def main():
+    print("%8s " % "threads" + " ".join("%12s" % ("shards=%i" % x) for x in SHARDS))
+    for num_threads in THREADS:
+        results = [throughput(num_threads, shards) for shards in SHARDS]
+        print("%8i " % num_threads + " ".join("%10.0f/s" % x for x in results))
+
+
+if __name__ == "__main__":
+    main()
@@ -15,6 +15,7 @@ import requests
 # import SimpleHTTPServer
 from pkg_resources import parse_version
 from __manage import run_command
+from __manage.bench import BENCHMARKS, run_bench, compare_bench
 from __manage.docs import serve_docs, build_docs, clean_docs
 from __manage.version import show_versions, rev_version, tag_version
 
@@ -165,6 +166,34 @@ add_command("serve", serve_docs, docs_group)
 add_command("clean", clean_docs, docs_group)
 cli.add_command(docs_group)
 
+bench_group = click.Group("bench", help="Performance benchmarks")
+add_command(
+    "run",
+    run_bench,
+    bench_group,
+    params=[
+        click.Option(
+            ("--output", "-o"),
+            default="bench.json",
+            show_default=True,
+            help="The JSON file to write the results to",
+        ),
+        click.Option(
+            ("--only",),
+            multiple=True,
+            help="Only run this benchmark (%s)" % ", ".join(BENCHMARKS),
+        ),
+        click.Option(("--quick",), is_flag=True, help="Run fewer iterations"),
+    ],
+)
+add_command(
+    "compare",
+    compare_bench,
+    bench_group,
+    params=[click.Argument(("old",)), click.Argument(("new",))],
+)
+cli.add_command(bench_group)
+
 ver_group = click.Group("ver", help="Version control")
 add_command("show", show_versions, ver_group)
 add_command("rev", rev_version, ver_group)
@@ -0,0 +1,118 @@
+from __future__ import print_function
+import time
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from yamicache import Cache
+
+
+def test_min_compute_time():
+    c = Cache()
+    calls = []
+
+    @c.cached(min_compute_time=0.02)
+    def lookup(delay):
+        calls.append(delay)
+        time.sleep(delay)
+        return delay
+
+    lookup(0)
+    lookup(0)
+    lookup(0.03)
+    lookup(0.03)
+
+    assert calls == [0, 0, 0.03]
+    assert len(c) == 1
+    assert lookup.stats.rejections == 2
+    assert lookup.stats.misses == 3
+
+
+def test_max_value_size():
+    c = Cache(sizer=len)
+
+    @c.cached(max_value_size=10)
+    def text(length):
+        return "x" * length
+
+    text(5)
+    text(50)
+
+    assert len(c) == 1
+    assert text.stats.rejections == 1
+    assert c.total_bytes == 5
+
+
+def test_admit():
+    c = Cache()
+
+    @c.cached(admit=lambda result: result is not None)
+    def find(key):
+        return {"a": 1}.get(key)
+
+    assert find("a") == 1
+    assert find("b") is None
+
+    assert len(c) == 1
+    assert c.stats()[find.stats.name].rejections == 1
+
+
+def test_map():
+    c = Cache()
+
+    @c.cached(admit=lambda result: result % 2 == 0)
+    def identity(x):
+        return x
+
+    assert identity.map(range(4)) == [0, 1, 2, 3]
+    assert len(c) == 2
+    assert identity.stats.rejections == 2
+
+
+def test_map_executor():
+    """Calls that run in parallel are timed one at a time"""
+    c = Cache()
+
+    @c.cached(min_compute_time=0.05)
+    def slow(x):
+        time.sleep(0.1)
+        return x
+
+    with ThreadPoolExecutor(8) as executor:
+        assert slow.map(range(8), executor=executor) == list(range(8))
+
+    assert len(c) == 8
+    assert slow.stats.rejections == 0
+    assert slow.stats.compute_time >= 0.8
+
+
+def test_stale_result_removed():
+    """A refresh that fails admission doesn't leave the stale item behind"""
+    c = Cache(default_timeout=0.01, stale_ttl=10)
+    results = [1, None]
+
+    @c.cached(admit=lambda result: result is not None)
+    def lookup():
+        return results.pop(0)
+
+    assert lookup() == 1
+    time.sleep(0.02)
+    assert lookup() == 1  # Stale, and refreshed in the background
+
+    for _ in range(100):
+        if not len(c):
+            break
+        time.sleep(0.01)
+    assert len(c) == 0
+    c.close()
+
+
+def test_invalid():
+    c = Cache()
+
+    with pytest.raises(ValueError):
+        c.cached(min_compute_time=-1)
+
+    with pytest.raises(ValueError):
+        c.cached(max_value_size=1.5)
+
+    with pytest.raises(ValueError):
+        c.cached(admit=True)
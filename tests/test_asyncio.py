@@ -0,0 +1,154 @@
+from __future__ import print_function
+import time
+import asyncio
+import pytest
+from yamicache import Cache
+
+
+def test_coroutine():
+    """The result is cached, not the coroutine"""
+    c = Cache()
+    calls = []
+
+    @c.cached()
+    async def square(value):
+        calls.append(value)
+        await asyncio.sleep(0)
+        return value ** 2
+
+    async def main():
+        assert await square(2) == 4
+        assert await square(2) == 4
+        assert await square(3) == 9
+
+    asyncio.run(main())
+    assert calls == [2, 3]
+    assert len(c) == 2
+    assert asyncio.iscoroutinefunction(square)
+
+
+def test_single_flight():
+    c = Cache()
+    calls = []
+
+    @c.cached()
+    async def slow(value):
+        calls.append(value)
+        await asyncio.sleep(0.1)
+        return value * 2
+
+    async def main():
+        return await asyncio.gather(*[slow(4) for _ in range(20)])
+
+    assert asyncio.run(main()) == [8] * 20
+    assert len(calls) == 1
+    assert not c._async_flights
+
+
+def test_exception():
+    c = Cache()
+    calls = []
+
+    @c.cached()
+    async def broken():
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        raise RuntimeError("broken")
+
+    async def main():
+        return await asyncio.gather(
+            *[broken() for _ in range(5)], return_exceptions=True
+        )
+
+    results = asyncio.run(main())
+    assert all(isinstance(x, RuntimeError) for x in results)
+    assert len(calls) == 1
+    assert not c._async_flights
+    assert len(c) == 0
+
+
+def test_cancelled_leader():
+    """Waiters retry when the leader is cancelled"""
+    c = Cache()
+    calls = []
+
+    @c.cached()
+    async def slow():
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        return len(calls)
+
+    async def main():
+        leader = asyncio.ensure_future(slow())
+        await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(slow())
+        await asyncio.sleep(0)
+        leader.cancel()
+        return await waiter
+
+    assert asyncio.run(main()) == 2
+    assert not c._async_flights
+
+
+def test_flight_timeout():
+    c = Cache(flight_timeout=0.05)
+    calls = []
+
+    @c.cached()
+    async def slow():
+        calls.append(1)
+        await asyncio.sleep(0.2)
+        return 1
+
+    async def main():
+        return await asyncio.gather(slow(), slow())
+
+    assert asyncio.run(main()) == [1, 1]
+    assert len(calls) == 2
+
+
+def test_stale():
+    c = Cache(stale_ttl=10)
+    calls = []
+
+    @c.cached(timeout=1)
+    async def func():
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        return len(calls)
+
+    async def main():
+        assert await func() == 1
+        await asyncio.sleep(1.1)
+
+        tstart = time.time()
+        assert await func() == 1
+        assert await func() == 1
+        assert time.time() - tstart < 0.1
+
+        await asyncio.sleep(0.3)
+        assert await func() == 2
+
+    asyncio.run(main())
+    assert len(calls) == 2
+
+
+def test_async_gc():
+    c = Cache()
+
+    @c.cached(timeout=1)
+    async def func():
+        return 1
+
+    async def main():
+        task = c.start_async_gc(0.1)
+        await func()
+        assert len(c) == 1
+        await asyncio.sleep(1.5)
+        assert len(c) == 0
+        task.cancel()
+
+    asyncio.run(main())
+
+    with pytest.raises(ValueError):
+        c.start_async_gc()
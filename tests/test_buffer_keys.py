@@ -0,0 +1,142 @@
+from __future__ import print_function
+import array
+import pytest
+from yamicache import Cache
+from yamicache.yamicache import BufferDigest, _buffer_digest
+
+c = Cache(hashing=False)
+t = Cache(tuple_keys=True)
+
+
+@c.cached()
+def total(data):
+    return sum(memoryview(data).cast("B"))
+
+
+@t.cached()
+def tuple_total(data):
+    return sum(memoryview(data).cast("B"))
+
+
+def setup_function(function):
+    c.clear()
+    t.clear()
+
+
+def test_digest():
+    digest = _buffer_digest(b"abc")
+    assert isinstance(digest, BufferDigest)
+    assert digest.type == "bytes"
+    assert digest.shape == (3,)
+    assert digest == _buffer_digest(bytearray(b"abc"))._replace(type="bytes")
+    assert digest != _buffer_digest(b"abd")
+
+
+def test_format():
+    # Same bytes, different item format
+    assert _buffer_digest(array.array("b", [1, 2])) != _buffer_digest(
+        array.array("B", [1, 2])
+    )
+
+
+def test_non_contiguous():
+    data = bytearray(range(10))
+    view = memoryview(data)[::2]
+    assert not view.c_contiguous
+    assert _buffer_digest(view).digest == _buffer_digest(bytes(view)).digest
+    assert _buffer_digest(view) != _buffer_digest(bytes(view))
+
+
+@pytest.mark.parametrize("cache, func", [(c, total), (t, tuple_total)])
+def test_cached(cache, func):
+    data = bytearray(10000)
+    assert func(data) == 0
+    assert func(bytearray(10000)) == 0
+    assert len(cache) == 1
+
+    # Same length and repr prefix; must not collide
+    data[-1] = 1
+    assert func(data) == 1
+    assert len(cache) == 2
+
+    assert func(memoryview(data)) == 1
+    assert len(cache) == 3
+
+    # The key doesn't contain the data
+    for key in cache.keys():
+        assert len(repr(key)) < 500
+
+
+def test_numpy():
+    numpy = pytest.importorskip("numpy")
+
+    a = numpy.zeros(10000)
+    b = numpy.zeros(10000)
+    b[5000] = 1
+    assert repr(a) == repr(b)
+    assert total(a) == 0
+    assert total(b) == sum(b.tobytes())
+    assert len(c) == 2
+
+    assert _buffer_digest(a).format == "float64"
+    assert _buffer_digest(a.reshape(100, 100)) != _buffer_digest(a)
+    assert _buffer_digest(a.reshape(100, 100).T) != _buffer_digest(
+        a.reshape(100, 100)
+    )
+
+
+@c.cached()
+def first_total(items):
+    return sum(memoryview(items[0]["data"]).cast("B"))
+
+
+@t.cached()
+def tuple_first_total(items):
+    return sum(memoryview(items[0]["data"]).cast("B"))
+
+
+@pytest.mark.parametrize("cache, func", [(c, first_total), (t, tuple_first_total)])
+def test_nested(cache, func):
+    """Buffers inside lists and dicts are digested too"""
+    data = bytearray(10000)
+    assert func([{"data": data}]) == 0
+    assert func([{"data": bytearray(10000)}]) == 0
+    assert len(cache) == 1
+
+    data[-1] = 1
+    assert func([{"data": data}]) == 1
+    assert len(cache) == 2
+
+    for key in cache.keys():
+        assert len(repr(key)) < 500
+
+
+@pytest.mark.parametrize("cache", [c, t])
+def test_not_exported(cache):
+    """Objects that refuse to export a buffer are keyed by their repr()"""
+
+    @cache.cached()
+    def describe(data):
+        return repr(data)
+
+    view = memoryview(b"abc")
+    view.release()
+    assert describe(view) == repr(view)
+    assert describe(view) == repr(view)
+
+    # Other objects of the same type are still digested
+    assert describe(memoryview(b"abc")).startswith("<memory")
+
+
+def test_numpy_datetime():
+    numpy = pytest.importorskip("numpy")
+
+    @c.cached()
+    def count(array):
+        return len(array)
+
+    assert count(numpy.zeros(10)) == 10
+    dates = numpy.array(["2020-01-01", "2020-01-02"], dtype="datetime64[D]")
+    assert count(dates) == 2
+    assert count(dates) == 2
+    assert count(numpy.zeros(20)) == 20
@@ -0,0 +1,95 @@
+from __future__ import print_function
+import time
+from yamicache import Cache
+from yamicache import yamicache as yc
+
+
+def add(c, key, value, timeout):
+    c[key] = c._new_item(value, timeout)
+
+
+def test_only_expired():
+    c = Cache()
+    for index in range(100):
+        add(c, "short%i" % index, index, 0.1)
+        add(c, "long%i" % index, index, 100)
+        add(c, "forever%i" % index, index, None)
+
+    # Items without a timeout aren't indexed
+    assert len(c._shards[0].expiry_heap) == 200
+
+    time.sleep(0.2)
+    c.collect()
+
+    assert len(c) == 200
+    assert not any(key.startswith("short") for key in c.keys())
+    assert len(c._shards[0].expiry_heap) == 100
+
+
+def test_replaced():
+    """Old index entries don't remove an item that was cached again"""
+    c = Cache()
+    add(c, "key", 1, 0.1)
+    add(c, "key", 2, 100)
+    time.sleep(0.2)
+    c.collect()
+
+    assert c["key"].value == 2
+    assert len(c._shards[0].expiry_heap) == 1
+
+
+def test_removed():
+    """The index doesn't grow without bound when items are removed"""
+    c = Cache()
+    for index in range(1000):
+        add(c, "key", index, 100)
+        add(c, "other%i" % index, index, 100)
+        del c["other%i" % index]
+
+    assert len(c) == 1
+    assert len(c._shards[0].expiry_heap) <= 2 * len(c) + 64 + 1
+
+    c.clear()
+    assert not c._shards[0].expiry_heap
+
+
+def test_batches(monkeypatch):
+    monkeypatch.setattr(yc, "COLLECT_BATCH_SIZE", 3)
+    c = Cache()
+    for index in range(10):
+        add(c, index, index, 0.1)
+
+    time.sleep(0.2)
+    c.collect()
+    assert len(c) == 0
+    assert not c._shards[0].expiry_heap
+
+
+def test_since():
+    c = Cache()
+    add(c, "old", 1, None)
+    time.sleep(1.1)
+    since = time.time()
+    time.sleep(0.1)
+    add(c, "new", 1, None)
+
+    c.collect(since=since)
+    assert list(c.keys()) == ["old"]
+
+
+def test_store_len():
+    """Timed inserts don't count the items of a store, which can be slow"""
+
+    class Store(dict):
+        lens = 0
+
+        def __len__(self):
+            Store.lens += 1
+            return dict.__len__(self)
+
+    c = Cache(store=Store())
+    for index in range(1000):
+        add(c, "key", index, 100)
+
+    assert Store.lens == 0
+    assert len(c._shards[0].expiry_heap) <= 2 + 64 + 1
@@ -0,0 +1,135 @@
+from __future__ import print_function
+import json
+import time
+import zlib
+import pickle
+import pytest
+from yamicache import Cache
+from yamicache.compression import CompressedValue, CompressionStats
+
+c = Cache(hashing=False, compress_threshold=1000)
+
+
+@c.cached()
+def blob(size):
+    return {"data": "x" * size}
+
+
+@c.cached(compress_threshold=0)
+def small(value):
+    return [value] * 20
+
+
+@c.cached(key="large")
+def other():
+    return "y" * 2000
+
+
+class Reverse(object):
+    name = "reverse"
+
+    def compress(self, data):
+        return zlib.compress(data)[::-1]
+
+    def decompress(self, data):
+        return zlib.decompress(data[::-1])
+
+
+def setup_function(function):
+    c.clear()
+
+
+def test_threshold():
+    assert blob(10) == {"data": "x" * 10}
+    assert blob(10000) == {"data": "x" * 10000}
+
+    stats = c.compression_stats()
+    assert list(stats) == [c._key_builder(blob.__wrapped__)((10000,), {})]
+    stats = list(stats.values())[0]
+    assert isinstance(stats, CompressionStats)
+    assert stats.raw_bytes > 10000
+    assert stats.compressed_bytes < 1000
+
+    # Hits are decompressed
+    assert blob(10000) == {"data": "x" * 10000}
+    assert blob(10000) is not blob(10000)
+
+
+def test_decorator_threshold():
+    assert small(1) == [1] * 20
+    assert small(1) == [1] * 20
+    assert len(c.compression_stats()) == 1
+
+    # Keyed functions use the cache setting too
+    assert other() == "y" * 2000
+    assert type(c["large"].value) is CompressedValue
+
+
+def test_incompressible():
+    d = Cache(compress_threshold=0)
+
+    @d.cached()
+    def data():
+        return bytes(range(256))
+
+    data()
+    assert not d.compression_stats()
+
+
+def test_codecs():
+    for codec in ("lzma", Reverse()):
+        d = Cache(compress_threshold=0, codec=codec)
+
+        @d.cached()
+        def text():
+            return "z" * 1000
+
+        assert text() == "z" * 1000
+        assert text() == "z" * 1000
+        item = d.values()[0]
+        assert type(item.value) is CompressedValue
+        assert item.value.codec in ("lzma", "reverse")
+
+
+def test_serialize(tmpdir):
+    filename = str(tmpdir.join("cache.db"))
+    blob(10000)
+    c.serialize(filename)
+    assert len(open(filename, "rb").read()) < 1000
+
+    d = Cache(hashing=False)
+    d.deserialize(filename)
+    assert d._value_of(d.values()[0]) == {"data": "x" * 10000}
+    assert json.loads(d.dump())
+
+
+def test_stale():
+    d = Cache(compress_threshold=0, default_timeout=0.01, stale_ttl=60)
+
+    @d.cached()
+    def text():
+        return "z" * 1000
+
+    text()
+    time.sleep(0.02)
+    assert text() == "z" * 1000
+    d.close()
+
+
+def test_errors():
+    with pytest.raises(ValueError):
+        Cache(compress_threshold=-1)
+
+    with pytest.raises(ValueError):
+        Cache(codec="missing")
+
+    with pytest.raises(ValueError):
+        Cache(codec=object())
+
+    with pytest.raises(ValueError):
+        c.cached(compress_threshold="1")
+
+
+def test_pickle():
+    value = CompressedValue("zlib", b"data", 10)
+    assert pickle.loads(pickle.dumps(value)) == value
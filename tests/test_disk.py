@@ -0,0 +1,197 @@
+from __future__ import print_function
+import os
+import time
+import pytest
+from yamicache import Cache
+from yamicache.disk import DiskTier
+
+
+@pytest.fixture
+def directory(tmpdir):
+    return str(tmpdir.join("l2"))
+
+
+def test_tier(directory):
+    tier = DiskTier(directory, index_slots=8)
+    for x in range(100):
+        assert tier.put(("key", x), x * 2)
+    assert len(tier) == 100
+
+    # The index grew
+    assert tier._slots > 100
+
+    assert tier.get(("key", 5)) == 10
+    assert tier.pop(("key", 5)) == 10
+    assert tier.get(("key", 5)) is None
+    assert tier.get(("key", 5), "missing") == "missing"
+    assert len(tier) == 99
+
+    tier.put(("key", 6), "new")
+    assert tier.get(("key", 6)) == "new"
+    assert len(tier) == 99
+
+    tier.discard(("key", 6))
+    assert len(tier) == 98
+    assert not tier.put("key", lambda: 1)
+
+    tier.close()
+
+    # Reopen
+    tier = DiskTier(directory)
+    assert len(tier) == 98
+    assert tier.get(("key", 7)) == 14
+    tier.clear()
+    assert len(tier) == 0
+    assert tier.get(("key", 7)) is None
+    tier.close()
+
+
+def test_max_bytes(directory):
+    tier = DiskTier(directory, max_bytes=10000)
+    for x in range(1000):
+        tier.put(x, b"x" * 100)
+        assert tier.total_bytes <= 10000
+
+    # The oldest items were dropped
+    assert tier.get(0) is None
+    assert tier.get(999) == b"x" * 100
+    assert not tier.put("big", b"x" * 20000)
+    tier.close()
+
+
+def test_compact(directory):
+    tier = DiskTier(directory, segment_bytes=1000)
+    for x in range(50):
+        tier.put(x, b"x" * 100)
+    segments = len(tier._segments)
+    assert segments > 2
+
+    for x in range(40):
+        tier.discard(x)
+    tier.compact()
+    assert len(tier._segments) < segments
+    assert [tier.get(x) for x in range(40, 50)] == [b"x" * 100] * 10
+    assert len(os.listdir(directory)) == len(tier._segments) + 1
+    tier.close()
+
+
+def test_torn_record(directory):
+    tier = DiskTier(directory)
+    tier.put("key", "value")
+    tier.flush()
+    segment = tier._active_segment()
+    segment.file.truncate(segment.size - 1)
+    assert tier.get("key") is None
+    assert len(tier) == 0
+    tier.close()
+
+
+def test_cache(directory):
+    tier = DiskTier(directory)
+    c = Cache(max_entries=2, l2=tier)
+    calls = []
+
+    @c.cached()
+    def square(x):
+        calls.append(x)
+        return x * x
+
+    for x in range(5):
+        assert square(x) == x * x
+    assert len(c) == 2
+    assert len(tier) == 3
+
+    # Promoted instead of called
+    assert square(0) == 0
+    assert calls == list(range(5))
+    assert len(tier) == 3  # `0` was promoted, and another item was demoted
+    assert tier.get(c._key_builder(square.__wrapped__)((0,), {})) is None
+
+    c.clear()
+    assert len(tier) == 0
+    tier.close()
+
+
+def test_unlocked(directory):
+    """The tier isn't written while the shard is locked"""
+
+    class Tier(DiskTier):
+        def put(self, key, value):
+            assert not c._shards[0].lock.locked()
+            return DiskTier.put(self, key, value)
+
+        def discard(self, key):
+            assert not c._shards[0].lock.locked()
+            DiskTier.discard(self, key)
+
+    tier = Tier(directory)
+    c = Cache(max_entries=2, l2=tier)
+    for x in range(5):
+        c[x] = c._new_item(x, None)
+    c.set_many({x: x for x in range(5, 10)})
+    assert len(tier) == 8
+    tier.close()
+
+
+def test_map(directory):
+    tier = DiskTier(directory)
+    c = Cache(max_entries=2, l2=tier)
+    calls = []
+
+    @c.cached()
+    def square(x):
+        calls.append(x)
+        return x * x
+
+    assert square.map(range(5)) == [x * x for x in range(5)]
+    assert len(tier) == 3
+
+    # Promoted instead of called
+    assert square.map([0, 1, 0]) == [0, 1, 0]
+    assert calls == list(range(5))
+    assert square.stats.misses == 8
+    tier.close()
+
+
+def test_timeout(directory):
+    tier = DiskTier(directory)
+    c = Cache(max_entries=1, default_timeout=0.05, l2=tier)
+
+    @c.cached()
+    def square(x):
+        return x * x
+
+    square(1)
+    square(2)
+    assert len(tier) == 1
+    time.sleep(0.06)
+
+    # The demoted item timed out
+    key = c._key_builder(square.__wrapped__)((1,), {})
+    assert c._promote(key) is None
+    assert len(tier) == 0
+    tier.close()
+
+
+def test_set_and_delete(directory):
+    tier = DiskTier(directory)
+    c = Cache(max_entries=1, l2=tier)
+    c["a"] = c._new_item(1, None)
+    c["b"] = c._new_item(2, None)
+    assert tier.get("a").value == 1
+
+    # A newer value replaces the demoted one
+    c["a"] = c._new_item(3, None)
+    assert tier.get("a") is None
+    del c["a"]
+    c.pop("b", None)
+    assert len(tier) == 0
+    tier.close()
+
+
+def test_errors(directory):
+    with pytest.raises(ValueError):
+        DiskTier(directory, max_bytes=0)
+
+    with pytest.raises(ValueError):
+        DiskTier(directory, segment_bytes=0)
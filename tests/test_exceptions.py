@@ -4,7 +4,10 @@ from yamicache import Cache
 
 def test_object_creation():
     with pytest.raises(ValueError):
-        Cache(default_timeout=0.5)
+        Cache(default_timeout=-1)
+
+    with pytest.raises(ValueError):
+        Cache(default_timeout="1")
 
 
 def test_function():
@@ -12,6 +15,12 @@ def test_function():
 
     with pytest.raises(ValueError):
 
-        @c.cached(timeout=0.5)
+        @c.cached(timeout=-0.5)
         def t1():
             pass
+
+    with pytest.raises(ValueError):
+
+        @c.cached(timeout=True)
+        def t2():
+            pass
@@ -70,7 +70,7 @@ def test_gc2(cache_obj):
     with override_timeout(c, 3):
         cache_obj.test1(8, 0)
 
-    item_added = c._from_timestamp(list(c.values())[0].time_added)
+    item_added = c._to_epoch(list(c.values())[0].time_added)
 
     # Should be cached...
     assert len(c) == 1
@@ -0,0 +1,178 @@
+from __future__ import print_function
+import gc
+import threading
+import pytest
+from yamicache import Cache
+from yamicache.yamicache import InstanceKey
+
+c = Cache(hashing=False)
+
+
+class MyApp(object):
+    def __init__(self, id=1):
+        self.id = id
+        self.calls = 0
+
+    @c.cached(per_instance=True)
+    def test1(self, argument=1):
+        self.calls += 1
+        return argument * self.id
+
+    @c.cached(identity="id")
+    def test2(self, argument=1):
+        self.calls += 1
+        return argument * self.id
+
+
+class Slotted(object):
+    __slots__ = ("id",)
+
+    @c.cached(per_instance=True)
+    def test1(self):
+        return 1
+
+    @c.cached(identity="id")
+    def test2(self):
+        return self.id
+
+
+def setup_function(function):
+    c.clear()
+
+
+def test_per_instance():
+    app1, app2 = MyApp(2), MyApp(2)
+    assert app1.test1(3) == 6
+    assert app1.test1(3) == 6
+    assert app2.test1(3) == 6
+    assert (app1.calls, app2.calls) == (1, 1)
+    assert len(c) == 2
+
+    # The key doesn't depend on the object's address
+    for key in c.keys():
+        assert "0x" not in key
+
+
+def test_garbage_collected():
+    app1, app2 = MyApp(), MyApp()
+    app1.test1(1)
+    app1.test1(2)
+    app2.test1(1)
+    assert len(c) == 3
+
+    del app1
+    gc.collect()
+    c.collect()
+    assert len(c) == 1
+    assert len(c._owners) == 1
+
+    del app2
+    gc.collect()
+    MyApp().test1(1)  # Removes app2's items before it's called
+    assert len(c) == 1
+    assert len(c._owners) == 0
+
+
+def test_identity():
+    app1, app2 = MyApp(2), MyApp(2)
+    assert app1.test2(3) == 6
+    assert app2.test2(3) == 6
+    assert (app1.calls, app2.calls) == (1, 0)
+    assert len(c) == 1
+    assert MyApp(3).test2(3) == 9
+    assert len(c) == 2
+
+    # Items are shared, so they aren't removed with the objects
+    del app1, app2
+    gc.collect()
+    assert len(c) == 2
+
+
+def test_tuple_keys():
+    t = Cache(tuple_keys=True)
+
+    class Thing(object):
+        @t.cached(per_instance=True)
+        def test1(self, argument):
+            return argument
+
+    thing = Thing()
+    thing.test1(1)
+    key = t.keys()[0]
+    assert isinstance(key[2][1], InstanceKey)
+
+    del thing
+    gc.collect()
+    t.collect()
+    assert len(t) == 0
+
+
+def test_no_weakref():
+    obj = Slotted()
+    with pytest.raises(TypeError):
+        obj.test1()
+
+    obj.id = 5
+    assert obj.test2() == 5
+
+
+def test_errors():
+    with pytest.raises(ValueError):
+        c.cached(key="mykey", per_instance=True)
+
+    with pytest.raises(ValueError):
+        c.cached(per_instance=True, identity="id")
+
+
+def test_freed_while_locked():
+    """An object freed by an eviction, while the shard is locked, doesn't
+    deadlock"""
+    c = Cache(max_entries=1)
+
+    class Node(object):
+        @c.cached(per_instance=True)
+        def parent(self):
+            # The cached value is the only reference to the object
+            return {"parent": self}
+
+    def run():
+        node = Node()
+        node.parent()
+        del node
+        Node().parent()
+        Node().parent()
+
+    thread = threading.Thread(target=run)
+    thread.daemon = True
+    thread.start()
+    thread.join(5)
+    assert not thread.is_alive()
+
+    c.collect()
+    assert len(c) == 1
+    assert not c._dead_owners
+
+
+def test_owner_keys_bounded():
+    """Owners only keep the keys that are still cached"""
+    c = Cache(max_entries=10)
+
+    class Thing(object):
+        @c.cached(per_instance=True)
+        def square(self, x):
+            return x * x
+
+    thing = Thing()
+    for x in range(1000):
+        thing.square(x)
+        thing.square(x)
+    Thing.square.map([thing] * 100, range(1000, 1100))
+
+    owner = c._owners[id(thing)]
+    assert len(c) == 10
+    assert owner.keys == set(c.keys())
+    assert len(c._shards[0].owners) == 10
+
+    c.clear()
+    assert not owner.keys
+    assert not c._shards[0].owners
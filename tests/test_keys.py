@@ -0,0 +1,65 @@
+from __future__ import print_function
+import pytest
+from yamicache import Cache
+
+
+def function1(argument, power=4, addition=0, division=2):
+    return argument ** power + addition / division
+
+
+def function2(*args, **kwargs):
+    return args, kwargs
+
+
+def function3(argument, *, power=2):
+    return argument ** power
+
+
+CALLS = [
+    (function1, (1,), {}),
+    (function1, (1, 4), {}),
+    (function1, (1, 4, 0), {"division": 2}),
+    (function1, (), {"argument": 1, "power": 3}),
+    (function1, ([1, 2], "a%sb"), {}),
+    (function2, (1, 2), {"a": 3}),
+    (function3, (2,), {}),
+    (function3, (2,), {"power": 3}),
+]
+
+
+@pytest.mark.parametrize("hashing", [True, False])
+@pytest.mark.parametrize("prefix", [None, "myapp"])
+@pytest.mark.parametrize("func,args,kwargs", CALLS)
+def test_builder_matches(hashing, prefix, func, args, kwargs):
+    """The pre-calculated key must match the generic key"""
+    c = Cache(hashing=hashing, prefix=prefix)
+    build = c._key_builder(func)
+    assert build(args, kwargs) == c._calculate_key(func, None, *args, **kwargs)
+
+
+def test_defaults():
+    """Calls using the same (default) values share a key"""
+    c = Cache(hashing=False)
+    build = c._key_builder(function1)
+    assert build((1,), {}) == build((1, 4, 0, 2), {})
+    assert build((1,), {}) == build((), {"argument": 1, "division": 2})
+    assert build((1,), {}) != build((2,), {})
+
+    build = c._key_builder(function3)
+    assert build((2,), {}) == build((2,), {"power": 2})
+
+
+def test_bad_call():
+    """Calls that don't bind fall back instead of raising"""
+    c = Cache(hashing=False)
+    build = c._key_builder(function1)
+    assert build((), {}) == c._calculate_key(function1)
+    assert build((1,), {"bad": 2}) == c._calculate_key(function1, None, 1, bad=2)
+    assert build((1, 2, 3, 4, 5), {}) == c._calculate_key(
+        function1, None, 1, 2, 3, 4, 5
+    )
+
+
+def test_keyed():
+    c = Cache()
+    assert c._key_builder(function1, "asdf")((1,), {}) == "asdf"
@@ -0,0 +1,45 @@
+from __future__ import print_function
+import time
+from yamicache import Cache
+from yamicache.yamicache import _HIT, _MISS, _STALE
+
+
+def test_no_debug_output(monkeypatch):
+    """Hits don't format debug output unless ``debug`` is enabled"""
+    c = Cache()
+
+    @c.cached()
+    def func(value):
+        return value
+
+    func(1)
+
+    def fail(*args):
+        raise AssertionError("_debug_print() called")
+
+    monkeypatch.setattr(c, "_debug_print", fail)
+    assert func(1) == 1
+
+
+def test_states():
+    c = Cache(stale_ttl=0.2)
+    c["fresh"] = c._new_item(1, None)
+    c["stale"] = c._new_item(2, 0.01)
+    c["expired"] = c._new_item(3, 0.01)
+    time.sleep(0.05)
+    c["expired"] = c["expired"]._replace(timeout=time.monotonic() - 1)
+
+    assert c._lookup("fresh") == (_HIT, c["fresh"])
+    assert c._lookup("stale") == (_STALE, c["stale"])
+    assert c._lookup("expired") == (_MISS, None)
+    assert c._lookup("missing") == (_MISS, None)
+
+
+def test_policy_updated():
+    c = Cache(max_entries=2)
+    c["a"] = c._new_item(1, None)
+    c["b"] = c._new_item(2, None)
+    c._lookup("a")
+    c["c"] = c._new_item(3, None)
+
+    assert sorted(c.keys()) == ["a", "c"]
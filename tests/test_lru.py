@@ -0,0 +1,106 @@
+from __future__ import print_function
+import threading
+import pytest
+from yamicache import Cache
+
+c = Cache(hashing=False, max_entries=3)
+
+
+@c.cached()
+def square(value):
+    return value ** 2
+
+
+@c.cached(key="keyed")
+def keyed():
+    return 0
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    c.clear()
+    yield
+    c.clear()
+
+
+def cached_values():
+    return sorted(x.value for x in c.values() if x.time_added)
+
+
+def test_bounded():
+    for value in range(10):
+        square(value)
+
+    assert len(c) == 3
+    assert cached_values() == [49, 64, 81]
+
+
+def test_hit_updates_recency():
+    square(1)
+    square(2)
+    square(3)
+    square(1)  # cache hit; `square(2)` is now the LRU item
+    square(4)
+
+    assert cached_values() == [1, 9, 16]
+
+
+def test_init_value_kept():
+    """Placeholders for keyed functions are not evicted"""
+    c2 = Cache(max_entries=1)
+
+    @c2.cached(key="first")
+    def first():
+        return 1
+
+    @c2.cached()
+    def second(value):
+        return value
+
+    second(1)
+    second(2)
+    assert len(c2) == 1
+    assert c2._is_key_initialized("first")
+
+    first()
+    assert len(c2) == 1
+    assert c2["first"].value == 1
+
+    with pytest.raises(ValueError):
+
+        @c2.cached(key="first")
+        def third():
+            return 3
+
+
+def test_manual_removal():
+    square(1)
+    square(2)
+    key = list(c.keys())[0]
+    del c[key]
+    c.popitem()
+
+    assert len(c) == 0
+    assert len(c._shards[0].policy) == 0
+
+
+def test_threads():
+    def target(start):
+        for value in range(start, start + 200):
+            square(value % 20)
+
+    threads = [threading.Thread(target=target, args=(x,)) for x in range(16)]
+    [x.start() for x in threads]
+    [x.join() for x in threads]
+
+    assert len(c) == 3
+    assert len(c._shards[0].policy) == 3
+    assert set(c._data_store) == set(c._shards[0].policy._order)
+
+
+def test_bad_value():
+    with pytest.raises(ValueError):
+        Cache(max_entries=0)
+
+    with pytest.raises(ValueError):
+        Cache(max_entries=1.5)
@@ -0,0 +1,106 @@
+from __future__ import print_function
+import time
+import pytest
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from yamicache import Cache, nocache
+
+c = Cache(hashing=False)
+calls = []
+
+
+@c.cached()
+def square(x):
+    calls.append(x)
+    return x * x
+
+
+@c.cached()
+def power(x, y):
+    return x ** y
+
+
+def setup_function(function):
+    c.clear()
+    del calls[:]
+
+
+def test_map():
+    square(2)
+    assert square.map([1, 2, 3, 2, 1]) == [1, 4, 9, 4, 1]
+
+    # Only the misses were called, once per key
+    assert calls == [2, 1, 3]
+    assert len(c) == 3
+
+    assert square.map(range(4)) == [0, 1, 4, 9]
+    assert calls == [2, 1, 3, 0]
+
+
+def test_iterables():
+    assert power.map([2, 3], [3, 2]) == [8, 9]
+    assert power(2, 3) == 8
+    assert len(c) == 2
+
+
+def test_executor():
+    with ThreadPoolExecutor(4) as executor:
+        assert square.map(range(10), executor=executor) == [x * x for x in range(10)]
+    assert sorted(calls) == list(range(10))
+    assert len(c) == 10
+
+    with ProcessPoolExecutor(2) as executor:
+        assert power.map([2, 3], [2, 2], executor=executor) == [4, 9]
+    assert power(3, 2) == 9
+    assert len(c) == 12
+
+
+def test_stale():
+    d = Cache(default_timeout=0.01, stale_ttl=60)
+
+    @d.cached()
+    def triple(x):
+        return x * 3
+
+    assert triple.map([1, 2]) == [3, 6]
+    time.sleep(0.02)
+    assert triple.map([1, 2]) == [3, 6]
+    d.close()
+
+
+def test_nocache():
+    with nocache(c):
+        assert square.map([1, 1]) == [1, 1]
+    assert calls == [1, 1]
+    assert len(c) == 0
+
+
+def test_get_set_many():
+    c.set_many({x: x for x in range(10)})
+    assert len(c) == 10
+    c.set_many([("a", "a")])
+    c.set_many([("b", c._new_item("b", None))])
+
+    found = c.get_many([1, 2, "a", "b", "missing"])
+    assert sorted(found, key=str) == [1, 2, "a", "b"]
+    assert found["a"].value == "a"
+    assert found["b"].value == "b"
+    assert found["a"].timeout is None
+
+
+def test_set_many_timeout():
+    d = Cache(default_timeout=60)
+    d.set_many({"a": 1})
+    d.set_many({"b": 2}, timeout=0.01)
+    time.sleep(0.02)
+    d.collect()
+    assert d.keys() == ["a"]
+
+    with pytest.raises(ValueError):
+        d.set_many({"c": 3}, timeout=-1)
+
+
+def test_shards():
+    d = Cache(shards=4, max_entries=100)
+    d.set_many({x: d._new_item(x, None) for x in range(50)})
+    assert len(d) == 50
+    assert len(d.get_many(range(100))) == 50
@@ -0,0 +1,87 @@
+from __future__ import print_function
+import sys
+import pytest
+from yamicache import Cache
+from yamicache.sizing import estimate_size, shallow_size
+
+
+def test_estimate_size():
+    data = b"x" * 1000
+    assert estimate_size(data) == sys.getsizeof(data)
+    assert estimate_size(memoryview(data)) >= 1000
+
+    # Containers include their contents, but shared objects are only
+    # counted once.
+    assert estimate_size([data]) == sys.getsizeof([data]) + sys.getsizeof(data)
+    assert estimate_size([data, data]) == sys.getsizeof([data, data]) + sys.getsizeof(
+        data
+    )
+    assert estimate_size({"a": data}) > estimate_size(data)
+
+    # Recursive containers don't loop forever
+    value = []
+    value.append(value)
+    assert estimate_size(value) == sys.getsizeof(value)
+
+
+def test_nbytes():
+    class Array(object):
+        nbytes = 10000
+
+    assert shallow_size(Array()) == 10000
+
+
+def test_max_bytes():
+    c = Cache(max_bytes=3000, sizer=len)
+
+    @c.cached()
+    def blob(name, size):
+        return b"x" * size
+
+    blob("a", 1000)
+    blob("b", 1000)
+    assert c.total_bytes == 2000
+
+    blob("a", 1000)  # `b` is now the LRU item
+    blob("c", 1500)
+    assert c.total_bytes == 2500
+    assert len(c) == 2
+    assert sorted(len(x.value) for x in c.values()) == [1000, 1500]
+
+    # Too big to ever fit; nothing else is evicted
+    blob("d", 5000)
+    assert len(c) == 2
+    assert c.total_bytes == 2500
+
+    key = list(c.keys())[0]
+    del c[key]
+    assert c.total_bytes in [1000, 1500]
+
+    c.clear()
+    assert c.total_bytes == 0
+
+
+def test_total_only():
+    """Passing a sizer without ``max_bytes`` just tracks the total"""
+    c = Cache(sizer=len)
+
+    @c.cached()
+    def blob(size):
+        return b"x" * size
+
+    for size in range(100):
+        blob(size)
+
+    assert len(c) == 100
+    assert c.total_bytes == sum(range(100))
+
+
+def test_no_tracking():
+    c = Cache()
+    c["key"] = c._new_item(b"x" * 100, None)
+    assert c.total_bytes == 0
+
+
+def test_bad_value():
+    with pytest.raises(ValueError):
+        Cache(max_bytes=-1)
@@ -0,0 +1,231 @@
+from __future__ import print_function
+import os
+import time
+import pytest
+from yamicache import Cache
+from yamicache import persistence
+
+
+@pytest.fixture
+def filename(tmpdir):
+    return str(tmpdir.join("cache.db"))
+
+
+def test_replay(filename):
+    c = Cache(hashing=False)
+    c["existing"] = c._new_item(0, None)
+    c.open_log(filename, sync_interval=60)
+
+    @c.cached()
+    def square(x):
+        return x * x
+
+    for x in range(10):
+        square(x)
+    c["one"] = c._new_item(1, None)
+    del c["one"]
+    c["two"] = c._new_item(2, None)
+    c.close()
+
+    # The snapshot only has the item from before the log was opened
+    d = Cache(hashing=False)
+    d.deserialize(filename)
+    assert sorted(d.keys()) == sorted(c.keys())
+    assert d["two"].value == 2
+    assert "one" not in d
+
+
+def test_clear(filename):
+    c = Cache()
+    c["one"] = c._new_item(1, None)
+    with c:
+        c.open_log(filename, sync_interval=60)
+        c.clear()
+        c["two"] = c._new_item(2, None)
+
+    d = Cache()
+    d.deserialize(filename)
+    assert d.keys() == ["two"]
+
+
+def test_expired(filename):
+    c = Cache(default_timeout=0.01)
+    c.open_log(filename, sync_interval=60)
+
+    @c.cached()
+    def square(x):
+        return x * x
+
+    square(2)
+    time.sleep(0.02)
+    c.collect()
+    c.close()
+
+    d = Cache()
+    d.deserialize(filename)
+    assert len(d) == 0
+
+
+def test_background(filename):
+    c = Cache()
+    c.open_log(filename, sync_interval=0.01)
+    header_bytes = c._log.log_bytes
+    c["one"] = c._new_item(1, None)
+
+    end = time.time() + 5
+    while os.path.getsize(persistence.log_filename(filename)) <= header_bytes:
+        assert time.time() < end
+        time.sleep(0.01)
+
+    # The process "crashed"
+    d = Cache()
+    d.deserialize(filename)
+    assert d["one"].value == 1
+    c.close()
+
+
+def test_torn_record(filename):
+    c = Cache()
+    c.open_log(filename, sync_interval=60)
+    c["one"] = c._new_item(1, None)
+    c["two"] = c._new_item(2, None)
+    c.close()
+
+    log_filename = persistence.log_filename(filename)
+    with open(log_filename, "r+b") as fh:
+        fh.truncate(os.path.getsize(log_filename) - 1)
+
+    d = Cache()
+    d.deserialize(filename)
+    assert d.keys() == ["one"]
+
+
+def test_compact(filename):
+    c = Cache()
+    c.open_log(filename, sync_interval=60)
+    for x in range(100):
+        c[x] = c._new_item(x, None)
+    c._log.flush()
+    log_filename = persistence.log_filename(filename)
+    assert os.path.getsize(log_filename)
+
+    c._log.compact()
+    assert os.path.getsize(log_filename) == c._log.log_bytes < 100
+    c[100] = c._new_item(100, None)
+    c.close()
+
+    d = Cache()
+    d.deserialize(filename)
+    assert sorted(d.keys()) == list(range(101))
+
+
+def test_unpicklable(filename):
+    c = Cache()
+    c.open_log(filename, sync_interval=60)
+    c["one"] = c._new_item(1, None)
+    c._log.flush()
+    c["one"] = c._new_item(lambda: 1, None)
+    c.close()
+
+    d = Cache()
+    d.deserialize(filename)
+    assert len(d) == 0
+
+
+def test_errors(filename):
+    c = Cache()
+    with pytest.raises(ValueError):
+        c.open_log(filename, sync_interval=0)
+
+    c.open_log(filename)
+    with pytest.raises(ValueError):
+        c.open_log(filename)
+    c.close()
+
+
+def test_unpicklable_snapshot(filename):
+    c = Cache()
+    c["one"] = c._new_item(1, None)
+    c["two"] = c._new_item(lambda: 2, None)
+    c.open_log(filename, sync_interval=60)
+    c.close()
+
+    d = Cache()
+    d.deserialize(filename)
+    assert d.keys() == ["one"]
+
+
+def test_background_errors(filename, monkeypatch):
+    monkeypatch.setattr(persistence, "COMPACT_MIN_BYTES", 0)
+    c = Cache()
+    c.open_log(filename, sync_interval=0.01)
+    c["one"] = c._new_item(lambda: 1, None)
+    c["two"] = c._new_item(2, None)
+
+    # The thread keeps writing after compacting unpicklable values
+    end = time.time() + 5
+    while c._log.queue or not c._log.snapshot_bytes:
+        assert time.time() < end
+        time.sleep(0.01)
+    c["three"] = c._new_item(3, None)
+    c.close()
+
+    d = Cache()
+    d.deserialize(filename)
+    assert sorted(d.keys()) == ["three", "two"]
+
+
+def test_write_error(filename):
+    c = Cache()
+    c.open_log(filename, sync_interval=60)
+    c["one"] = c._new_item(1, None)
+
+    class BrokenFile:
+        def __init__(self, fh):
+            self.fh = fh
+
+        def write(self, data):
+            self.fh.write(data[:5])
+            raise OSError("disk full")
+
+        def __getattr__(self, name):
+            return getattr(self.fh, name)
+
+    fh, c._log.file = c._log.file, BrokenFile(c._log.file)
+    with pytest.raises(OSError):
+        c._log.flush()
+
+    # The records are kept, and the partial record removed
+    c._log.file = fh
+    c["two"] = c._new_item(2, None)
+    c.close()
+
+    d = Cache()
+    d.deserialize(filename)
+    assert sorted(d.keys()) == ["one", "two"]
+
+
+def test_old_log(filename):
+    """A log from before the snapshot (after a crash) isn't replayed"""
+    c = Cache()
+    c.open_log(filename, sync_interval=60)
+    c["a"] = c._new_item("old", None)
+    c["b"] = c._new_item(1, None)
+    c._log.flush()
+
+    log_filename = persistence.log_filename(filename)
+    with open(log_filename, "rb") as fh:
+        old_log = fh.read()
+
+    del c["a"]
+    log = c._log
+    log.compact()
+    c.close()
+
+    # Crashed after writing the snapshot, before starting the new log
+    with open(log_filename, "wb") as fh:
+        fh.write(old_log + log._encode((persistence.CLEAR, None, None)))
+
+    d = Cache()
+    d.deserialize(filename)
+    assert d.keys() == ["b"]
@@ -0,0 +1,186 @@
+from __future__ import print_function
+import time
+import pytest
+from yamicache import Cache
+from yamicache.policies import (
+    CountMinSketch,
+    GDSFPolicy,
+    LRUPolicy,
+    TinyLFUPolicy,
+    make_policy,
+)
+
+
+def test_sketch():
+    sketch = CountMinSketch(64)
+    for _ in range(5):
+        sketch.increment("popular")
+    sketch.increment("rare")
+
+    assert sketch.frequency("popular") >= 5
+    assert sketch.frequency("popular") > sketch.frequency("rare")
+
+    # Counters saturate at 15
+    for _ in range(100):
+        sketch.increment("popular")
+    assert sketch.frequency("popular") == 15
+
+    sketch.age()
+    assert sketch.frequency("popular") == 7
+
+    sketch.clear()
+    assert sketch.frequency("popular") == 0
+
+
+def test_sketch_aging():
+    """Counters are halved once the sample size is reached"""
+    sketch = CountMinSketch(16)
+    for index in range(sketch._sample_size + 1):
+        sketch.increment(index)
+
+    assert sketch._additions < sketch._sample_size
+
+
+def test_make_policy():
+    assert isinstance(make_policy("lru"), LRUPolicy)
+    assert isinstance(make_policy("tinylfu", capacity=10), TinyLFUPolicy)
+
+    policy = LRUPolicy()
+    assert make_policy(policy) is policy
+
+    with pytest.raises(ValueError):
+        make_policy("random")
+
+    with pytest.raises(ValueError):
+        Cache(max_entries=10, policy="random")
+
+
+def test_scan_resistance():
+    """A scan of one-time keys doesn't flush the popular keys"""
+    c = Cache(max_entries=10, policy="tinylfu")
+    calls = []
+
+    @c.cached()
+    def lookup(key):
+        calls.append(key)
+        return key
+
+    popular = list(range(5))
+    for _ in range(10):
+        for key in popular:
+            lookup(key)
+
+    for key in range(1000, 1100):
+        lookup(key)
+
+    del calls[:]
+    for key in popular:
+        lookup(key)
+
+    assert not calls
+    assert len(c) == 10
+    assert len(c._shards[0].policy) == 10
+
+
+def test_lru_flushed():
+    """Make sure the scan test would actually fail for LRU"""
+    c = Cache(max_entries=10, policy="lru")
+    calls = []
+
+    @c.cached()
+    def lookup(key):
+        calls.append(key)
+        return key
+
+    for _ in range(10):
+        for key in range(5):
+            lookup(key)
+
+    for key in range(1000, 1100):
+        lookup(key)
+
+    del calls[:]
+    for key in range(5):
+        lookup(key)
+
+    assert len(calls) == 5
+
+
+def test_bytes_only():
+    """TinyLFU works without a known capacity"""
+    c = Cache(max_bytes=1000, sizer=lambda value: 100, policy="tinylfu")
+
+    @c.cached()
+    def lookup(key):
+        return key
+
+    for key in range(100):
+        lookup(key % 30)
+        lookup(key)
+
+    assert len(c) == 10
+    assert c.total_bytes == 1000
+    policy = c._shards[0].policy
+    assert set(c._data_store) == set(
+        list(policy._window) + list(policy._probation) + list(policy._protected)
+    )
+
+
+def test_gdsf_cost():
+    """Cheap keys are evicted before costly ones"""
+    policy = GDSFPolicy()
+    policy.insert("cheap", cost=0.001)
+    policy.insert("costly", cost=1.0)
+    policy.insert("medium", cost=0.1)
+
+    assert policy.evict() == "cheap"
+    policy.remove("cheap")
+    assert policy.evict() == "medium"
+    policy.remove("medium")
+    assert len(policy) == 1
+
+
+def test_gdsf_size_and_frequency():
+    policy = GDSFPolicy()
+    policy.insert("large", cost=1.0, size=1000)
+    policy.insert("small", cost=1.0, size=10)
+    assert policy.evict() == "large"
+
+    policy.clear()
+    policy.insert("rare", cost=1.0)
+    policy.insert("popular", cost=1.0)
+    for _ in range(3):
+        policy.access("popular")
+    assert policy.evict() == "rare"
+
+
+def test_gdsf_aging():
+    """Evictions raise the clock, so costly keys that aren't used age out"""
+    policy = GDSFPolicy()
+    policy.insert("old", cost=5.0)
+    for index in range(10):
+        policy.insert(index, cost=1.0)
+        policy.access(index)
+        policy.access(index)
+        victim = policy.evict()
+        policy.remove(victim)
+
+    assert "old" not in policy._entries
+
+
+def test_gdsf_cache():
+    """The cache records how long each call took"""
+    c = Cache(max_entries=3, policy="gdsf")
+
+    @c.cached()
+    def lookup(key, delay):
+        time.sleep(delay)
+        return key
+
+    lookup("slow", 0.05)
+    for key in range(10):
+        lookup(key, 0)
+
+    assert len(c) == 3
+    key = c._key_builder(lookup.__wrapped__)(("slow", 0.05), {})
+    assert c._data_store[key].cost >= 0.05
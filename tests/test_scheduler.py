@@ -0,0 +1,117 @@
+from __future__ import print_function
+import time
+from yamicache import Cache
+
+
+def wait_for(condition, limit=5):
+    tend = time.time() + limit
+    while not condition() and time.time() < tend:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_subsecond():
+    """Sub-second timeouts are collected on time"""
+    c = Cache(default_timeout=0.2, gc_thread_wait=0.05)
+
+    @c.cached()
+    def func(value):
+        return value
+
+    try:
+        tstart = time.time()
+        func(1)
+        assert wait_for(lambda: not len(c))
+        assert 0.15 < (time.time() - tstart) < 1
+    finally:
+        c.close()
+
+
+def test_earlier_item():
+    """An item that times out sooner than the others wakes up the thread"""
+    c = Cache(default_timeout=30, gc_thread_wait=0.01)
+
+    @c.cached()
+    def func(value):
+        return value
+
+    @c.cached(timeout=0.2)
+    def short(value):
+        return value
+
+    try:
+        func(1)
+        time.sleep(0.1)  # The GC thread is now waiting for `func(1)`
+        short(1)
+        assert wait_for(lambda: len(c) == 1, limit=2)
+    finally:
+        c.close()
+
+
+def test_close():
+    c = Cache(default_timeout=30, gc_thread_wait=10)
+    thread = c._gc_thread
+    assert thread.is_alive()
+
+    tstart = time.time()
+    c.close()
+    assert time.time() - tstart < 1
+    assert not thread.is_alive()
+    assert c._gc_thread is None
+
+    # Closing again is fine
+    c.close()
+
+
+def test_context_manager():
+    with Cache(default_timeout=30, gc_thread_wait=10, stale_ttl=10) as c:
+        thread = c._gc_thread
+
+        @c.cached(timeout=0.1)
+        def func():
+            return 1
+
+        func()
+        time.sleep(0.2)
+        func()  # Starts the refresh threads
+
+        assert wait_for(lambda: not c._flights)
+
+    assert not thread.is_alive()
+    assert c._refresh_executor is None
+
+
+class RacyHeap(list):
+    """A heap whose first entry is removed by another thread the first time
+    it's read"""
+
+    raced = False
+
+    def __getitem__(self, index):
+        if not self.raced:
+            self.raced = True
+            raise IndexError(index)
+        return list.__getitem__(self, index)
+
+
+def test_heap_emptied():
+    """The thread survives another thread removing the last heap entry"""
+    c = Cache(default_timeout=0.05, gc_thread_wait=0.01)
+
+    @c.cached()
+    def func(value):
+        return value
+
+    try:
+        func(1)
+        shard = c._shards[0]
+        shard.expiry_heap = RacyHeap(shard.expiry_heap)
+        c._wake_gc()
+        assert wait_for(lambda: shard.expiry_heap.raced)
+        time.sleep(0.01)
+        assert c._gc_thread.is_alive()
+
+        c._wake_gc()
+        assert wait_for(lambda: not len(c))
+    finally:
+        c.close()
@@ -1,10 +1,12 @@
 from __future__ import print_function
 import os
 import sys
+import time
 import tempfile
 
 import pytest
 from yamicache import Cache
+from yamicache.yamicache import CachedItem, INIT_CACHE_VALUE
 
 try:
     import cPickle as pickle
@@ -74,11 +76,48 @@ def test_serialization(cache_obj):
     c.deserialize(filepath)
 
     assert len(c)
-    assert c._data_store == orig
+    assert c._data_store.keys() == orig.keys()
+
+    # Times are stored as timestamp strings, so we lose sub-second accuracy.
+    for key, item in c._data_store.items():
+        assert item.value == orig[key].value
+        if item is not INIT_CACHE_VALUE:
+            assert abs(item.time_added - orig[key].time_added) <= 1
 
     os.unlink(filepath)
 
 
+def test_old_format():
+    """Make sure we can read a cache that stored timestamp strings"""
+    c2 = Cache()
+    data = {
+        "key1": CachedItem(value=1, timeout=None, time_added=time.asctime()),
+        "key2": CachedItem(
+            value=2,
+            timeout=time.asctime(time.localtime(time.time() - 10)),
+            time_added=time.asctime(time.localtime(time.time() - 20)),
+        ),
+        "key3": INIT_CACHE_VALUE,
+    }
+
+    temp_handle, filepath = tempfile.mkstemp()
+    os.close(temp_handle)
+
+    with open(filepath, "wb") as fh:
+        pickle.dump(data, fh, -1)
+
+    c2.deserialize(filepath)
+    os.unlink(filepath)
+
+    assert c2["key1"].value == 1
+    assert c2._data_store["key3"] is INIT_CACHE_VALUE
+    assert c2["key2"].timeout < time.monotonic()
+
+    c2.collect()
+    assert "key2" not in c2
+    assert len(c2) == 1
+
+
 def main():
     test_serialization(MyApp())
 
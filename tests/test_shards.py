@@ -0,0 +1,102 @@
+from __future__ import print_function
+import os
+import time
+import tempfile
+import threading
+import pytest
+from yamicache import Cache
+
+
+@pytest.fixture
+def c():
+    return Cache(hashing=False, shards=4)
+
+
+def test_mapping(c):
+    @c.cached()
+    def square(value):
+        return value ** 2
+
+    for value in range(100):
+        assert square(value) == value ** 2
+        assert square(value) == value ** 2
+
+    assert len(c) == 100
+    assert len(c.keys()) == 100
+    assert sorted(x.value for x in c.values()) == [x ** 2 for x in range(100)]
+    assert len(set(c)) == 100
+    assert all(len(shard.data) for shard in c._shards)
+
+    key = c.keys()[0]
+    assert c.pop(key).value >= 0
+    assert key not in c
+    assert c.pop(key, None) is None
+
+    c.popitem()
+    assert len(c) == 98
+
+    c.clear()
+    assert len(c) == 0
+    with pytest.raises(KeyError):
+        c.popitem()
+
+
+def test_limits():
+    c = Cache(shards=4, max_entries=10, max_bytes=1000, sizer=lambda value: 10)
+    assert [x.max_entries for x in c._shards] == [3] * 4
+    assert [x.max_bytes for x in c._shards] == [250] * 4
+
+    for index in range(100):
+        c[index] = c._new_item(index, None)
+
+    assert len(c) <= 12
+    assert c.total_bytes == 10 * len(c)
+
+
+def test_collect(c):
+    for index in range(100):
+        c[index] = c._new_item(index, 0.1 if index % 2 else None)
+
+    time.sleep(0.2)
+    c.collect()
+    assert sorted(c.keys()) == list(range(0, 100, 2))
+
+
+def test_serialize(c):
+    for index in range(100):
+        c["key%i" % index] = c._new_item(index, None)
+
+    temp_handle, filepath = tempfile.mkstemp()
+    os.close(temp_handle)
+    c.serialize(filepath)
+
+    c2 = Cache(shards=3)
+    c2.deserialize(filepath)
+    os.unlink(filepath)
+
+    assert sorted(c2.keys()) == sorted(c.keys())
+    assert c2["key5"].value == 5
+
+
+def test_threads(c):
+    @c.cached()
+    def square(value):
+        return value ** 2
+
+    def target():
+        for value in range(500):
+            assert square(value % 50) == (value % 50) ** 2
+
+    threads = [threading.Thread(target=target) for _ in range(8)]
+    [x.start() for x in threads]
+    [x.join() for x in threads]
+
+    assert len(c) == 50
+
+
+def test_bad_value():
+    with pytest.raises(ValueError):
+        Cache(shards=0)
+
+    with pytest.raises(ValueError):
+        Cache(shards=2, max_entries=10, policy=object())
@@ -0,0 +1,141 @@
+from __future__ import print_function
+import time
+import uuid
+import pickle
+import multiprocessing
+import pytest
+from yamicache import Cache
+
+pytest.importorskip("fcntl")
+from yamicache.shared import SharedMemoryStore  # noqa: E402
+
+
+@pytest.fixture
+def store():
+    store = SharedMemoryStore("yamicache-test-%s" % uuid.uuid4().hex[:8])
+    yield store
+    store.close()
+    store.unlink()
+
+
+def square_in_child(store, values):
+    c = Cache(store=store)
+
+    @c.cached()
+    def square(x):
+        return x * x
+
+    for x in values:
+        square(x)
+
+
+def test_cached(store):
+    c = Cache(store=store)
+    calls = []
+
+    @c.cached()
+    def square(x):
+        calls.append(x)
+        return x * x
+
+    assert square(2) == 4
+    assert square(2) == 4
+    assert calls == [2]
+    assert len(c) == 1
+    assert c.items()[0][1].value == 4
+
+    del c[c.keys()[0]]
+    assert len(c) == 0
+
+
+def test_processes(store):
+    context = multiprocessing.get_context("fork")
+    process = context.Process(target=square_in_child, args=(store, range(10)))
+    process.start()
+    process.join()
+    assert process.exitcode == 0
+    assert len(store) == 10
+
+    # Another process' items are used here
+    c = Cache(store=store)
+
+    @c.cached()
+    def square(x):
+        raise AssertionError("not cached")
+
+    assert [square(x) for x in range(10)] == [x * x for x in range(10)]
+
+
+def test_attach(store):
+    other = pickle.loads(pickle.dumps(store))
+    store["key"] = Cache()._new_item(b"value", None)
+    assert other["key"].value == b"value"
+    assert "key" in other
+    other.clear()
+    assert "key" not in store
+    other.close()
+
+    with pytest.raises(FileExistsError):
+        SharedMemoryStore(store.name, create=True)
+
+
+def test_timeout(store):
+    c = Cache(store=store, default_timeout=0.01)
+
+    @c.cached()
+    def square(x):
+        return x * x
+
+    square(2)
+    assert len(c) == 1
+    time.sleep(0.02)
+    c.collect()
+    assert len(c) == 0
+
+
+def test_full():
+    store = SharedMemoryStore(
+        "yamicache-test-%s" % uuid.uuid4().hex[:8],
+        buckets=2,
+        ways=4,
+        region_bytes=512,
+    )
+    try:
+        c = Cache(store=store)
+        for x in range(100):
+            c[x] = c._new_item(b"x" * 50, None)
+        assert len(store) <= 8
+
+        # The newest items were kept
+        assert 99 in store
+        assert 0 not in store
+
+        # Too large
+        c["big"] = c._new_item(b"x" * 1000, None)
+        assert "big" not in store
+    finally:
+        store.close()
+        store.unlink()
+
+
+def test_keyed(store):
+    c = Cache(store=store)
+
+    @c.cached(key="mykey")
+    def value():
+        return 1
+
+    assert len(c) == 0
+    assert value() == 1
+    assert c["mykey"].value == 1
+
+
+def test_errors(store):
+    with pytest.raises(ValueError):
+        Cache(store=store, max_entries=10)
+
+    with pytest.raises(ValueError):
+        Cache(store=store, shards=2)
+
+    with pytest.raises(ValueError):
+        SharedMemoryStore("yamicache-test", ways=0)
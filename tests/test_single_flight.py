@@ -0,0 +1,100 @@
+from __future__ import print_function
+import time
+import threading
+from yamicache import Cache
+
+
+def run_threads(target, count=20):
+    results = []
+    errors = []
+    barrier = threading.Barrier(count)
+
+    def run():
+        barrier.wait()
+        try:
+            results.append(target())
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run) for _ in range(count)]
+    [x.start() for x in threads]
+    [x.join() for x in threads]
+    return results, errors
+
+
+def test_single_call():
+    """Concurrent misses only call the function once"""
+    c = Cache()
+    calls = []
+
+    @c.cached()
+    def slow(value):
+        calls.append(value)
+        time.sleep(0.2)
+        return value * 2
+
+    results, errors = run_threads(lambda: slow(4))
+
+    assert not errors
+    assert results == [8] * 20
+    assert len(calls) == 1
+    assert not c._flights
+
+
+def test_expired():
+    """Concurrent calls to an expired key only call the function once"""
+    c = Cache()
+    calls = []
+
+    @c.cached(timeout=1)
+    def slow():
+        calls.append(1)
+        time.sleep(0.2)
+        return len(calls)
+
+    assert slow() == 1
+    time.sleep(1.1)
+
+    results, errors = run_threads(slow)
+    assert results == [2] * 20
+    assert len(calls) == 2
+
+
+def test_exception():
+    """Waiting callers get the leader's exception"""
+    c = Cache()
+    calls = []
+
+    @c.cached()
+    def broken():
+        calls.append(1)
+        time.sleep(0.2)
+        raise RuntimeError("broken")
+
+    results, errors = run_threads(broken)
+
+    assert not results
+    assert len(errors) == 20
+    assert all(isinstance(x, RuntimeError) for x in errors)
+    assert len(calls) == 1
+    assert not c._flights
+    assert len(c) == 0
+
+
+def test_timeout():
+    """Waiting callers give up and call the function themselves"""
+    c = Cache(flight_timeout=0.1)
+    calls = []
+
+    @c.cached()
+    def slow():
+        calls.append(1)
+        time.sleep(0.5)
+        return 1
+
+    results, errors = run_threads(slow, count=5)
+
+    assert results == [1] * 5
+    assert len(calls) == 5
+    assert not c._flights
+    assert len(c) == 1
@@ -0,0 +1,123 @@
+from __future__ import print_function
+import time
+import threading
+import pytest
+from yamicache import Cache
+
+
+def wait_for(condition, limit=5):
+    tend = time.time() + limit
+    while not condition() and time.time() < tend:
+        time.sleep(0.05)
+    return condition()
+
+
+def test_stale_while_revalidate():
+    c = Cache(stale_ttl=10)
+    calls = []
+    release = threading.Event()
+
+    @c.cached(timeout=1)
+    def slow():
+        calls.append(1)
+        if len(calls) > 1:
+            release.wait(5)
+        return len(calls)
+
+    assert slow() == 1
+    time.sleep(1.1)
+
+    # The stale value is returned right away, while a single refresh runs in
+    # the background.
+    tstart = time.time()
+    results = [slow() for _ in range(10)]
+    assert time.time() - tstart < 0.5
+    assert results == [1] * 10
+
+    release.set()
+    assert wait_for(lambda: slow() == 2)
+    assert len(calls) == 2
+    assert not c._flights
+
+
+def test_too_stale():
+    """Items past the stale window are computed inline"""
+    c = Cache(stale_ttl=1)
+    calls = []
+
+    @c.cached(timeout=1)
+    def func():
+        calls.append(1)
+        return len(calls)
+
+    assert func() == 1
+    time.sleep(2.1)
+    assert func() == 2
+
+
+def test_collect():
+    """``collect()`` keeps items that can still be served stale"""
+    c = Cache(stale_ttl=1)
+
+    @c.cached(timeout=1)
+    def func():
+        return 1
+
+    func()
+    time.sleep(1.1)
+    c.collect()
+    assert len(c) == 1
+
+    time.sleep(1)
+    c.collect()
+    assert len(c) == 0
+
+
+def test_refresh_exception():
+    """A failed refresh keeps serving the stale value"""
+    c = Cache(stale_ttl=10)
+    calls = []
+
+    @c.cached(timeout=1)
+    def func():
+        calls.append(1)
+        if len(calls) > 1:
+            raise RuntimeError("broken")
+        return 1
+
+    func()
+    time.sleep(1.1)
+    assert func() == 1
+    assert wait_for(lambda: not c._flights)
+    assert func() == 1
+
+
+def test_bad_value():
+    with pytest.raises(ValueError):
+        Cache(stale_ttl=-1)
+
+
+def test_close_while_refreshing():
+    """A refresh queued as the cache closes doesn't leave its flight behind"""
+    c = Cache(stale_ttl=10)
+    calls = []
+
+    @c.cached(timeout=0.1)
+    def func():
+        calls.append(1)
+        return len(calls)
+
+    func()
+    time.sleep(0.2)
+
+    debug_print = c._debug_print
+
+    def close_on_refresh(*args):
+        if args[0] == "refreshing :":
+            c.close()
+        debug_print(*args)
+
+    c._debug_print = close_on_refresh
+    assert func() == 1
+    assert not c._flights
+    assert func() == 2
@@ -0,0 +1,123 @@
+from __future__ import print_function
+import time
+import threading
+from yamicache import Cache
+from yamicache.yamicache import CachedItem
+from yamicache.stats import Stats
+
+
+def test_hits_and_misses():
+    c = Cache()
+
+    @c.cached()
+    def square(x):
+        time.sleep(0.01)
+        return x * x
+
+    square(1)
+    square(1)
+    square(2)
+    square.map([1, 2, 3])
+
+    assert square.stats.hits == 3
+    assert square.stats.misses == 3
+    assert square.stats.compute_time >= 0.03
+
+    stats = c.stats()
+    assert list(stats) == [square.stats.name]
+    assert isinstance(stats[square.stats.name], Stats)
+    assert stats[square.stats.name].hits == 3
+    assert "test_hits_and_misses.<locals>.square" in square.stats.name
+
+
+def test_expirations():
+    c = Cache(default_timeout=0.01)
+
+    @c.cached()
+    def square(x):
+        return x * x
+
+    square(1)
+    square(2)
+    time.sleep(0.02)
+
+    # Replaced after timing out
+    square(1)
+    # Collected
+    c.collect()
+    assert square.stats.expirations == 2
+    assert square.stats.misses == 3
+
+
+def test_evictions():
+    c = Cache(max_entries=2)
+
+    @c.cached()
+    def square(x):
+        return x * x
+
+    @c.cached()
+    def cube(x):
+        return x * x * x
+
+    square.map(range(5))
+    cube(1)
+    assert square.stats.evictions == 4
+    assert cube.stats.evictions == 0
+
+
+def test_threads():
+    c = Cache()
+
+    @c.cached()
+    def square(x):
+        return x * x
+
+    square(1)
+
+    def run():
+        for _ in range(1000):
+            square(1)
+
+    threads = [threading.Thread(target=run) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    del threads
+
+    # The counts of the finished threads are kept
+    assert square.stats.hits == 4000
+    assert len(square.stats._cells) <= 2
+
+    square.stats.reset()
+    assert square.stats.snapshot() == Stats(0, 0, 0, 0, 0.0, 0)
+
+
+def test_old_items():
+    # Items from older versions don't have a function
+    item = CachedItem(1, None, time.monotonic())
+    assert item.function is None
+
+    c = Cache()
+    c["key"] = item
+    del c["key"]
+
+
+def test_deserialize(tmpdir):
+    """Items keep their function, so they're still counted"""
+    filename = str(tmpdir.join("cache.pkl"))
+    c = Cache(default_timeout=0.01)
+
+    @c.cached()
+    def square(x):
+        return x * x
+
+    square(1)
+    c.serialize(filename)
+
+    c.clear()
+    c.deserialize(filename)
+    time.sleep(0.02)
+    c.collect()
+    assert square.stats.expirations == 1
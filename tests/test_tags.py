@@ -0,0 +1,202 @@
+from __future__ import print_function
+import time
+import uuid
+import pytest
+from yamicache import Cache
+from yamicache.disk import DiskTier
+
+
+def test_static_tags():
+    c = Cache()
+
+    @c.cached(tags=["users"])
+    def user(user_id):
+        return {"id": user_id}
+
+    @c.cached(tags=["orders"])
+    def orders(user_id):
+        return [user_id]
+
+    user(1)
+    user(2)
+    orders(1)
+
+    assert c.invalidate_tags("users") == 2
+    assert len(c) == 1
+    assert c.invalidate_tags("users") == 0
+    assert c._shards[0].tags == {"orders": set(c.keys())}
+
+
+def test_computed_tags():
+    c = Cache(shards=4)
+    calls = []
+
+    def customer_tags(customer_id, year=2020):
+        return ["customer:%s" % customer_id]
+
+    @c.cached(tags=customer_tags)
+    def invoices(customer_id, year=2020):
+        calls.append(customer_id)
+        return [customer_id, year]
+
+    invoices(1)
+    invoices(1, year=2021)
+    invoices(2)
+    invoices.map([1, 2, 3], [2019, 2019, 2019])
+
+    assert c.invalidate_tags("customer:1", "customer:3") == 4
+    assert len(c) == 2
+
+    del calls[:]
+    invoices(1)
+    invoices(2)
+    assert calls == [1]
+
+
+def test_index_cleanup():
+    """The index doesn't keep keys that expired, were evicted, or replaced"""
+    c = Cache(max_entries=2)
+
+    @c.cached(tags=lambda x, timeout=None: ["tag%s" % (x % 2)])
+    def identity(x, timeout=None):
+        return x
+
+    for x in range(5):
+        identity(x)
+
+    shard = c._shards[0]
+    assert set().union(*shard.tags.values()) == set(c.keys())
+
+    c.clear()
+    assert shard.tags == {}
+
+    c = Cache(default_timeout=0.01)
+    tagged = c.cached(tags=["a"])(lambda x: x)
+    tagged(1)
+    time.sleep(0.02)
+    c.collect()
+    assert c._shards[0].tags == {}
+
+    # Replacing an item drops its old tags
+    key = "key"
+    c[key] = c._new_item(1, None, tags=frozenset(["old"]))
+    c[key] = c._new_item(2, None, tags=frozenset(["new"]))
+    assert c._shards[0].tags == {"new": {key}}
+    del c[key]
+    assert c._shards[0].tags == {}
+
+
+def test_serialize(tmpdir):
+    filename = str(tmpdir.join("cache.pkl"))
+    c = Cache()
+
+    @c.cached(tags=["a"])
+    def square(x):
+        return x * x
+
+    square(2)
+    c.serialize(filename)
+
+    c2 = Cache()
+    c2.deserialize(filename)
+    assert c2.invalidate_tags("a") == 1
+    assert len(c2) == 0
+
+
+def test_l2(tmpdir):
+    tier = DiskTier(str(tmpdir))
+    c = Cache(max_entries=1, l2=tier)
+    calls = []
+
+    @c.cached(tags=lambda x: ["tag%s" % x])
+    def square(x):
+        calls.append(x)
+        return x * x
+
+    square(1)
+    square(2)  # Demotes 1
+    assert len(tier) == 1
+
+    c.invalidate_tags("tag1")
+    assert len(tier) == 0
+    assert c._l2_tags == {}
+
+    square(1)
+    assert calls == [1, 2, 1]
+    c.close()
+
+
+def test_l2_removed(tmpdir):
+    """Demoted keys that are replaced or deleted are removed from the index"""
+    tier = DiskTier(str(tmpdir))
+    c = Cache(max_entries=1, l2=tier)
+
+    @c.cached(tags=lambda x: ["tag%s" % x])
+    def square(x):
+        return x * x
+
+    def key(x):
+        return c._key_builder(square.__wrapped__)((x,), {})
+
+    for x in range(10):
+        square(x)
+    assert len(c._l2_tags) == 9
+
+    for x in range(5):
+        c.pop(key(x), None)
+    for x in range(5, 9):
+        c[key(x)] = c._new_item(0, None)
+    del c[key(8)]
+
+    # 9 was demoted by the first replacement, and 5-7 by the ones after
+    assert len(tier) == 4
+    assert c._l2_tags == {"tag9": {key(9)}}
+    assert c._l2_key_tags == {key(9): frozenset(["tag9"])}
+    c.close()
+
+
+def test_l2_dropped(tmpdir):
+    """Keys the tier drops to fit in `max_bytes` are removed from the index"""
+    tier = DiskTier(str(tmpdir), max_bytes=20000)
+    c = Cache(max_entries=1, l2=tier)
+
+    @c.cached(tags=lambda x: ["tag%s" % (x % 10)])
+    def square(x):
+        return x * x
+
+    for x in range(2000):
+        square(x)
+
+    assert 0 < len(tier) < 2000
+    assert sum(len(x) for x in c._l2_tags.values()) == len(tier)
+    c.close()
+
+
+def test_shared_store():
+    """Items in a shared store are found without an index"""
+    pytest.importorskip("fcntl")
+    from yamicache.shared import SharedMemoryStore
+
+    store = SharedMemoryStore("yamicache-test-%s" % uuid.uuid4().hex[:8], buckets=16)
+    try:
+        c = Cache(store=store)
+
+        @c.cached(tags=lambda x: ["even" if x % 2 == 0 else "odd"])
+        def identity(x):
+            return x
+
+        for x in range(6):
+            identity(x)
+
+        assert c._shards[0].tags is None
+        assert c.invalidate_tags("odd") == 3
+        assert len(c) == 3
+    finally:
+        store.close()
+        store.unlink()
+
+
+def test_invalid():
+    c = Cache()
+    with pytest.raises(ValueError):
+        c.cached(tags="users")
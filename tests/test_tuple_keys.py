@@ -0,0 +1,97 @@
+from __future__ import print_function
+import json
+from yamicache import Cache
+
+c = Cache(prefix="myapp", tuple_keys=True)
+
+
+@c.cached()
+def function1(argument, power=4, addition=0, division=2):
+    return argument ** power + addition / division
+
+
+@c.cached()
+def function2(*args, **kwargs):
+    return len(args) + len(kwargs)
+
+
+@c.cached()
+def total(values):
+    return sum(values)
+
+
+@c.cached()
+def identity(value):
+    return value
+
+
+def setup_function(function):
+    c.clear()
+
+
+def test_keys():
+    function1(1)
+    function1(1, 4)
+    function1(1, 4, addition=0, division=2)
+    assert len(c) == 1
+
+    key = c.keys()[0]
+    assert isinstance(key, tuple)
+    assert key == ("myapp", __name__ + ".function1", (0, 1, 2, 4))
+
+    function1(2)
+    assert len(c) == 2
+
+
+def test_fallback():
+    """``*args`` functions use the argument names, too"""
+    assert function2(1, 2, a=3) == 3
+    assert function2(1, 2, a=3) == 3
+    assert len(c) == 1
+
+    function2(1, 2, b=3)
+    assert len(c) == 2
+
+
+def test_unhashable():
+    assert total([1, 2, 3]) == 6
+    assert total([1, 2, 3]) == 6
+    assert total((1, 2, 3)) == 6
+    assert total({1: 2, 3: 4}) == 4
+    assert total({1: 2, 3: 4}) == 4
+    assert total({1, 2}) == 3
+
+    # The list and the tuple are different keys
+    assert len(c) == 4
+
+    key = [x for x in c.keys() if isinstance(x[2][0], tuple)][0]
+    hash(key)
+
+
+def test_converted_collision():
+    """A value can't look like the converted version of another one"""
+    assert identity([[1]]) == [[1]]
+    assert identity([("list", (1,))]) == [("list", (1,))]
+    assert identity([("dict", frozenset())]) == [("dict", frozenset())]
+    assert identity([{}]) == [{}]
+    assert len(c) == 4
+
+
+def test_serialize(tmpdir):
+    """Converted values are the same key after pickling"""
+    filename = str(tmpdir.join("cache.pkl"))
+    total([1, 2])
+    c.serialize(filename)
+    c.clear()
+    c.deserialize(filename)
+
+    hits = total.stats.hits
+    total([1, 2])
+    assert len(c) == 1
+    assert total.stats.hits == hits + 1
+
+
+def test_dump():
+    function1(1)
+    data = json.loads(c.dump())
+    assert list(data) == ["myapp|%s.function1|(0, 1, 2, 4)" % __name__]
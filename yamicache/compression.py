@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""
+Compression of large cached values.
+
+When a ``Cache`` (or a ``@cached()`` function) has a ``compress_threshold``,
+results whose pickled size is larger than the threshold are stored as a
+``CompressedValue``, and decompressed on cache hits.  Values that don't
+compress to a smaller size are stored as-is.
+
+A codec is ``"zlib"``, ``"lzma"``, or an object with a ``name`` and
+``compress(bytes)`` / ``decompress(bytes)`` methods.
+"""
+
+# Imports #####################################################################
+import zlib
+import pickle
+import collections
+
+try:
+    import lzma
+except ImportError:  # pragma: no cover
+    lzma = None
+
+
+# Globals #####################################################################
+__all__ = ["CompressedValue", "CompressionStats", "CODECS"]
+
+# `size` is the size of the pickled value before compression
+CompressedValue = collections.namedtuple("CompressedValue", "codec data size")
+
+CompressionStats = collections.namedtuple(
+    "CompressionStats", "raw_bytes compressed_bytes"
+)
+
+CODECS = {"zlib": zlib}
+if lzma is not None:
+    CODECS["lzma"] = lzma
+
+
+def codec_name(codec):
+    return getattr(codec, "name", None) or codec.__name__
+
+
+def get_codec(codec):
+    """Return the codec object for a codec name (or object)"""
+    if isinstance(codec, str):
+        try:
+            return CODECS[codec]
+        except KeyError:
+            raise ValueError("unknown codec %r" % codec)
+
+    if not all(hasattr(codec, x) for x in ("name", "compress", "decompress")):
+        raise ValueError("codec needs a `name`, `compress()`, and `decompress()`")
+    return codec
+
+
+def compress(value, threshold, codec):
+    """
+    Return ``value`` as a ``CompressedValue`` if it's larger than
+    ``threshold`` bytes when pickled, and it compresses.  Otherwise, return
+    ``value``.
+    """
+    try:
+        raw = pickle.dumps(value, -1)
+    except Exception:
+        return value
+
+    if len(raw) <= threshold:
+        return value
+
+    data = codec.compress(raw)
+    if len(data) >= len(raw):
+        return value
+    return CompressedValue(codec_name(codec), data, len(raw))
+
+
+def decompress(value, codec):
+    """
+    Return the original value of the ``CompressedValue`` ``value``.
+    ``codec`` is the codec of the cache; built-in codecs are always
+    available.
+    """
+    if value.codec == codec_name(codec):
+        raw = codec.decompress(value.data)
+    else:
+        raw = get_codec(value.codec).decompress(value.data)
+    return pickle.loads(raw)
@@ -0,0 +1,459 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""
+A disk-backed second-level (L2) tier for ``yamicache.Cache``.
+
+Items evicted from a bounded cache are written to a ``DiskTier``, and cache
+misses check the tier before calling the function.  Items found there are
+promoted back to memory (and removed from the tier).
+
+The tier is a directory with:
+
+* Segment files (``00000001.seg``, ...): Records are appended to the newest
+  segment.  Each record is ``<length: uint32> <crc32: uint32>`` followed by
+  the pickled ``(key, value)``.  A new segment is started when the newest
+  one reaches ``segment_bytes``.
+* ``index``: A memory-mapped, open-addressing hash table of fixed-size slots,
+  ``<key hash: uint64> <segment: uint32> <offset: uint64> <length: uint32>``.
+  Key hashes are calculated from the pickled key, so they're the same in
+  every process.  Empty slots have a hash of 0; removed items leave a
+  *tombstone* with a length of 0.  The table is rebuilt twice as large when
+  it's 70% used.
+
+When a segment is sealed, older segments with less than ``compact_ratio``
+of their records still in use are *compacted*: their records are copied to
+the newest segment, and the files are deleted.  Then the oldest segments are
+dropped until the segments fit in ``max_bytes``.
+"""
+
+# Imports #####################################################################
+import os
+import mmap
+import zlib
+import pickle
+import struct
+from hashlib import blake2b
+from threading import Lock
+
+
+# Globals #####################################################################
+__all__ = ["DiskTier"]
+
+_SLOT = struct.Struct("<QIQI")
+_RECORD_HEADER = struct.Struct("<II")
+
+_INDEX_FILENAME = "index"
+_SEGMENT_SUFFIX = ".seg"
+
+# The index is rebuilt when this fraction of the slots are used
+_MAX_LOAD = 0.7
+
+_MISSING = object()
+
+
+def _key_hash(key):
+    """A 64-bit hash of ``key`` that's stable across processes (never 0)"""
+    digest = blake2b(pickle.dumps(key, 4), digest_size=8).digest()
+    return int.from_bytes(digest, "little") or 1
+
+
+class _Segment(object):
+    __slots__ = ("id", "file", "size", "live_bytes")
+
+    def __init__(self, id, file, size):
+        self.id = id
+        self.file = file
+        self.size = size
+        self.live_bytes = 0
+
+
+class DiskTier(object):
+    """
+    A disk-backed store for items evicted from a ``Cache``.  Pass it to
+    ``Cache(l2=...)``.
+
+    :param str directory: Where the files are stored.  It's created if it
+        doesn't exist.  Items stored by an earlier ``DiskTier`` in the same
+        directory are kept.
+    :param int max_bytes: If > 0, the oldest segment files are removed when
+        the total size of the segments is larger than this.
+    :param int segment_bytes: The size at which a new segment file is
+        started.
+    :param int index_slots: The initial number of index slots
+    :param float compact_ratio: Sealed segments with less than this fraction
+        of their bytes in use are compacted.
+
+    ``on_drop`` can be set to a function that's called with the ``list`` of
+    keys removed when a segment is dropped to fit in ``max_bytes``.  It's
+    called while the tier is locked, so it can't use the tier.
+    """
+
+    def __init__(
+        self,
+        directory,
+        max_bytes=None,
+        segment_bytes=64 * 1024 * 1024,
+        index_slots=1 << 16,
+        compact_ratio=0.5,
+    ):
+        if max_bytes is not None and (not isinstance(max_bytes, int) or max_bytes < 1):
+            raise ValueError("max_bytes can only be an `int` > 0")
+        elif not isinstance(segment_bytes, int) or segment_bytes < 1:
+            raise ValueError("segment_bytes can only be an `int` > 0")
+        elif not isinstance(index_slots, int) or index_slots < 1:
+            raise ValueError("index_slots can only be an `int` > 0")
+
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.segment_bytes = segment_bytes
+        if max_bytes:
+            # Keep a few segments, so dropping the oldest doesn't drop
+            # everything
+            self.segment_bytes = min(segment_bytes, max_bytes // 4 or 1)
+        self.compact_ratio = compact_ratio
+        self._lock = Lock()
+        self._segments = {}  # By id, oldest first
+        self.on_drop = None
+
+        os.makedirs(directory, exist_ok=True)
+        self._open(index_slots)
+
+    # Files ###################################################################
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _open(self, index_slots):
+        index_path = self._path(_INDEX_FILENAME)
+        segment_ids = sorted(
+            int(name[: -len(_SEGMENT_SUFFIX)])
+            for name in os.listdir(self.directory)
+            if name.endswith(_SEGMENT_SUFFIX)
+        )
+
+        if not os.path.exists(index_path):
+            # The segments can't be used without the index
+            for segment_id in segment_ids:
+                os.remove(self._segment_path(segment_id))
+            segment_ids = []
+            self._create_index(index_path, index_slots)
+
+        self._index_file = open(index_path, "r+b")
+        self._index = mmap.mmap(self._index_file.fileno(), 0)
+        self._slots = len(self._index) // _SLOT.size
+
+        for segment_id in segment_ids:
+            path = self._segment_path(segment_id)
+            self._segments[segment_id] = _Segment(
+                segment_id, open(path, "r+b"), os.path.getsize(path)
+            )
+
+        self._used = self._count = 0
+        entries = list(_SLOT.iter_unpack(self._index))
+        for slot, (key_hash, segment_id, _, length) in enumerate(entries):
+            if key_hash:
+                self._used += 1
+            if length and (segment_id not in self._segments):
+                # The segment file was removed
+                self._write_slot(slot, key_hash, 0, 0, 0)
+            elif length:
+                self._count += 1
+                self._segments[segment_id].live_bytes += length
+
+        if not self._segments:
+            self._new_segment()
+
+    def _create_index(self, path, slots):
+        with open(path, "wb") as fh:
+            fh.truncate(slots * _SLOT.size)
+
+    def _segment_path(self, segment_id):
+        return self._path("%08d%s" % (segment_id, _SEGMENT_SUFFIX))
+
+    def _new_segment(self):
+        segment_id = max(self._segments, default=0) + 1
+        segment = _Segment(segment_id, open(self._segment_path(segment_id), "w+b"), 0)
+        self._segments[segment_id] = segment
+        return segment
+
+    def _active_segment(self):
+        return self._segments[max(self._segments)]
+
+    def _remove_segment(self, segment):
+        del self._segments[segment.id]
+        segment.file.close()
+        os.remove(self._segment_path(segment.id))
+
+    # Index ###################################################################
+    def _find(self, key_hash):
+        """
+        Return ``(slot, free)``: The slot holding ``key_hash`` (or ``None``),
+        and the first slot that can be used to insert it.
+        """
+        slot = key_hash % self._slots
+        free = None
+        for _ in range(self._slots):
+            found_hash, _, _, length = _SLOT.unpack_from(self._index, slot * _SLOT.size)
+            if not found_hash:
+                return None, slot if free is None else free
+            elif length and (found_hash == key_hash):
+                return slot, free
+            elif (not length) and (free is None):
+                free = slot
+            slot = (slot + 1) % self._slots
+        return None, free
+
+    def _read_slot(self, slot):
+        return _SLOT.unpack_from(self._index, slot * _SLOT.size)
+
+    def _write_slot(self, slot, key_hash, segment_id, offset, length):
+        _SLOT.pack_into(
+            self._index, slot * _SLOT.size, key_hash, segment_id, offset, length
+        )
+
+    def _insert(self, key_hash, segment_id, offset, length):
+        if (self._used + 1) > (self._slots * _MAX_LOAD):
+            self._resize(max(self._slots, self._count * 2))
+
+        slot, free = self._find(key_hash)
+        if slot is None:
+            slot = free
+            if not self._read_slot(slot)[0]:
+                self._used += 1
+            self._count += 1
+        else:
+            self._release(slot)
+            self._count += 1
+
+        self._write_slot(slot, key_hash, segment_id, offset, length)
+        self._segments[segment_id].live_bytes += length
+
+    def _release(self, slot):
+        """Turn ``slot`` into a tombstone"""
+        key_hash, segment_id, _, length = self._read_slot(slot)
+        self._write_slot(slot, key_hash, 0, 0, 0)
+        self._segments[segment_id].live_bytes -= length
+        self._count -= 1
+
+    def _resize(self, slots):
+        """Rebuild the index with ``slots`` slots, without the tombstones"""
+        entries = [
+            entry for entry in _SLOT.iter_unpack(self._index) if entry[3]  # length
+        ]
+
+        temp_path = self._path(_INDEX_FILENAME + ".tmp")
+        self._create_index(temp_path, slots)
+        self._index.close()
+        self._index_file.close()
+        os.replace(temp_path, self._path(_INDEX_FILENAME))
+
+        self._index_file = open(self._path(_INDEX_FILENAME), "r+b")
+        self._index = mmap.mmap(self._index_file.fileno(), 0)
+        self._slots = slots
+        self._used = len(entries)
+
+        for key_hash, segment_id, offset, length in entries:
+            _, free = self._find(key_hash)
+            self._write_slot(free, key_hash, segment_id, offset, length)
+
+    # Records #################################################################
+    def _read(self, slot, key):
+        """Return the value in ``slot`` if it's the record of ``key``"""
+        _, segment_id, offset, length = self._read_slot(slot)
+        fh = self._segments[segment_id].file
+        fh.seek(offset)
+        record = fh.read(length)
+
+        payload = record[_RECORD_HEADER.size :]
+        if (len(record) < _RECORD_HEADER.size) or (
+            _RECORD_HEADER.unpack_from(record) != (len(payload), zlib.crc32(payload))
+        ):
+            # A write was interrupted
+            self._release(slot)
+            return _MISSING
+
+        found_key, value = pickle.loads(payload)
+        if found_key != key:
+            # A hash collision
+            return _MISSING
+        return value
+
+    def _append(self, record):
+        """Append ``record`` to the active segment; return it and the offset"""
+        segment = self._active_segment()
+        if segment.size and (segment.size + len(record) > self.segment_bytes):
+            self._seal()
+            segment = self._active_segment()
+
+        offset = segment.size
+        segment.file.seek(offset)
+        segment.file.write(record)
+        segment.size += len(record)
+        return segment, offset
+
+    def _seal(self):
+        """Start a new segment, and compact or drop the old ones"""
+        self._new_segment()
+        self._compact()
+
+        # Leave room for the new segment
+        while self.max_bytes and (
+            self.total_bytes + self.segment_bytes > self.max_bytes
+        ):
+            oldest = self._segments[min(self._segments)]
+            if oldest is self._active_segment():
+                break
+            self._drop(oldest)
+
+    def _segment_slots(self, segment):
+        """Yield the slots that point to records in ``segment``"""
+        for slot, (_, segment_id, _, length) in enumerate(
+            _SLOT.iter_unpack(self._index)
+        ):
+            if length and (segment_id == segment.id):
+                yield slot
+
+    def _read_key(self, slot):
+        """Return the key of the record in ``slot``, or ``_MISSING``"""
+        _, segment_id, offset, length = self._read_slot(slot)
+        fh = self._segments[segment_id].file
+        fh.seek(offset)
+        record = fh.read(length)
+
+        payload = record[_RECORD_HEADER.size :]
+        if (len(record) < _RECORD_HEADER.size) or (
+            _RECORD_HEADER.unpack_from(record) != (len(payload), zlib.crc32(payload))
+        ):
+            return _MISSING
+
+        try:
+            return pickle.loads(payload)[0]
+        except Exception:
+            # The value's class may be gone
+            return _MISSING
+
+    def _drop(self, segment):
+        """Remove ``segment`` and the items in it"""
+        slots = list(self._segment_slots(segment))
+        if self.on_drop is not None:
+            keys = [self._read_key(slot) for slot in slots]
+            self.on_drop([key for key in keys if key is not _MISSING])
+
+        for slot in slots:
+            self._release(slot)
+        self._remove_segment(segment)
+
+    def _compact(self):
+        active = self._active_segment()
+        for segment in list(self._segments.values()):
+            if (segment is active) or (
+                segment.live_bytes
+                and (segment.live_bytes >= segment.size * self.compact_ratio)
+            ):
+                continue
+
+            for slot in list(self._segment_slots(segment)):
+                key_hash, _, offset, length = self._read_slot(slot)
+                segment.file.seek(offset)
+                record = segment.file.read(length)
+
+                # Copy without sealing; this is part of sealing
+                new_offset = active.size
+                active.file.seek(new_offset)
+                active.file.write(record)
+                active.size += length
+
+                self._release(slot)
+                self._write_slot(slot, key_hash, active.id, new_offset, length)
+                active.live_bytes += length
+                self._count += 1
+
+            self._remove_segment(segment)
+
+    # Public ##################################################################
+    def __len__(self):
+        return self._count
+
+    @property
+    def total_bytes(self):
+        """The total size of the segment files"""
+        return sum(segment.size for segment in self._segments.values())
+
+    def get(self, key, default=None):
+        """Return the value stored for ``key``"""
+        with self._lock:
+            slot, _ = self._find(_key_hash(key))
+            if slot is None:
+                return default
+            value = self._read(slot, key)
+            return default if value is _MISSING else value
+
+    def pop(self, key, default=None):
+        """Remove ``key`` and return its value"""
+        with self._lock:
+            slot, _ = self._find(_key_hash(key))
+            if slot is None:
+                return default
+
+            value = self._read(slot, key)
+            if value is _MISSING:
+                return default
+            self._release(slot)
+            return value
+
+    def put(self, key, value):
+        """
+        Store ``value`` for ``key``.  Returns ``False`` if it can't be stored
+        (it can't be pickled, or it's larger than ``max_bytes``).
+        """
+        try:
+            payload = pickle.dumps((key, value), -1)
+        except Exception:
+            return False
+
+        record = _RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+        if self.max_bytes and (len(record) > self.max_bytes):
+            return False
+
+        with self._lock:
+            segment, offset = self._append(record)
+            self._insert(_key_hash(key), segment.id, offset, len(record))
+        return True
+
+    def discard(self, key):
+        """Remove ``key``, if it's stored"""
+        if not self._count:
+            return
+
+        with self._lock:
+            slot, _ = self._find(_key_hash(key))
+            if slot is not None:
+                self._release(slot)
+
+    def compact(self):
+        """Compact sparse segments now, instead of when a segment is sealed"""
+        with self._lock:
+            self._seal()
+
+    def clear(self):
+        """Remove all items"""
+        with self._lock:
+            for segment in list(self._segments.values()):
+                self._remove_segment(segment)
+            self._index[:] = bytes(len(self._index))
+            self._used = self._count = 0
+            self._new_segment()
+
+    def flush(self):
+        """Write the index and the segments to disk"""
+        with self._lock:
+            for segment in self._segments.values():
+                segment.file.flush()
+            self._index.flush()
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            for segment in self._segments.values():
+                segment.file.close()
+            self._index.close()
+            self._index_file.close()
@@ -0,0 +1,276 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""
+An append-only log of the changes made to a ``yamicache.Cache``.
+
+``Cache.serialize()`` writes the whole cache every time it's called.  The log
+only writes what changed: each insert, delete (including evictions and
+expired items), and clear is appended to ``<filename>.log`` as a framed
+record.  Records are written, and ``fsync()``-ed, in batches by a background
+thread.  When the log grows larger than the last snapshot, the cache is
+written to ``<filename>`` (in the ``serialize()`` format) and the log is
+started over.
+
+``Cache.deserialize(<filename>)`` reads the snapshot and replays the log.
+
+Each record is framed as::
+
+    <length: uint32> <crc32: uint32> <pickle of (operation, key, item)>
+
+A torn (or corrupt) record at the end of the log, e.g. from a crash in the
+middle of a write, ends the replay.
+
+The first record of a log is ``(SNAPSHOT, <digest>, None)``, with the digest
+of the snapshot it was started after.  A log that doesn't match the snapshot,
+e.g. after a crash between writing a new snapshot and starting the new log,
+isn't replayed: its changes are already in the snapshot.
+"""
+
+# Imports #####################################################################
+import os
+import zlib
+import pickle
+import struct
+import collections
+from hashlib import blake2b
+from threading import Event, Lock, Thread
+
+
+# Globals #####################################################################
+__all__ = ["AppendLog", "read_log", "replay"]
+
+SET = 1
+DELETE = 2
+CLEAR = 3
+SNAPSHOT = 4
+
+_HEADER = struct.Struct("<II")
+
+# Don't bother compacting logs smaller than this
+COMPACT_MIN_BYTES = 1 << 20
+
+
+def log_filename(filename):
+    """Return the name of the log file for the snapshot ``filename``"""
+    return filename + ".log"
+
+
+def snapshot_digest(data):
+    """Return the digest of the snapshot ``data``, as written to the log"""
+    return blake2b(data, digest_size=16).digest()
+
+
+def _fsync_directory(path):
+    """``fsync()`` the directory of ``path``, so a rename in it is durable"""
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        # Directories can't be opened on Windows
+        return
+
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def read_log(filename):
+    """
+    Yield the ``(operation, key, item)`` records in a log file.  Stops at the
+    first incomplete or corrupt record.
+    """
+    with open(filename, "rb") as fh:
+        while True:
+            header = fh.read(_HEADER.size)
+            if len(header) < _HEADER.size:
+                return
+
+            length, crc = _HEADER.unpack(header)
+            payload = fh.read(length)
+            if (len(payload) < length) or (zlib.crc32(payload) != crc):
+                return
+
+            yield pickle.loads(payload)
+
+
+def replay(data, filename, digest):
+    """
+    Apply the records in the log ``filename`` to the ``dict`` ``data``.  The
+    log is ignored unless it was started after the snapshot with ``digest``.
+    """
+    records = read_log(filename)
+    if next(records, None) != (SNAPSHOT, digest, None):
+        return data
+
+    for operation, key, item in records:
+        if operation == SET:
+            data[key] = item
+        elif operation == DELETE:
+            data.pop(key, None)
+        elif operation == CLEAR:
+            data.clear()
+    return data
+
+
+class AppendLog(object):
+    """
+    Writes the changes made to ``cache`` to a log.  This is created by
+    ``Cache.open_log()``.
+
+    Changes are queued by ``append()``, which is called while the cache holds
+    a shard lock, so the records of each key are queued in order.  They're
+    pickled and written by a background thread every ``sync_interval``
+    seconds.
+
+    :param Cache cache: The cache being logged
+    :param str filename: The snapshot file name.  The log is written to
+        ``<filename>.log``.
+    :param float sync_interval: The number of seconds in between writes
+    """
+
+    def __init__(self, cache, filename, sync_interval=1.0):
+        self.cache = cache
+        self.filename = filename
+        self.log_filename = log_filename(filename)
+        self.sync_interval = sync_interval
+        self.queue = collections.deque()
+        self.lock = Lock()
+        self.closed = Event()
+        self.file = None
+        self.log_bytes = 0
+        self.snapshot_bytes = 0
+        self.thread = Thread(target=self._run)
+        self.thread.daemon = True
+
+    def start(self):
+        """
+        Write a snapshot, so the files match the cache, and start the
+        background thread.  The log must already be receiving changes.
+        """
+        self.compact()
+        self.thread.start()
+
+    def append(self, operation, key=None, item=None):
+        self.queue.append((operation, key, item))
+
+    def _run(self):
+        while not self.closed.wait(self.sync_interval):
+            try:
+                self.flush()
+                if self.log_bytes > max(COMPACT_MIN_BYTES, self.snapshot_bytes):
+                    self.compact()
+            except Exception as e:
+                # The records are still queued; try again at the next sync
+                self.cache._debug_print("can't write the log :", e)
+
+    def _encode(self, record):
+        operation, key, item = record
+        if operation == SET:
+            record = (operation, key, self.cache._export_item(item))
+
+        try:
+            payload = pickle.dumps(record, -1)
+        except Exception:
+            # Don't leave an older value in the log
+            self.cache._debug_print("can't log :", key)
+            try:
+                payload = pickle.dumps((DELETE, key, None), -1)
+            except Exception:
+                # The key can't be pickled, so it can't be in the log either
+                return b""
+
+        return _HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+    def _picklable(self, items):
+        """Return the ``(key, item)`` pairs in ``items`` that can be pickled"""
+        for key, item in items:
+            try:
+                pickle.dumps((key, item), -1)
+            except Exception:
+                self.cache._debug_print("can't log :", key)
+                continue
+            yield key, item
+
+    def flush(self):
+        """Write the queued records and ``fsync()`` the log"""
+        with self.lock:
+            if not self.queue or self.file is None:
+                return
+
+            records = []
+            while self.queue:
+                records.append(self.queue.popleft())
+
+            data = b"".join(self._encode(x) for x in records)
+            try:
+                self.file.write(data)
+                self.file.flush()
+                os.fsync(self.file.fileno())
+            except Exception:
+                # Remove any partial record, and keep the records for the next
+                # try, ahead of the ones queued since.
+                self.queue.extendleft(reversed(records))
+                try:
+                    self.file.seek(self.log_bytes)
+                    self.file.truncate()
+                except Exception:
+                    pass
+                raise
+
+            self.log_bytes += len(data)
+
+    def compact(self):
+        """
+        Write a snapshot of the cache and start a new log.  The cache is only
+        locked while its items are copied.
+        """
+        with self.lock:
+            with self.cache._all_shards_locked():
+                items = [
+                    (key, item)
+                    for shard in self.cache._shards
+                    for key, item in shard.data.items()
+                ]
+                # These changes are part of the snapshot
+                self.queue.clear()
+
+            snapshot = {key: self.cache._export_item(item) for key, item in items}
+            try:
+                data = pickle.dumps(snapshot, -1)
+            except Exception:
+                # Leave out the values that can't be pickled, like `_encode()`
+                # does.  This is only slow when there are any.
+                data = pickle.dumps(dict(self._picklable(snapshot.items())), -1)
+
+            temp = self.filename + ".tmp"
+            with open(temp, "wb") as fh:
+                fh.write(data)
+                fh.flush()
+                os.fsync(fh.fileno())
+            self.snapshot_bytes = len(data)
+
+            # Until the new log is started, the old one doesn't match the
+            # snapshot, so it won't be replayed on top of it.
+            os.replace(temp, self.filename)
+            _fsync_directory(self.filename)
+
+            if self.file is not None:
+                self.file.close()
+            self.file = open(self.log_filename, "wb")
+            header = self._encode((SNAPSHOT, snapshot_digest(data), None))
+            self.file.write(header)
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.log_bytes = len(header)
+
+    def close(self):
+        """Stop the background thread, and write the queued records"""
+        self.closed.set()
+        self.thread.join()
+        self.flush()
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
@@ -0,0 +1,356 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""
+Eviction policies used by ``yamicache.Cache`` when the cache is bounded.
+
+A policy only tracks keys; the ``Cache`` owns the data and calls the policy
+while holding its lock.  The policy interface is:
+
+* ``insert(key, cost=None, size=None)``: ``key`` was added to (or replaced
+  in) the cache.  ``cost`` is the number of seconds it took to calculate the
+  value, and ``size`` is its size in bytes, if they're known.
+* ``access(key)``: ``key`` was read by a cache hit
+* ``remove(key)``: ``key`` was removed from the cache.  ``key`` may not be
+  tracked by the policy.
+* ``evict()``: Return the key that should be removed next.  The cache will
+  call ``remove()`` for it.
+* ``clear()``: Forget all keys
+* ``__len__()``: The number of keys being tracked
+
+Policies are created with ``make_policy()``.
+"""
+
+# Imports #####################################################################
+import heapq
+import itertools
+import collections
+
+
+# Globals #####################################################################
+__all__ = [
+    "LRUPolicy",
+    "TinyLFUPolicy",
+    "GDSFPolicy",
+    "CountMinSketch",
+    "make_policy",
+]
+
+_MASK64 = (1 << 64) - 1
+
+# Odd 64-bit multipliers used to derive the sketch row indexes from
+# ``hash(key)``.
+_SEEDS = (
+    0x9E3779B97F4A7C15,
+    0xC2B2AE3D27D4EB4F,
+    0x165667B19E3779F9,
+    0xD6E8FEB86659FD93,
+)
+
+# Used with ``bytearray.translate()`` to halve every counter
+_HALVE = bytes(x >> 1 for x in range(256))
+
+
+class LRUPolicy(object):
+    """Evict the least-recently-used key"""
+
+    def __init__(self, capacity=None):
+        self._order = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._order)
+
+    def insert(self, key, cost=None, size=None):
+        self._order[key] = None
+        self._order.move_to_end(key)
+
+    def access(self, key):
+        if key in self._order:
+            self._order.move_to_end(key)
+
+    def remove(self, key):
+        self._order.pop(key, None)
+
+    def evict(self):
+        return next(iter(self._order))
+
+    def clear(self):
+        self._order.clear()
+
+
+class CountMinSketch(object):
+    """
+    A count-min sketch of 4-bit counters used to estimate how often a key has
+    been seen.  All counters are halved after ``sample_size`` increments so
+    old popularity fades away.
+
+    :param int width: The number of counters per row.  This is rounded up to
+        a power of 2.
+    :param int sample_size: The number of increments between aging.  The
+        default is ``10 * width``.
+    """
+
+    def __init__(self, width, sample_size=None):
+        self._bits = max(4, (width - 1).bit_length())
+        self._width = 1 << self._bits
+        self._rows = [bytearray(self._width) for _ in _SEEDS]
+        self._sample_size = sample_size or (10 * self._width)
+        self._additions = 0
+
+    def _indexes(self, key):
+        shift = 64 - self._bits
+        h = hash(key)
+        return [((h * seed) & _MASK64) >> shift for seed in _SEEDS]
+
+    def increment(self, key):
+        added = False
+        for row, index in zip(self._rows, self._indexes(key)):
+            if row[index] < 15:
+                row[index] += 1
+                added = True
+
+        if added:
+            self._additions += 1
+            if self._additions >= self._sample_size:
+                self.age()
+
+    def frequency(self, key):
+        return min(row[index] for row, index in zip(self._rows, self._indexes(key)))
+
+    def age(self):
+        """Halve all counters"""
+        for row in self._rows:
+            row[:] = row.translate(_HALVE)
+        self._additions //= 2
+
+    def clear(self):
+        for row in self._rows:
+            row[:] = bytes(self._width)
+        self._additions = 0
+
+
+class TinyLFUPolicy(object):
+    """
+    Window TinyLFU: A scan-resistant policy that uses both recency and
+    frequency.
+
+    New keys enter a small LRU *window*.  When the window overflows, its LRU
+    key becomes a candidate for the *main* area, and only replaces the main
+    area's victim if it has been seen more often (according to a
+    ``CountMinSketch``).  The main area is a segmented LRU: keys start out on
+    *probation* and are *protected* once they're hit.
+
+    A one-time scan of many keys only churns the window, so the popular keys
+    in the main area survive.
+
+    :param int capacity: The expected number of keys.  When ``None`` (e.g.
+        when the cache is only bounded by ``max_bytes``), the segments are
+        sized from the current number of keys.
+    :param float window_ratio: The share of the capacity used by the window
+    :param float protected_ratio: The share of the main area that is
+        protected
+    """
+
+    def __init__(self, capacity=None, window_ratio=0.01, protected_ratio=0.8):
+        self._capacity = capacity
+        self._window_ratio = window_ratio
+        self._protected_ratio = protected_ratio
+        self._window = collections.OrderedDict()
+        self._probation = collections.OrderedDict()
+        self._protected = collections.OrderedDict()
+        # A wide sketch keeps collisions (which inflate the estimates of
+        # one-time keys) rare.
+        capacity = capacity or 1024
+        self._sketch = CountMinSketch(max(256, 4 * capacity), 10 * capacity)
+
+    def __len__(self):
+        return len(self._window) + len(self._probation) + len(self._protected)
+
+    def _window_max(self):
+        return max(1, int((self._capacity or len(self)) * self._window_ratio))
+
+    def _protected_max(self):
+        main = (self._capacity or len(self)) - self._window_max()
+        return max(1, int(main * self._protected_ratio))
+
+    def insert(self, key, cost=None, size=None):
+        self._sketch.increment(key)
+
+        if key in self:
+            self._promote(key)
+        else:
+            self._window[key] = None
+
+    def access(self, key):
+        self._sketch.increment(key)
+        self._promote(key)
+
+    def _promote(self, key):
+        if key in self._window:
+            self._window.move_to_end(key)
+        elif key in self._protected:
+            self._protected.move_to_end(key)
+        elif key in self._probation:
+            del self._probation[key]
+            self._protected[key] = None
+
+            # Demote the LRU protected key back to probation
+            while len(self._protected) > self._protected_max():
+                demoted, _ = self._protected.popitem(last=False)
+                self._probation[demoted] = None
+
+    def __contains__(self, key):
+        return (
+            (key in self._window)
+            or (key in self._probation)
+            or (key in self._protected)
+        )
+
+    def remove(self, key):
+        self._window.pop(key, None)
+        self._probation.pop(key, None)
+        self._protected.pop(key, None)
+
+    def _main_victim(self):
+        for segment in (self._probation, self._protected):
+            if segment:
+                return next(iter(segment))
+        return None
+
+    def _main_has_room(self):
+        if not (self._probation or self._protected):
+            return True
+        elif self._capacity is None:
+            # We're only asked to evict when the cache is full
+            return False
+
+        main = len(self._probation) + len(self._protected)
+        return main < (self._capacity - self._window_max())
+
+    def evict(self):
+        while self._window and (
+            len(self._window) > self._window_max() or self._main_victim() is None
+        ):
+            candidate = next(iter(self._window))
+            if self._main_has_room():
+                del self._window[candidate]
+                self._probation[candidate] = None
+                continue
+
+            # The window's LRU key competes with the main area's victim for a
+            # spot in the main area.  Ties go to the incumbent.
+            victim = self._main_victim()
+            if self._sketch.frequency(candidate) > self._sketch.frequency(victim):
+                del self._window[candidate]
+                self._probation[candidate] = None
+                return victim
+            return candidate
+
+        victim = self._main_victim()
+        return victim if victim is not None else next(iter(self._window))
+
+    def clear(self):
+        self._window.clear()
+        self._probation.clear()
+        self._protected.clear()
+        self._sketch.clear()
+
+
+class GDSFPolicy(object):
+    """
+    GreedyDual-Size-Frequency: A cost-aware policy that evicts the key with
+    the lowest priority::
+
+        priority = clock + frequency * cost / size
+
+    ``cost`` is the time it took to calculate the value, so values that are
+    cheap to calculate (or large) are evicted first.  ``clock`` is set to the
+    priority of each evicted key, so keys that haven't been used in a while
+    are eventually evicted, however costly they are.
+
+    :param int capacity: Not used
+    :param float default_cost: The cost of keys inserted without one (e.g.
+        items that were stored directly instead of by a cached function)
+    """
+
+    def __init__(self, capacity=None, default_cost=1.0):
+        self._default_cost = default_cost
+        self._clock = 0.0
+        # key: [priority, frequency, cost, size, sequence]
+        self._entries = {}
+        # A min-heap of `(priority, sequence, key)`.  Entries aren't removed
+        # when their key is, or when it gets a new priority; `evict()` skips
+        # entries whose sequence doesn't match.
+        self._heap = []
+        self._sequence = itertools.count()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _push(self, key, entry):
+        entry[0] = self._clock + (entry[1] * entry[2] / entry[3])
+        entry[4] = next(self._sequence)
+        heapq.heappush(self._heap, (entry[0], entry[4], key))
+
+        if len(self._heap) > (2 * len(self._entries) + 64):
+            self._heap = [
+                (x[0], x[4], key) for key, x in self._entries.items()
+            ]
+            heapq.heapify(self._heap)
+
+    def insert(self, key, cost=None, size=None):
+        entry = self._entries.get(key)
+        frequency = (entry[1] + 1) if entry else 1
+        entry = self._entries[key] = [
+            0.0,
+            frequency,
+            self._default_cost if cost is None else cost,
+            max(size or 1, 1),
+            0,
+        ]
+        self._push(key, entry)
+
+    def access(self, key):
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry[1] += 1
+            self._push(key, entry)
+
+    def remove(self, key):
+        self._entries.pop(key, None)
+
+    def evict(self):
+        while True:
+            priority, sequence, key = self._heap[0]
+            entry = self._entries.get(key)
+            if (entry is not None) and (entry[4] == sequence):
+                self._clock = priority
+                return key
+            heapq.heappop(self._heap)
+
+    def clear(self):
+        self._entries.clear()
+        del self._heap[:]
+        self._clock = 0.0
+
+
+POLICIES = {"lru": LRUPolicy, "tinylfu": TinyLFUPolicy, "gdsf": GDSFPolicy}
+
+
+def make_policy(policy, capacity=None):
+    """
+    Create an eviction policy.
+
+    :param policy: The name of the policy (a key in ``POLICIES``), or a
+        policy object, which is returned as-is.
+    :param int capacity: The expected number of keys, if known
+    """
+    if not isinstance(policy, str):
+        return policy
+
+    try:
+        return POLICIES[policy](capacity=capacity)
+    except KeyError:
+        raise ValueError(
+            "unknown policy '%s'; use one of: %s"
+            % (policy, ", ".join(sorted(POLICIES)))
+        )
@@ -0,0 +1,499 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""
+A cache store in shared memory, so processes on the same host (e.g. pre-fork
+web server workers, or a process pool) share cached items.
+
+``SharedMemoryStore`` is used in place of the ``dict`` that holds the items
+of a ``Cache``::
+
+    c = Cache(store=SharedMemoryStore("myapp"))
+
+``@c.cached()`` works as usual.  Each process creates its own ``Cache``; the
+first ``SharedMemoryStore`` with a name creates the shared memory, and the
+others attach to it.
+
+The shared memory holds a fixed-size, set-associative hash table: each key
+hashes to a *bucket* of ``ways`` entries, and each bucket has its own region
+of ``region_bytes`` in the value arena.  Keys and values are stored pickled,
+and values are unpickled straight from the shared memory (through a
+``memoryview``) without copying it.  When a bucket is full, its expired
+items, and then its oldest items, are replaced.  When its region is full, the
+region is compacted, and the oldest items are removed until the new one
+fits.
+
+Each bucket is locked while it's used.  A bucket lock is an ``fcntl()``
+lock on a byte of a lock file (so it works between processes), plus a
+thread lock (since ``fcntl()`` locks are per-process).  This module is only
+available on POSIX systems, with Python 3.8 or later (for
+``multiprocessing.shared_memory``).
+
+Item timeouts are ``time.monotonic()`` values, which use a system-wide
+clock, so they mean the same thing in every process on the host.
+"""
+
+# Imports #####################################################################
+import os
+import time
+import fcntl
+import pickle
+import struct
+import tempfile
+import collections.abc
+from hashlib import blake2b
+from threading import Lock
+from multiprocessing import shared_memory
+
+from .yamicache import CachedItem, INIT_CACHE_VALUE
+
+
+# Globals #####################################################################
+__all__ = ["SharedMemoryStore"]
+
+_MAGIC = b"YAMI"
+_VERSION = 1
+
+# magic, version, buckets, ways, region_bytes
+_HEADER = struct.Struct("<4sIIIQ")
+_HEADER_BYTES = 64
+
+# The number of items, and INIT placeholders, in each bucket
+_COUNTS = struct.Struct("<II")
+
+# The number of region bytes in use
+_BUCKET_HEADER = struct.Struct("<Q")
+
+# key hash, offset (in the bucket region), key length, value length,
+# timeout, time added, flags
+_ENTRY = struct.Struct("<QQIIddI4x")
+_INIT_FLAG = 1
+
+_THREAD_LOCKS = 64
+_MISSING = object()
+
+
+def _key_bytes(key):
+    return pickle.dumps(key, 4)
+
+
+class SharedMemoryStore(collections.abc.MutableMapping):
+    """
+    A ``MutableMapping`` of cache keys to ``CachedItem`` objects, stored in
+    shared memory.  Pass it to ``Cache(store=...)``.
+
+    :param str name: The name of the shared memory block.  Stores with the
+        same name share items.
+    :param int buckets: The number of buckets in the hash table
+    :param int ways: The number of items each bucket can hold
+    :param int region_bytes: The number of bytes for the pickled keys and
+        values of each bucket.  Larger items aren't stored.
+    :param bool create: ``True`` to create the shared memory, ``False`` to
+        attach to it.  The default, ``None``, creates it if it doesn't
+        exist.  The table size of an existing block is used when attaching.
+    :param str lock_path: The lock file.  It defaults to a file named after
+        ``name`` in the temporary directory.
+    """
+
+    def __init__(
+        self,
+        name,
+        buckets=4096,
+        ways=8,
+        region_bytes=16 * 1024,
+        create=None,
+        lock_path=None,
+    ):
+        for param, value in (
+            ("buckets", buckets),
+            ("ways", ways),
+            ("region_bytes", region_bytes),
+        ):
+            if not isinstance(value, int) or value < 1:
+                raise ValueError("%s can only be an `int` > 0" % param)
+
+        self.name = name
+        self.lock_path = lock_path or os.path.join(
+            tempfile.gettempdir(), "yamicache-%s.lock" % name
+        )
+        self._lock_fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+        self._thread_locks = [Lock() for _ in range(_THREAD_LOCKS)]
+
+        size = self._layout(buckets, ways, region_bytes)
+        self._shm = None
+        if create is not False:
+            try:
+                self._shm = self._open_shm(create=True, size=size)
+                _HEADER.pack_into(
+                    self._shm.buf, 0, _MAGIC, _VERSION, buckets, ways, region_bytes
+                )
+            except FileExistsError:
+                if create:
+                    raise
+
+        if self._shm is None:
+            self._shm = self._open_shm(create=False)
+            self._layout(*self._read_header())
+
+        self._buf = self._shm.buf
+        self._counts = self._buf[
+            _HEADER_BYTES : _HEADER_BYTES + (self.buckets * _COUNTS.size)
+        ].cast("I")
+
+    def _open_shm(self, create, size=0):
+        shm = shared_memory.SharedMemory(self.name, create=create, size=size)
+
+        # The block is shared by unrelated processes; don't let the resource
+        # tracker unlink it when one of them exits.  See `unlink()`.
+        try:
+            from multiprocessing import resource_tracker
+
+            resource_tracker.unregister(shm._name, "shared_memory")
+        except Exception:  # pragma: no cover
+            pass
+
+        return shm
+
+    def _read_header(self):
+        # The creator writes the header right after creating the block
+        deadline = time.monotonic() + 1
+        while True:
+            magic, version, buckets, ways, region_bytes = _HEADER.unpack_from(
+                self._shm.buf, 0
+            )
+            if magic == _MAGIC:
+                break
+            elif time.monotonic() > deadline:
+                raise ValueError("%r is not a yamicache store" % self.name)
+            time.sleep(0.001)
+
+        if version != _VERSION:
+            raise ValueError("%r has an unsupported version" % self.name)
+        return buckets, ways, region_bytes
+
+    def _layout(self, buckets, ways, region_bytes):
+        """Set the table size and offsets; return the size of the block"""
+        self.buckets = buckets
+        self.ways = ways
+        self.region_bytes = region_bytes
+        self._bucket_bytes = _BUCKET_HEADER.size + (ways * _ENTRY.size)
+        self._buckets_offset = _HEADER_BYTES + (buckets * _COUNTS.size)
+        self._regions_offset = self._buckets_offset + (buckets * self._bucket_bytes)
+        return self._regions_offset + (buckets * region_bytes)
+
+    def __reduce__(self):
+        # Attach by name when sent to another process
+        return (
+            SharedMemoryStore,
+            (self.name, self.buckets, self.ways, self.region_bytes, False),
+            {"lock_path": self.lock_path},
+        )
+
+    def __setstate__(self, state):
+        if state["lock_path"] != self.lock_path:
+            os.close(self._lock_fd)
+            self.lock_path = state["lock_path"]
+            self._lock_fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+
+    # Buckets #################################################################
+    def _locate(self, key_bytes):
+        """Return the key hash (never 0) and the bucket of a key"""
+        digest = blake2b(key_bytes, digest_size=8).digest()
+        key_hash = int.from_bytes(digest, "little") or 1
+        return key_hash, key_hash % self.buckets
+
+    def _lock(self, bucket):
+        self._thread_locks[bucket % _THREAD_LOCKS].acquire()
+        try:
+            fcntl.lockf(self._lock_fd, fcntl.LOCK_EX, 1, bucket)
+        except BaseException:
+            self._thread_locks[bucket % _THREAD_LOCKS].release()
+            raise
+
+    def _unlock(self, bucket):
+        try:
+            fcntl.lockf(self._lock_fd, fcntl.LOCK_UN, 1, bucket)
+        finally:
+            self._thread_locks[bucket % _THREAD_LOCKS].release()
+
+    def _entry_offset(self, bucket, way):
+        return (
+            self._buckets_offset
+            + (bucket * self._bucket_bytes)
+            + _BUCKET_HEADER.size
+            + (way * _ENTRY.size)
+        )
+
+    def _region_offset(self, bucket):
+        return self._regions_offset + (bucket * self.region_bytes)
+
+    def _entries(self, bucket):
+        """Yield ``(way, entry)`` for the items in ``bucket``"""
+        for way in range(self.ways):
+            entry = _ENTRY.unpack_from(self._buf, self._entry_offset(bucket, way))
+            if entry[0]:
+                yield way, entry
+
+    def _find(self, bucket, key_hash, key_bytes):
+        """Return ``(way, entry)`` for a key, or ``(None, None)``"""
+        region = self._region_offset(bucket)
+        for way, entry in self._entries(bucket):
+            found_hash, offset, key_length = entry[:3]
+            if (
+                (found_hash == key_hash)
+                and (key_length == len(key_bytes))
+                and (
+                    self._buf[region + offset : region + offset + key_length]
+                    == key_bytes
+                )
+            ):
+                return way, entry
+        return None, None
+
+    def _load_item(self, bucket, entry):
+        _, offset, key_length, value_length, timeout, time_added, flags = entry
+        if flags & _INIT_FLAG:
+            return INIT_CACHE_VALUE
+
+        start = self._region_offset(bucket) + offset + key_length
+        value, function, cost, tags = pickle.loads(
+            self._buf[start : start + value_length]
+        )
+        return CachedItem(value, timeout or None, time_added, function, cost, tags)
+
+    def _load_key(self, bucket, entry):
+        start = self._region_offset(bucket) + entry[1]
+        return pickle.loads(self._buf[start : start + entry[2]])
+
+    def _update_counts(self, bucket, entry, delta):
+        self._counts[bucket * 2] += delta
+        if entry[6] & _INIT_FLAG:
+            self._counts[(bucket * 2) + 1] += delta
+
+    def _free(self, bucket, way, entry):
+        """Remove the item in ``way``"""
+        _ENTRY.pack_into(
+            self._buf, self._entry_offset(bucket, way), 0, 0, 0, 0, 0.0, 0.0, 0
+        )
+        self._update_counts(bucket, entry, -1)
+
+    def _victim(self, bucket, now):
+        """Return the ``(way, entry)`` to replace: expired, then oldest"""
+        entries = list(self._entries(bucket))
+        for way, entry in entries:
+            timeout = entry[4]
+            if timeout and (timeout < now):
+                return way, entry
+
+        # INIT placeholders are only replaced if there's nothing else
+        return min(entries, key=lambda x: (not (x[1][6] & _INIT_FLAG), x[1][5]))
+
+    def _compact(self, bucket):
+        """Move the items in the bucket region together; return the used size"""
+        region = self._region_offset(bucket)
+        used = 0
+        for way, entry in sorted(self._entries(bucket), key=lambda x: x[1][1]):
+            length = entry[2] + entry[3]
+            if entry[1] != used:
+                start = region + entry[1]
+                data = bytes(self._buf[start : start + length])
+                self._buf[region + used : region + used + length] = data
+                _ENTRY.pack_into(
+                    self._buf,
+                    self._entry_offset(bucket, way),
+                    entry[0],
+                    used,
+                    *entry[2:]
+                )
+            used += length
+        return used
+
+    # MutableMapping ##########################################################
+    def __len__(self):
+        return sum(self._counts[::2])
+
+    def count_items(self):
+        """The number of items, not counting INIT placeholders"""
+        return len(self) - sum(self._counts[1::2])
+
+    def __contains__(self, key):
+        key_bytes = _key_bytes(key)
+        key_hash, bucket = self._locate(key_bytes)
+        self._lock(bucket)
+        try:
+            return self._find(bucket, key_hash, key_bytes)[0] is not None
+        finally:
+            self._unlock(bucket)
+
+    def get(self, key, default=None):
+        key_bytes = _key_bytes(key)
+        key_hash, bucket = self._locate(key_bytes)
+        self._lock(bucket)
+        try:
+            way, entry = self._find(bucket, key_hash, key_bytes)
+            if way is None:
+                return default
+            return self._load_item(bucket, entry)
+        finally:
+            self._unlock(bucket)
+
+    def __getitem__(self, key):
+        item = self.get(key, _MISSING)
+        if item is _MISSING:
+            raise KeyError(key)
+        return item
+
+    def __setitem__(self, key, item):
+        key_bytes = _key_bytes(key)
+        if item is INIT_CACHE_VALUE:
+            value_bytes, timeout, time_added, flags = b"", 0.0, 0.0, _INIT_FLAG
+        else:
+            value_bytes = pickle.dumps(
+                (item.value, item.function, item.cost, item.tags), -1
+            )
+            timeout, time_added, flags = (item.timeout or 0.0), item.time_added, 0
+
+        key_hash, bucket = self._locate(key_bytes)
+        length = len(key_bytes) + len(value_bytes)
+        header_offset = self._buckets_offset + (bucket * self._bucket_bytes)
+
+        self._lock(bucket)
+        try:
+            way, entry = self._find(bucket, key_hash, key_bytes)
+            if way is not None:
+                self._free(bucket, way, entry)
+
+            if length > self.region_bytes:
+                # Too large to store
+                return
+
+            now = time.monotonic()
+            (used,) = _BUCKET_HEADER.unpack_from(self._buf, header_offset)
+            while used + length > self.region_bytes:
+                used = self._compact(bucket)
+                if used + length > self.region_bytes:
+                    self._free(bucket, *self._victim(bucket, now))
+
+            way = next(
+                (
+                    way
+                    for way in range(self.ways)
+                    if not _ENTRY.unpack_from(
+                        self._buf, self._entry_offset(bucket, way)
+                    )[0]
+                ),
+                None,
+            )
+            if way is None:
+                way, entry = self._victim(bucket, now)
+                self._free(bucket, way, entry)
+
+            start = self._region_offset(bucket) + used
+            self._buf[start : start + len(key_bytes)] = key_bytes
+            self._buf[start + len(key_bytes) : start + length] = value_bytes
+
+            entry = (
+                key_hash,
+                used,
+                len(key_bytes),
+                len(value_bytes),
+                timeout,
+                time_added,
+                flags,
+            )
+            _ENTRY.pack_into(self._buf, self._entry_offset(bucket, way), *entry)
+            _BUCKET_HEADER.pack_into(self._buf, header_offset, used + length)
+            self._update_counts(bucket, entry, 1)
+        finally:
+            self._unlock(bucket)
+
+    def pop(self, key, default=_MISSING):
+        key_bytes = _key_bytes(key)
+        key_hash, bucket = self._locate(key_bytes)
+        self._lock(bucket)
+        try:
+            way, entry = self._find(bucket, key_hash, key_bytes)
+            if way is None:
+                if default is _MISSING:
+                    raise KeyError(key)
+                return default
+
+            item = self._load_item(bucket, entry)
+            self._free(bucket, way, entry)
+            return item
+        finally:
+            self._unlock(bucket)
+
+    def __delitem__(self, key):
+        self.pop(key)
+
+    def _scan(self, load_items):
+        for bucket in range(self.buckets):
+            if not self._counts[bucket * 2]:
+                continue
+
+            self._lock(bucket)
+            try:
+                found = [
+                    (
+                        self._load_key(bucket, entry),
+                        self._load_item(bucket, entry) if load_items else None,
+                    )
+                    for _, entry in self._entries(bucket)
+                ]
+            finally:
+                self._unlock(bucket)
+
+            for x in found:
+                yield x
+
+    def __iter__(self):
+        for key, _ in self._scan(load_items=False):
+            yield key
+
+    def __reversed__(self):
+        return reversed(list(self))
+
+    def items(self):
+        return list(self._scan(load_items=True))
+
+    def values(self):
+        return [item for _, item in self._scan(load_items=True)]
+
+    def clear(self):
+        empty = bytes(self._bucket_bytes)
+        for bucket in range(self.buckets):
+            self._lock(bucket)
+            try:
+                start = self._buckets_offset + (bucket * self._bucket_bytes)
+                self._buf[start : start + self._bucket_bytes] = empty
+                self._counts[bucket * 2] = self._counts[(bucket * 2) + 1] = 0
+            finally:
+                self._unlock(bucket)
+
+    # Lifetime ################################################################
+    def close(self):
+        """Detach from the shared memory"""
+        self._counts.release()
+        self._buf = None
+        self._shm.close()
+        os.close(self._lock_fd)
+
+    def unlink(self):
+        """
+        Remove the shared memory block and the lock file.  Processes that are
+        attached can still use it, but new stores with the same name will
+        create a new block.
+        """
+        try:
+            from multiprocessing import resource_tracker
+
+            # `SharedMemory.unlink()` unregisters the block again
+            resource_tracker.register(self._shm._name, "shared_memory")
+        except Exception:  # pragma: no cover
+            pass
+
+        self._shm.unlink()
+        try:
+            os.remove(self.lock_path)
+        except OSError:
+            pass
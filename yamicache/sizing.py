@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""
+Functions used to estimate the memory used by cached values.
+
+A *sizer* is any callable that takes a cached value and returns its size in
+bytes.  ``estimate_size`` is the default used by ``yamicache.Cache``.
+"""
+
+# Imports #####################################################################
+import sys
+
+
+# Globals #####################################################################
+__all__ = ["estimate_size", "shallow_size"]
+
+# Types that can't contain other objects.  Their ``sys.getsizeof()`` is
+# already the full size.
+_ATOMIC_TYPES = (str, bytes, bytearray, int, float, complex, bool, type(None))
+_SEQUENCE_TYPES = (list, tuple, set, frozenset)
+
+
+def shallow_size(value):
+    """
+    Return ``sys.getsizeof(value)``, or the buffer size for objects that
+    expose one (e.g. ``memoryview`` and NumPy arrays).
+    """
+    if isinstance(value, memoryview):
+        return sys.getsizeof(value) + value.nbytes
+
+    nbytes = getattr(value, "nbytes", None)
+    if isinstance(nbytes, int):
+        return max(sys.getsizeof(value), nbytes)
+
+    return sys.getsizeof(value)
+
+
+def estimate_size(value):
+    """
+    Estimate the size of ``value`` in bytes.
+
+    This is the shallow size of ``value`` plus the shallow size of everything
+    reachable through ``list``, ``tuple``, ``set``, ``frozenset``, and
+    ``dict`` containers.  Other objects are not walked; use a custom sizer if
+    you cache objects that hold their data in attributes.
+    """
+    total = 0
+    seen = set()
+    stack = [value]
+
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+
+        seen.add(id(obj))
+        total += shallow_size(obj)
+
+        if isinstance(obj, _ATOMIC_TYPES):
+            continue
+        elif isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, _SEQUENCE_TYPES):
+            stack.extend(obj)
+
+    return total
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""
+Always-on statistics for ``@cached()`` functions.
+
+Each decorated function has a ``FunctionStats`` object, which is available as
+``function.stats`` and through ``Cache.stats()``.  Counts are kept per thread,
+so counting never takes a lock; reading them adds up the counts of every
+thread.
+"""
+
+# Imports #####################################################################
+import weakref
+import collections
+import threading
+
+
+# Globals #####################################################################
+__all__ = ["FunctionStats", "Stats"]
+
+HITS, MISSES, EXPIRATIONS, EVICTIONS, COMPUTE_TIME, REJECTIONS = range(6)
+
+Stats = collections.namedtuple(
+    "Stats", "hits misses expirations evictions compute_time rejections"
+)
+
+_ZERO = (0, 0, 0, 0, 0.0, 0)
+
+
+class FunctionStats(object):
+    """
+    The statistics of a cached function:
+
+    * ``hits``: Calls that returned a cached result (including stale results)
+    * ``misses``: Calls that didn't find a cached result
+    * ``expirations``: Items that were removed or replaced after timing out
+    * ``evictions``: Items removed to keep the cache within its limits
+    * ``compute_time``: The total number of seconds spent calling the function
+    * ``rejections``: Results that weren't cached because they failed the
+      function's admission thresholds
+
+    :param str name: The qualified name of the function
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._cells = []  # The counts of each thread
+        self._retired = list(_ZERO)  # The counts of finished threads
+
+    def _new_cell(self):
+        cell = self._local.cell = list(_ZERO)
+        with self._lock:
+            self._cells.append(cell)
+
+        # Don't keep a cell for every thread that ever counted something
+        weakref.finalize(threading.current_thread(), self._retire, cell)
+        return cell
+
+    def _retire(self, cell):
+        with self._lock:
+            self._cells = [x for x in self._cells if x is not cell]
+            self._retired = [x + y for x, y in zip(self._retired, cell)]
+
+    def add(self, index, amount=1):
+        """Add ``amount`` to a count (e.g. ``stats.HITS``)"""
+        try:
+            cell = self._local.cell
+        except AttributeError:
+            cell = self._new_cell()
+        cell[index] += amount
+
+    def snapshot(self):
+        """Return the current counts as ``Stats``"""
+        with self._lock:
+            cells = [self._retired] + self._cells
+        return Stats(*(sum(x) for x in zip(*cells)))
+
+    def reset(self):
+        with self._lock:
+            for cell in self._cells:
+                cell[:] = _ZERO
+            self._retired = list(_ZERO)
+
+    @property
+    def hits(self):
+        return self.snapshot().hits
+
+    @property
+    def misses(self):
+        return self.snapshot().misses
+
+    @property
+    def expirations(self):
+        return self.snapshot().expirations
+
+    @property
+    def evictions(self):
+        return self.snapshot().evictions
+
+    @property
+    def compute_time(self):
+        return self.snapshot().compute_time
+
+    @property
+    def rejections(self):
+        return self.snapshot().rejections
+
+    def __repr__(self):
+        return "<FunctionStats %s %r>" % (self.name, self.snapshot())
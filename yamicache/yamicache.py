@@ -9,15 +9,27 @@ function calls.
 """
 
 # Imports #####################################################################
+import os
 import json
 import time
+import asyncio
 import inspect
 import contextlib
 import collections
 import pickle
-from hashlib import sha224
-from functools import wraps
-from threading import Lock, Thread
+import heapq
+import itertools
+import weakref
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from hashlib import blake2b, sha224
+from functools import partial, wraps
+from numbers import Real
+from threading import Condition, Event, Lock, Thread
+
+from . import compression, persistence, stats
+from .compression import CompressedValue
+from .policies import make_policy
+from .sizing import estimate_size
 
 
 # Globals #####################################################################
@@ -66,9 +78,489 @@ def nocache(cache_obj):
         cache_obj._cache = True
 
 
-CachedItem = collections.namedtuple("CachedItem", "value timeout time_added")
+# ``timeout`` and ``time_added`` are ``time.monotonic()`` values.  They're
+# only converted to human-readable timestamps by ``dump()`` and
+# ``serialize()``.  ``function`` is the qualified name of the cached function
+# that created the item (if any); it's used for its statistics.  ``cost`` is
+# the number of seconds it took to calculate the value; it's used by the
+# "gdsf" eviction policy.  ``tags`` is a ``frozenset`` of the item's tags (see
+# ``Cache.invalidate_tags()``).
+CachedItem = collections.namedtuple(
+    "CachedItem",
+    "value timeout time_added function cost tags",
+    defaults=(None, None, None),
+)
 INIT_CACHE_VALUE = CachedItem("<value not cached yet>", None, None)
 
+# Marks an argument slot that wasn't filled in by a default or by the caller.
+_MISSING = object()
+
+# The number of expired items `Cache.collect()` removes per lock acquisition
+COLLECT_BATCH_SIZE = 1000
+
+
+# Used as the key for arguments that support the buffer protocol (e.g.
+# `bytes`, `bytearray`, `memoryview`, and NumPy arrays).  Their `repr()` can
+# be slow, and NumPy truncates large arrays with "...".
+BufferDigest = collections.namedtuple(
+    "BufferDigest", "type format shape strides digest"
+)
+
+# Used as the key for the `self` argument of `cached(per_instance=True)` and
+# `cached(identity=...)` methods.  `id` is a per-cache counter for
+# `per_instance`, or the value of the identity attribute.
+InstanceKey = collections.namedtuple("InstanceKey", "type id")
+
+# Whether or not a type supports the buffer protocol.  There's no way to tell
+# without trying, so we remember the answer.
+_BUFFER_TYPES = {bytes: True, bytearray: True, memoryview: True, str: False}
+
+
+def _buffer_digest(value):
+    """
+    Return a ``BufferDigest`` for an object that supports the buffer protocol,
+    or ``None`` if it doesn't.  The memory is hashed through a ``memoryview``,
+    so it's only copied if it's not contiguous.
+    """
+    cls = type(value)
+    if _BUFFER_TYPES.get(cls) is False:
+        return None
+
+    try:
+        view = memoryview(value)
+    except TypeError:
+        _BUFFER_TYPES[cls] = False
+        return None
+    except ValueError:
+        # The type supports the protocol, but not this object (e.g. NumPy
+        # datetime64 arrays, or a released `memoryview`)
+        return None
+
+    _BUFFER_TYPES[cls] = True
+    with view:
+        data = view if view.c_contiguous else view.tobytes()
+        return BufferDigest(
+            type=type(value).__name__,
+            format=str(getattr(value, "dtype", view.format)),
+            shape=view.shape,
+            strides=view.strides,
+            digest=blake2b(data, digest_size=16).hexdigest(),
+        )
+
+
+def _buffers_to_digests(value):
+    """
+    Return ``value`` with its buffer objects, including the ones in lists,
+    tuples, sets, and dicts, replaced by their ``BufferDigest``.  Containers
+    are only copied if something in them was replaced, so the ``repr()`` of
+    everything else doesn't change.
+    """
+    digest = _buffer_digest(value)
+    if digest is not None:
+        return digest
+
+    cls = type(value)
+    if cls in (list, tuple, set, frozenset):
+        items = [_buffers_to_digests(x) for x in value]
+        if any(x is not y for x, y in zip(items, value)):
+            return cls(items)
+    elif cls is dict:
+        items = [
+            (_buffers_to_digests(k), _buffers_to_digests(v)) for k, v in value.items()
+        ]
+        if any((k is not x) or (v is not value[x]) for (k, v), x in zip(items, value)):
+            return dict(items)
+    return value
+
+
+def _qualified_name(func):
+    return "%s.%s" % (func.__module__, func.__qualname__)
+
+
+class _Frozen(tuple):
+    """
+    The hashable version of an unhashable value made by ``_hashable()``, as
+    ``(kind, contents)``.  It's only equal to another ``_Frozen``, so an
+    argument that happens to be the same ``tuple`` doesn't share its key.
+    """
+
+    __slots__ = ()
+
+    def __eq__(self, other):
+        return isinstance(other, _Frozen) and tuple.__eq__(self, other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = tuple.__hash__
+
+
+def _hashable(value):
+    """
+    Return ``value`` if it's hashable.  Otherwise, return a hashable version
+    of it built from its contents (e.g. a ``list`` becomes a ``_Frozen``
+    tuple).
+    """
+    try:
+        hash(value)
+        return value
+    except (TypeError, ValueError):
+        # Writable `memoryview` objects raise `ValueError`
+        pass
+
+    digest = _buffer_digest(value)
+    if digest is not None:
+        return digest
+    elif isinstance(value, (tuple, list)):
+        return _Frozen((type(value).__name__, tuple(_hashable(x) for x in value)))
+    elif isinstance(value, dict):
+        return _Frozen(
+            (
+                "dict",
+                frozenset((_hashable(k), _hashable(v)) for k, v in value.items()),
+            )
+        )
+    elif isinstance(value, (set, frozenset)):
+        return _Frozen(("set", frozenset(_hashable(x) for x in value)))
+
+    return _Frozen((type(value).__name__, repr(value)))
+
+
+def _split(limit, shards):
+    """Split a cache limit evenly between ``shards``"""
+    if not limit:
+        return limit
+    return -(-limit // shards)
+
+
+def _is_valid_threshold(threshold):
+    return (threshold is None) or (
+        isinstance(threshold, int)
+        and not isinstance(threshold, bool)
+        and (threshold >= 0)
+    )
+
+
+def _admission(min_compute_time, max_value_size, admit, sizer):
+    """
+    Return a function that takes a result and the number of seconds it took
+    to calculate, and returns whether it should be cached.  Returns ``None``
+    if every result is cached.
+    """
+    if (min_compute_time is None) and (max_value_size is None) and (admit is None):
+        return None
+
+    def admission(value, cost):
+        if (min_compute_time is not None) and (cost < min_compute_time):
+            return False
+        elif (max_value_size is not None) and (sizer(value) > max_value_size):
+            return False
+        return (admit is None) or bool(admit(value))
+
+    return admission
+
+
+def _tagger(tags):
+    """
+    Return a function that takes the ``(args, kwargs)`` of a call and returns
+    the ``frozenset`` of tags for its result.  Returns ``None`` if there are
+    no tags.
+    """
+    if tags is None:
+        return None
+    elif callable(tags):
+        return lambda args, kwargs: frozenset(tags(*args, **kwargs))
+
+    tags = frozenset(tags)
+    return lambda args, kwargs: tags
+
+
+def _timed_call(function, *args):
+    """Call ``function``, and return the result and the number of seconds"""
+    start = time.perf_counter()
+    value = function(*args)
+    return value, time.perf_counter() - start
+
+
+def _is_valid_timeout(timeout):
+    return (timeout is None) or (
+        isinstance(timeout, Real) and not isinstance(timeout, bool) and timeout >= 0
+    )
+
+
+# Results of `Cache._lookup()`
+_HIT = "hit"
+_STALE = "stale"
+_MISS = "miss"
+
+
+class _Flight(object):
+    """
+    Tracks a function call that is computing a missing cache item, so other
+    callers can wait for its result instead of calling the function too.
+    """
+
+    def __init__(self):
+        self._event = Event()
+        self._value = None
+        self._exception = None
+
+    def set_result(self, value):
+        self._value = value
+        self._event.set()
+
+    def set_exception(self, exception):
+        self._exception = exception
+        self._event.set()
+
+    def wait(self, timeout=None):
+        """
+        Wait for the result.  Returns ``False`` if ``timeout`` expires first.
+        """
+        return self._event.wait(timeout)
+
+    def result(self):
+        if self._exception is not None:
+            raise self._exception
+        return self._value
+
+
+class _Owner(object):
+    """
+    The cached keys of a ``cached(per_instance=True)`` object.  The keys are
+    removed from the cache when the object is garbage collected.  Keys are
+    only added once their item is cached (see ``Cache._own()``), and they're
+    discarded when it's removed.
+    """
+
+    __slots__ = ("key", "keys")
+
+    def __init__(self, key):
+        self.key = key
+        self.keys = set()
+
+
+class _Shard(object):
+    """
+    A partition of the items in a ``Cache``.  Each shard has its own lock,
+    eviction policy, size accounting, and expiry index, so threads using
+    different shards don't block each other.
+
+    The ``locked_*`` methods must be called while holding ``lock``.
+    Everything that adds or removes an item should go through them.
+    """
+
+    def __init__(self, cache, policy, max_entries, max_bytes, data=None):
+        self.cache = cache
+        self.lock = Lock()
+        self.data = {} if data is None else data
+        self.policy = policy
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizes = {}
+        self.total_bytes = 0
+
+        # The keys of each tag; see `Cache.invalidate_tags()`.  A store shared
+        # with other processes can change without us, so it isn't indexed.
+        self.tags = {} if data is None else None
+
+        # The `_Owner` of each `cached(per_instance=True)` key.  This isn't
+        # kept for a shared store either; it evicts items on its own.
+        self.owners = {} if data is None else None
+
+        # A min-heap of `(timeout, sequence, key)` for items with a timeout.
+        # Entries aren't removed when their item is; `collect()` skips
+        # entries that don't match the cached item.
+        self.expiry_heap = []
+
+        # The number of items with a timeout, to know when the heap is mostly
+        # stale entries.  `len(self.data)` would do, but it's slow for a
+        # store.  Another process can change a shared store, so this is only
+        # an estimate; `compact_expiry_heap()` corrects it.
+        self.timed_items = 0
+
+    def locked_set(self, key, value, size=None):
+        """
+        Store ``value`` and evict items if the shard is over its limit.
+
+        :param int size: The size of ``value`` as calculated by
+            ``Cache._size_of()``.  This is only used when tracking sizes.
+        :returns: A list of the evicted ``(key, item)``.  Pass them, after
+            releasing the lock, to ``Cache._spill()``.
+        """
+        evicted = []
+        if self.max_bytes and size and size > self.max_bytes:
+            # This would evict everything else, and still not fit
+            self.cache._debug_print("too large to cache :", key)
+            if key in self.data:
+                self.locked_pop(key)
+            return evicted
+
+        old = self.data.get(key)
+        if (
+            (old is not None)
+            and (old.function is not None)
+            and old.timeout
+            and (time.monotonic() > old.timeout)
+        ):
+            self.cache._count(old, stats.EXPIRATIONS)
+
+        self.data[key] = value
+        if (old is not None) and old.timeout:
+            self.timed_items -= 1
+        if self.tags is not None:
+            if (old is not None) and old.tags:
+                self.untag(key, old.tags)
+            for tag in value.tags or ():
+                self.tags.setdefault(tag, set()).add(key)
+        if self.cache._log is not None:
+            self.cache._log.append(persistence.SET, key, value)
+
+        if self.cache._sizer is not None:
+            self.total_bytes += (size or 0) - self.sizes.pop(key, 0)
+            if size:
+                self.sizes[key] = size
+
+        if value.timeout:
+            self.timed_items = max(self.timed_items, 0) + 1
+            entry = (value.timeout, next(self.cache._expiry_sequence), key)
+            heapq.heappush(self.expiry_heap, entry)
+            if len(self.expiry_heap) > (2 * self.timed_items + 64):
+                self.compact_expiry_heap()
+
+            if self.expiry_heap[0] is entry:
+                self.cache._wake_gc()
+
+        if self.policy is None:
+            return evicted
+        elif value is INIT_CACHE_VALUE:
+            self.policy.remove(key)
+            return evicted
+
+        self.policy.insert(key, cost=value.cost, size=size)
+        while self.is_over_limit():
+            victim = self.policy.evict()
+            self.cache._debug_print("evicting :", victim)
+            item = self.locked_pop(victim)
+            self.cache._count(item, stats.EVICTIONS)
+            evicted.append((victim, item))
+        return evicted
+
+    def locked_pop(self, key):
+        """Remove ``key`` from the shard and return its value"""
+        value = self.data.pop(key)
+        if value.timeout:
+            self.timed_items -= 1
+        if self.cache._log is not None:
+            self.cache._log.append(persistence.DELETE, key)
+        if (self.tags is not None) and value.tags:
+            self.untag(key, value.tags)
+        if self.owners:
+            owner = self.owners.pop(key, None)
+            if owner is not None:
+                owner.keys.discard(key)
+        self.total_bytes -= self.sizes.pop(key, 0)
+        if self.policy is not None:
+            self.policy.remove(key)
+        return value
+
+    def untag(self, key, tags):
+        """Remove ``key`` from the index of each of ``tags``"""
+        for tag in tags:
+            keys = self.tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.tags[tag]
+
+    def locked_invalidate(self, tags):
+        """Remove the items tagged with any of ``tags``, and return the count"""
+        if self.tags is None:
+            keys = []
+            for key in list(self.data):
+                item = self.data.get(key)
+                if (item is not None) and item.tags and not item.tags.isdisjoint(tags):
+                    keys.append(key)
+        else:
+            keys = set().union(*(self.tags.get(tag, ()) for tag in tags))
+
+        removed = 0
+        for key in keys:
+            try:
+                self.locked_pop(key)
+                removed += 1
+            except KeyError:
+                # Removed by another process
+                pass
+        return removed
+
+    def locked_clear(self):
+        self.data.clear()
+        if self.tags is not None:
+            self.tags.clear()
+        if self.owners:
+            for key, owner in self.owners.items():
+                owner.keys.discard(key)
+            self.owners.clear()
+        self.sizes.clear()
+        self.total_bytes = 0
+        del self.expiry_heap[:]
+        self.timed_items = 0
+        if self.policy is not None:
+            self.policy.clear()
+
+    def locked_collect(self, now, count):
+        """
+        Remove up to ``count`` items that timed out before ``now``.  Returns
+        ``True`` if there may be more items to remove.
+        """
+        for _ in range(count):
+            if not self.expiry_heap or (self.expiry_heap[0][0] >= now):
+                return False
+
+            entry = heapq.heappop(self.expiry_heap)
+            if self.is_expiry_entry_valid(entry):
+                self.cache._debug_print("collecting :", entry[2])
+                self.cache._count(self.locked_pop(entry[2]), stats.EXPIRATIONS)
+
+        return True
+
+    def compact_expiry_heap(self):
+        """Rebuild the expiry heap without the entries of removed items"""
+        self.expiry_heap = [
+            entry for entry in self.expiry_heap if self.is_expiry_entry_valid(entry)
+        ]
+        heapq.heapify(self.expiry_heap)
+        self.timed_items = len(self.expiry_heap)
+
+    def next_timeout(self):
+        """
+        Return the earliest timeout in the expiry index, or ``None``.  This
+        is read without the lock, so it's only a hint: another thread can
+        remove the last entry, or replace the heap, while we look.
+        """
+        try:
+            return self.expiry_heap[0][0]
+        except IndexError:
+            return None
+
+    def is_expiry_entry_valid(self, entry):
+        item = self.data.get(entry[2])
+        return (item is not None) and (item.timeout == entry[0])
+
+    def count_items(self):
+        """The number of items, not counting INIT placeholders"""
+        count_items = getattr(self.data, "count_items", None)
+        if count_items is not None:
+            # A store that can count them without loading the values
+            return count_items()
+        return sum(1 for x in self.data.values() if x is not INIT_CACHE_VALUE)
+
+    def is_over_limit(self):
+        return (self.max_entries and (len(self.policy) > self.max_entries)) or (
+            self.max_bytes and (self.total_bytes > self.max_bytes)
+        )
+
 
 class Cache(collections.abc.MutableMapping):
     """
@@ -77,6 +569,12 @@ class Cache(collections.abc.MutableMapping):
     :param bool hashing: Whether or not to hash the function inputs when
         calculating the key.  This helps keep the keys *readable*, especially
         for functions with many inputs.
+    :param bool tuple_keys: Use ``tuple(prefix, name, arguments)`` as the key
+        instead of a string.  This is faster, since it uses Python's built-in
+        hashing instead of ``repr()`` (and ``sha224``).  Unhashable arguments
+        (e.g. ``list``) are converted to hashable versions.  Note that equal
+        values of different types (e.g. ``1`` and ``1.0``) share a key.
+        ``hashing`` isn't used, and ``dump()`` shows the keys as strings.
     :param str key_join: The character used to join the different parts that
         make up the hash key.
     :param bool debug: When ``True``, ``Cache.counters`` will be enabled and
@@ -85,14 +583,46 @@ class Cache(collections.abc.MutableMapping):
         implementation is instance-based, this is only helpful if dumping or
         comparing the cache to another instance.
     :param bool quiet: Don't print during ``debug`` cache hits
-    :param int default_timeout: If > 0, all cached items will be considered
+    :param float default_timeout: If > 0, all cached items will be considered
         stale this many seconds after they are cached.  In that case, the
         function will be run again, cached, and a new timeout value will be
         created.
-    :param int gc_thread_wait: The number of seconds in between cache
-        *garbage collection*.  The default, ``None``, will disable the garbage
-        collection thread.  This parameter is only valid if ``default_timeout``
-        is > 0 (``ValueError`` is raised otherwise).
+    :param float gc_thread_wait: The minimum number of seconds in between
+        cache *garbage collection*.  The thread sleeps until the next item
+        times out, so this limits how often it wakes up.  The default,
+        ``None``, will disable the garbage collection thread.  This parameter
+        is only valid if ``default_timeout`` is > 0 (``ValueError`` is raised
+        otherwise).  Use ``close()`` to stop the thread.
+    :param int max_entries: If > 0, the cache will hold at most this many
+        items.  The least-recently-used item is removed to make room for a new
+        one.  The default, ``None``, means the cache is unbounded.
+    :param int max_bytes: If > 0, the estimated size of all cached values will
+        be kept at or below this many bytes.  Least-recently-used items are
+        removed until a new item fits.  Items larger than ``max_bytes`` are
+        not cached.
+    :param callable sizer: A function that takes a cached value and returns
+        its size in bytes.  The default is ``yamicache.sizing.estimate_size``.
+        Sizes are only calculated when ``max_bytes`` or ``sizer`` is used.
+    :param policy: The eviction policy used when the cache is bounded:
+        ``"lru"`` (the default), ``"tinylfu"`` for a scan-resistant policy
+        that also considers how often items are used, or ``"gdsf"`` to keep
+        the items that took the longest to calculate (per byte).  This can
+        also be a policy object (see ``yamicache.policies``).
+    :param float flight_timeout: When several threads miss the same key at
+        the same time, only the first one calls the function; the others wait
+        for its result (or its exception).  This is the maximum number of
+        seconds to wait before calling the function anyway.  The default,
+        ``None``, waits as long as it takes.
+    :param float stale_ttl: If > 0, items that timed out less than this many
+        seconds ago are still returned, and the function is called in the
+        background to refresh them.  Only one refresh per key is queued at a
+        time.
+    :param int refresh_workers: The number of threads used to refresh stale
+        items.  The threads are only started when a refresh is needed.
+    :param int shards: The number of partitions the items are split into,
+        by key hash.  Each one has its own lock, so threads using different
+        shards don't block each other.  ``max_entries`` and ``max_bytes`` are
+        split evenly between the shards.
     """
 
     def __init__(
@@ -104,27 +634,123 @@ class Cache(collections.abc.MutableMapping):
         quiet=False,
         default_timeout=0,
         gc_thread_wait=None,
+        max_entries=None,
+        max_bytes=None,
+        sizer=None,
+        policy="lru",
+        flight_timeout=None,
+        stale_ttl=0,
+        refresh_workers=2,
+        shards=1,
+        tuple_keys=False,
+        l2=None,
+        store=None,
+        compress_threshold=None,
+        codec="zlib",
     ):
         self._prefix = prefix or ""
         self._hashing = hashing
+        self._tuple_keys = tuple_keys
         self._key_join = key_join
         self._debug = debug
         self._quiet = quiet
         self._cache = True  # Allow for ``nocache``
-        self._data_store = {}
         self._default_timeout = default_timeout
         self._gc_thread_wait = gc_thread_wait
         self._gc_thread = None
         self._do_gc_thread = False
+
+        # The items are protected by the shard locks.  This lock protects the
+        # counters and the GC thread state.
         self._gc_lock = Lock()
+
+        # The GC thread waits on this until the next item times out, or until
+        # it's told to stop.
+        self._gc_condition = Condition(self._gc_lock)
+        self._closed = False
+        self._log = None  # See `open_log()`
+        self._stats = {}  # `FunctionStats` by function name; see `stats()`
+        self._l2 = l2  # See `_demote()` and `_promote()`
+        self._l2_tags = {}  # The keys of each tag in `_l2`
+        self._l2_key_tags = {}  # The tags of each key in `_l2_tags`
+        self._l2_tags_lock = Lock()
+        if l2 is not None:
+            l2.on_drop = self._untag_l2
         self.counters = {}  # Only enabled with ``debug``
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+
+        # Per-item sizes are only tracked when they're needed
+        self._sizer = sizer or (estimate_size if max_bytes else None)
+        self._expiry_sequence = itertools.count()
+
+        if not isinstance(shards, int) or shards < 1:
+            raise ValueError("shards can only be an `int` > 0")
+        elif (shards > 1) and not isinstance(policy, str):
+            # Each shard needs its own policy object
+            raise ValueError("use a policy name with more than one shard")
+        elif (store is not None) and ((shards > 1) or max_entries or max_bytes):
+            # The store has its own locks and limits
+            raise ValueError(
+                "store can't be used with shards, max_entries, or max_bytes"
+            )
+
+        self._num_shards = shards
+        self._shards = [
+            _Shard(
+                self,
+                policy=make_policy(policy, capacity=_split(max_entries, shards))
+                if (max_entries or max_bytes)
+                else None,
+                max_entries=_split(max_entries, shards),
+                max_bytes=_split(max_bytes, shards),
+                data=store,
+            )
+            for _ in range(shards)
+        ]
+
+        # Calls computing a missing item; see `_call_once()`
+        self._flight_timeout = flight_timeout
+        self._flights = {}
+        self._flight_lock = Lock()
+
+        # Background refresh for stale items; see `_refresh()`
+        self._stale_ttl = stale_ttl
+        self._refresh_workers = refresh_workers
+        self._refresh_executor = None
+
+        # Flights for coroutine functions; see `_async_call_once()`
+        self._async_flights = {}
+        self._async_tasks = set()
+
+        # `cached(per_instance=True)` objects, by `id()`; see `_owner_of()`
+        self._owners = {}
+        self._owner_ids = itertools.count(1)
+        self._owner_lock = Lock()
+        self._dead_owners = collections.deque()  # See `_drop_owner()`
 
         # Force all calls to use this value instead of default, or what was
         # used during decorator creation.
         self._override_timeout = None
 
-        if default_timeout and not isinstance(default_timeout, int):
-            raise ValueError("Default timeout can only be `int`")
+        if not _is_valid_timeout(default_timeout):
+            raise ValueError("Default timeout can only be a number >= 0")
+
+        if max_entries is not None and (
+            not isinstance(max_entries, int) or max_entries < 1
+        ):
+            raise ValueError("max_entries can only be an `int` > 0")
+
+        if max_bytes is not None and (not isinstance(max_bytes, int) or max_bytes < 1):
+            raise ValueError("max_bytes can only be an `int` > 0")
+
+        if stale_ttl and stale_ttl < 0:
+            raise ValueError("stale_ttl can only be >= 0")
+
+        if not _is_valid_threshold(compress_threshold):
+            raise ValueError("compress_threshold can only be an `int` >= 0")
+        self._compress_threshold = compress_threshold
+        self._codec = compression.get_codec(codec)
 
         if self._gc_thread_wait:
             self._do_gc_thread = True
@@ -134,76 +760,279 @@ class Cache(collections.abc.MutableMapping):
 
     # Default stuff to override MutableMapping ABC ############################
     def __len__(self):
-        return len([x for x, y in self.items() if y is not INIT_CACHE_VALUE])
+        count = 0
+        for shard in self._shards:
+            with shard.lock:
+                count += shard.count_items()
+        return count
 
     def __getitem__(self, key):
         """Only return the item if it's not the INIT value"""
-        with self._gc_lock:
-            if (key not in self._data_store) or (
-                self._data_store[key] is INIT_CACHE_VALUE
-            ):
-                raise KeyError(key)
-            return self._data_store[key]
+        shard = self._shard_for(key)
+        with shard.lock:
+            item = shard.data.get(key, INIT_CACHE_VALUE)
+
+        if item is INIT_CACHE_VALUE:
+            raise KeyError(key)
+        return item
 
     def __setitem__(self, key, value):
-        with self._gc_lock:
-            self._data_store[key] = value
+        # Don't hold the lock while calculating the size
+        size = self._size_of(value)
+
+        shard = self._shard_for(key)
+        with shard.lock:
+            evicted = shard.locked_set(key, value, size)
+
+        if self._l2 is not None:
+            self._spill((key,), evicted)
 
     def __delitem__(self, key):
-        with self._gc_lock:
-            del self._data_store[key]
+        if self._l2 is not None:
+            self._discard_l2(key)
+
+        shard = self._shard_for(key)
+        with shard.lock:
+            shard.locked_pop(key)
 
     def __iter__(self):
         """
-        Override ``iter()``.  This can make things slow, but it's the only
-        way to prevent the underlying object from changing during iteration.
+        Override ``iter()``.  The keys of each shard are copied while holding
+        its lock, so the cache can change during iteration.
         """
-        with self._gc_lock:
-            for x in self._data_store.keys():
+        for shard in self._shards:
+            with shard.lock:
+                keys = list(shard.data)
+
+            for x in keys:
                 yield x
 
     # Override some of the *normal* methods to include the lock ###############
     def clear(self):
         """Clear the cache"""
+        with self._all_shards_locked():
+            if self._log is not None:
+                self._log.append(persistence.CLEAR)
+            for shard in self._shards:
+                shard.locked_clear()
+
+        if self._l2 is not None:
+            self._l2.clear()
+            with self._l2_tags_lock:
+                self._l2_tags.clear()
+                self._l2_key_tags.clear()
+
         with self._gc_lock:
-            self._data_store.clear()
             self.counters.clear()
 
+    def invalidate_tags(self, *tags):
+        """
+        Remove every item tagged with any of ``tags`` (see
+        ``cached(tags=...)``), including items in the L2 tier.  Each shard
+        keeps an index of the keys of each tag, so this only costs as much as
+        the number of items removed.
+
+        :returns: The number of items removed from memory
+        """
+        tags = frozenset(tags)
+        removed = 0
+        for shard in self._shards:
+            with shard.lock:
+                removed += shard.locked_invalidate(tags)
+
+        if self._l2 is not None:
+            with self._l2_tags_lock:
+                keys = set().union(*(self._l2_tags.get(tag, ()) for tag in tags))
+            for key in keys:
+                self._discard_l2(key)
+
+        self._debug_print("invalidated :", tags, removed)
+        return removed
+
     def keys(self):
         """Return a list of keys in the cache"""
-        with self._gc_lock:
-            return self._data_store.keys()
+        return [key for key, _ in self._snapshot()]
 
     def items(self):
         """Return all items in the cache as a list of ``tuple(key, value)``"""
-        with self._gc_lock:
-            return self._data_store.items()
+        return self._snapshot()
 
     def values(self):
         """Return a list of cached values"""
-        with self._gc_lock:
-            return self._data_store.values()
+        return [value for _, value in self._snapshot()]
 
-    def pop(self, key):
-        """Remove the cached value specified by ``key``"""
-        with self._gc_lock:
-            return self._data_store.pop(key)
+    def pop(self, key, default=_MISSING):
+        """
+        Remove the cached value specified by ``key``.  If ``key`` is not
+        cached, return ``default`` if it's used (``KeyError`` is raised
+        otherwise).
+        """
+        if self._l2 is not None:
+            self._discard_l2(key)
+
+        shard = self._shard_for(key)
+        with shard.lock:
+            if (default is not _MISSING) and (key not in shard.data):
+                return default
+            return shard.locked_pop(key)
 
     def popitem(self):
         """Remove a random item from the cache (only useful during testing)"""
-        with self._gc_lock:
-            return self._data_store.popitem()
+        for shard in self._shards:
+            with shard.lock:
+                if shard.data:
+                    key = next(iter(shard.data))
+                    return (key, shard.locked_pop(key))
+
+        raise KeyError("popitem(): cache is empty")
 
     ###########################################################################
 
+    def _shard_for(self, key):
+        if self._num_shards == 1:
+            return self._shards[0]
+        return self._shards[hash(key) % self._num_shards]
+
+    @contextlib.contextmanager
+    def _all_shards_locked(self):
+        """
+        Hold the locks of all shards.  They're always acquired in the same
+        order, so this can't deadlock with itself.
+        """
+        with contextlib.ExitStack() as stack:
+            for shard in self._shards:
+                stack.enter_context(shard.lock)
+            yield
+
+    def _snapshot(self):
+        """Return a consistent list of ``tuple(key, item)`` for all shards"""
+        with self._all_shards_locked():
+            return [item for shard in self._shards for item in shard.data.items()]
+
+    @property
+    def _data_store(self):
+        """
+        The items in the cache.  This is the live ``dict`` when there's only
+        one shard, and a copy otherwise.
+        """
+        if self._num_shards == 1:
+            return self._shards[0].data
+        return dict(self._snapshot())
+
+    def _wake_gc(self):
+        """Tell the GC thread an item will time out sooner than it thought"""
+        if self._gc_thread:
+            with self._gc_condition:
+                self._gc_condition.notify()
+
+    def _size_of(self, item):
+        """Return the size of the value in ``item``, if we're tracking sizes"""
+        if (self._sizer is None) or (item is INIT_CACHE_VALUE):
+            return None
+        return self._sizer(item.value)
+
+    @property
+    def total_bytes(self):
+        """
+        The estimated size of all cached values, in bytes.  This is always 0
+        unless the cache was created with ``max_bytes`` or ``sizer``.
+        """
+        return sum(shard.total_bytes for shard in self._shards)
+
     def _is_key_initialized(self, key):
-        with self._gc_lock:
-            return self._data_store.get(key) is INIT_CACHE_VALUE
+        shard = self._shard_for(key)
+        with shard.lock:
+            return shard.data.get(key) is INIT_CACHE_VALUE
 
     def _from_timestamp(self, timestamp):
         """Convert a timestamp string to an epoch value"""
         return time.mktime(time.strptime(timestamp))
 
+    def _to_epoch(self, monotonic):
+        """Convert a ``time.monotonic()`` value to an epoch value"""
+        return time.time() - (time.monotonic() - monotonic)
+
+    def _from_epoch(self, epoch):
+        """Convert an epoch value to a ``time.monotonic()`` value"""
+        return time.monotonic() - (time.time() - epoch)
+
+    def _export_item(self, item):
+        """Convert the times in ``item`` to timestamp strings"""
+        if item is INIT_CACHE_VALUE:
+            return item
+
+        return item._replace(
+            timeout=self._to_timestamp(self._to_epoch(item.timeout))
+            if item.timeout
+            else None,
+            time_added=self._to_timestamp(self._to_epoch(item.time_added)),
+        )
+
+    def _import_item(self, item):
+        """
+        Convert the times in ``item`` back to ``time.monotonic()`` values.
+        Timestamp strings are what ``serialize()`` writes, and also what older
+        versions stored in the cache.
+        """
+        if item.time_added is None:
+            # Only the INIT value doesn't have a time
+            return INIT_CACHE_VALUE
+
+        def convert(value):
+            if isinstance(value, str):
+                return self._from_epoch(self._from_timestamp(value))
+            return value
+
+        return item._replace(
+            timeout=convert(item.timeout) or None,
+            time_added=convert(item.time_added),
+        )
+
+    def _new_item(
+        self,
+        value,
+        timeout,
+        compress_threshold=None,
+        function=None,
+        cost=None,
+        tags=None,
+    ):
+        """
+        Create a ``CachedItem`` that expires ``timeout`` seconds from now.
+        If ``compress_threshold`` is used, large values are compressed.
+
+        :param str function: The name of the function that calculated it
+        :param float cost: The number of seconds it took to calculate it
+        :param frozenset tags: The item's tags
+        """
+        if compress_threshold is not None:
+            value = compression.compress(value, compress_threshold, self._codec)
+
+        now = time.monotonic()
+        return CachedItem(
+            value=value,
+            timeout=(now + timeout) if timeout else None,
+            time_added=now,
+            function=function,
+            cost=cost,
+            tags=tags or None,
+        )
+
+    def _count(self, item, index):
+        """Add 1 to a statistic of the function that created ``item``"""
+        function_stats = self._stats.get(item.function)
+        if function_stats is not None:
+            function_stats.add(index)
+
+    def stats(self):
+        """
+        Return the statistics of each cached function, as a ``dict`` of
+        function names to ``Stats(hits, misses, expirations, evictions,
+        compute_time, rejections)``.  The live statistics are also available
+        as the ``stats`` attribute of each cached function.
+        """
+        return {name: x.snapshot() for name, x in self._stats.items()}
+
     def _to_timestamp(self, epoch=None):
         """Convert an epoch value to a timestamp string"""
         if epoch:
@@ -215,15 +1044,49 @@ class Cache(collections.abc.MutableMapping):
         if self._debug:
             print(*args)
 
+    def _value_of(self, item):
+        """Return the value of ``item``, decompressing it if needed"""
+        value = item.value
+        if type(value) is CompressedValue:
+            return compression.decompress(value, self._codec)
+        return value
+
+    def compression_stats(self):
+        """
+        Return a ``dict`` of ``CompressionStats(raw_bytes, compressed_bytes)``
+        for each compressed item.  ``raw_bytes`` is the pickled size of the
+        value.
+        """
+        return {
+            key: compression.CompressionStats(item.value.size, len(item.value.data))
+            for key, item in self._snapshot()
+            if type(item.value) is CompressedValue
+        }
+
     def dump(self):
         """Dump the entire cache as a JSON string"""
-        return json.dumps(self._data_store, indent=4, separators=(",", ": "))
+        items = [
+            (key, item)
+            if type(item.value) is not CompressedValue
+            else (key, item._replace(value=self._value_of(item)))
+            for key, item in self._snapshot()
+        ]
+
+        return json.dumps(
+            {self._readable_key(key): self._export_item(item) for key, item in items},
+            indent=4,
+            separators=(",", ": "),
+        )
 
     def _calculate_key(self, func, cached_key=None, *args, **kwargs):
         """
         Calculates the cache key based on the function, inputs, and object
         settings.
 
+        This is the *generic* implementation; it inspects ``func`` every time
+        it's called.  ``cached()`` uses ``_key_builder()`` instead, which only
+        falls back to this method for calls it can't handle.
+
         :param code func: The function being cached
         :param str cached_key: The `keyed_cache`, if any
         :param *args: Any ``*args`` used to call the function
@@ -232,30 +1095,18 @@ class Cache(collections.abc.MutableMapping):
         if cached_key:
             return cached_key
 
-        key = cached_key
-        if not key:
-            key = {}
-            # We need to grab the default arguments.  `inspect.getargspec()`
-            # returns the function argument names, and any defaults.  The
-            # defaults are always the last args.  For example:
-            # `args=['arg1', 'arg2'], defaults=(4,)` means that `arg2` has a
-            # default of 4.
-            spec = inspect.getfullargspec(func)
-
-            # Load the defaults first, since they may not be in the calling
-            # spec.
-            if spec.defaults:
-                key = dict(zip(spec.args[-len(spec.defaults) :], spec.defaults))
-
-            # Now load in the arguments.
-            key.update(kwargs)
-            key.update(dict(zip(func.__code__.co_varnames, args)))
-
-            # This next issue is that Python may re-order the keys when we go
-            # to repr them.  This will cause invalid cache misses.  We can fix
-            # this by recreating a dictionary with a 'known' algorithm.
-            key = repr(dict(sorted(key.items())))
+        # Python may re-order the keys when we go to repr them.  This will
+        # cause invalid cache misses.  We can fix this by sorting them.
+        arguments = sorted(self._bound_arguments(func, args, kwargs).items())
+
+        if self._tuple_keys:
+            return (self._prefix, _qualified_name(func), _hashable(tuple(arguments)))
 
+        names = [name for name, _ in arguments]
+        values = [_buffers_to_digests(value) for _, value in arguments]
+        arguments = zip(names, values)
+
+        key = repr(dict(arguments))
         return "{prefix}{name}{join}{formatted_key}".format(
             join=self._key_join,
             prefix=(self._prefix + self._key_join) if self._prefix else "",
@@ -265,6 +1116,754 @@ class Cache(collections.abc.MutableMapping):
             else str(key),
         )
 
+    def _bound_arguments(self, func, args, kwargs):
+        """Return a ``dict`` of the argument names and values for a call"""
+        bound = {}
+        # We need to grab the default arguments.  `inspect.getargspec()`
+        # returns the function argument names, and any defaults.  The
+        # defaults are always the last args.  For example:
+        # `args=['arg1', 'arg2'], defaults=(4,)` means that `arg2` has a
+        # default of 4.
+        spec = inspect.getfullargspec(func)
+
+        # Load the defaults first, since they may not be in the calling
+        # spec.
+        if spec.defaults:
+            bound = dict(zip(spec.args[-len(spec.defaults) :], spec.defaults))
+
+        if spec.kwonlydefaults:
+            bound.update(spec.kwonlydefaults)
+
+        # Now load in the arguments.
+        bound.update(kwargs)
+        bound.update(dict(zip(func.__code__.co_varnames, args)))
+        return bound
+
+    def _readable_key(self, key):
+        """Return a string version of ``key`` (for tuple keys)"""
+        if not isinstance(key, tuple):
+            return key
+
+        prefix, name, arguments = key
+        return "{prefix}{name}{join}{arguments!r}".format(
+            join=self._key_join,
+            prefix=(prefix + self._key_join) if prefix else "",
+            name=name,
+            arguments=arguments,
+        )
+
+    def _key_builder(self, func, cached_key=None):
+        """
+        Create a function that calculates the cache key for calls to ``func``.
+
+        The function signature is inspected once, here.  The returned function
+        is called with ``(args, kwargs)`` and only needs to bind and format the
+        argument values.  It falls back to ``_calculate_key()`` for calls it
+        can't bind (e.g. ``*args`` or ``**kwargs`` functions).  With the
+        default ``repr()`` keys, both produce the same keys.  Tuple keys only
+        hold the argument values, in order of their names; the fallback keeps
+        the names, since ``**kwargs`` can have any.
+
+        :param code func: The function being cached
+        :param str cached_key: The `keyed_cache`, if any
+        """
+        if cached_key:
+            return lambda args, kwargs: cached_key
+
+        def fallback(args, kwargs):
+            return self._calculate_key(func, None, *args, **kwargs)
+
+        spec = inspect.getfullargspec(func)
+        if spec.varargs or spec.varkw:
+            return fallback
+
+        # Each argument gets a *slot*, in the same (sorted) order that
+        # `_calculate_key()` uses when it builds the `repr()` of the arguments.
+        names = sorted(spec.args + spec.kwonlyargs)
+        slots = {name: index for index, name in enumerate(names)}
+        positional = [slots[name] for name in spec.args]
+
+        defaults = [_MISSING] * len(names)
+        if spec.defaults:
+            for name, value in zip(spec.args[-len(spec.defaults) :], spec.defaults):
+                defaults[slots[name]] = value
+
+        for name, value in (spec.kwonlydefaults or {}).items():
+            defaults[slots[name]] = value
+
+        if self._tuple_keys:
+            head = (self._prefix, _qualified_name(func))
+            template = None
+        else:
+            # This is the `repr()` of the argument dictionary with the values
+            # left out, e.g. "{'argument': %r, 'power': %r}".
+            template = "{" + ", ".join("%r: %%r" % name for name in names) + "}"
+            head = "{prefix}{name}{join}".format(
+                join=self._key_join,
+                prefix=(self._prefix + self._key_join) if self._prefix else "",
+                name=func.__name__,
+            )
+
+        hashing = self._hashing
+
+        def build(args, kwargs):
+            if len(args) > len(positional):
+                return fallback(args, kwargs)
+
+            values = defaults[:]
+            for slot, value in zip(positional, args):
+                values[slot] = value
+
+            for name, value in kwargs.items():
+                slot = slots.get(name)
+                if slot is None:
+                    return fallback(args, kwargs)
+                values[slot] = value
+
+            for value in values:
+                if value is _MISSING:
+                    # The function will likely raise `TypeError`, but that's
+                    # not up to us.
+                    return fallback(args, kwargs)
+
+            if template is None:
+                return head + (_hashable(tuple(values)),)
+
+            key = template % tuple(_buffers_to_digests(x) for x in values)
+            if hashing:
+                return head + sha224(key.encode("utf-8")).hexdigest()
+            return head + key
+
+        return build
+
+    def _owner_of(self, obj):
+        """
+        Return the ``_Owner`` of ``obj``, creating it the first time.
+
+        Owners are found by ``id(obj)``.  That's safe, since the owner is
+        removed (by ``weakref.finalize``) before the ``id`` can be reused.
+        """
+        owner = self._owners.get(id(obj))
+        if owner is not None:
+            return owner
+
+        with self._owner_lock:
+            owner = self._owners.get(id(obj))
+            if owner is None:
+                cls = type(obj)
+                owner = _Owner(InstanceKey(_qualified_name(cls), next(self._owner_ids)))
+                try:
+                    finalizer = weakref.finalize(obj, self._drop_owner, id(obj))
+                except TypeError:
+                    raise TypeError(
+                        "cannot cache %r objects per instance; they don't support "
+                        "weak references (use `identity` instead)" % cls.__qualname__
+                    )
+                finalizer.atexit = False
+                self._owners[id(obj)] = owner
+            return owner
+
+    def _drop_owner(self, obj_id):
+        """
+        Queue the items of a garbage collected object for removal.
+
+        This is called by the garbage collector, which can run while this
+        thread holds any of our locks (e.g. when an eviction frees the
+        object), so it can't take them.  The items are removed by
+        ``_drop_dead_owners()``.
+        """
+        owner = self._owners.pop(obj_id, None)
+        if owner is not None:
+            self._dead_owners.append(owner)
+
+    def _own(self, key, args):
+        """
+        Record that the item for ``key`` belongs to the
+        ``cached(per_instance=True)`` object ``args[0]``, if it's cached.
+        """
+        shard = self._shard_for(key)
+        owner = self._owners.get(id(args[0])) if args else None
+        if (owner is None) or (shard.owners is None):
+            return
+
+        with shard.lock:
+            if key in shard.data:
+                shard.owners[key] = owner
+                owner.keys.add(key)
+
+    def _drop_dead_owners(self):
+        """Remove the items of the objects queued by ``_drop_owner()``"""
+        while self._dead_owners:
+            try:
+                owner = self._dead_owners.popleft()
+            except IndexError:
+                return
+
+            self._debug_print("dropping items of :", owner.key)
+            for key in owner.keys.copy():
+                self.pop(key, None)
+
+    def _instance_key_builder(self, build, per_instance, identity):
+        """
+        Wrap the key function ``build`` (from ``_key_builder()``) so that the
+        first argument, ``self``, is keyed by an ``InstanceKey`` instead of
+        its ``repr()``.
+        """
+        if identity:
+
+            def build_identity(args, kwargs):
+                if not args:
+                    return build(args, kwargs)
+                obj = args[0]
+                key = InstanceKey(_qualified_name(type(obj)), getattr(obj, identity))
+                return build((key,) + args[1:], kwargs)
+
+            return build_identity
+
+        def build_per_instance(args, kwargs):
+            if self._dead_owners:
+                self._drop_dead_owners()
+            if not args:
+                return build(args, kwargs)
+            owner = self._owner_of(args[0])
+            return build((owner.key,) + args[1:], kwargs)
+
+        return build_per_instance
+
+    def _lookup(self, key):
+        """
+        Look up ``key`` for a cached function call.  This is the hot path of
+        every cache hit: it's a single ``dict`` lookup, and the shard lock is
+        only taken when there's an eviction policy to update.  Nothing is
+        formatted unless ``debug`` is enabled.
+
+        :returns: ``tuple(state, item)``, where ``state`` is ``_HIT``,
+            ``_STALE`` (timed out, but inside of ``stale_ttl``), or ``_MISS``.
+        """
+        shard = self._shard_for(key)
+        if shard.policy is None:
+            # `dict.get()` is atomic, so we don't need the lock
+            item = shard.data.get(key)
+        else:
+            with shard.lock:
+                item = shard.data.get(key)
+                if item is not None:
+                    shard.policy.access(key)
+
+        return self._state_of(key, item)
+
+    def _state_of(self, key, item):
+        """Return the ``_lookup()`` result for the item found for ``key``"""
+        if (item is None) or (item is INIT_CACHE_VALUE):
+            return (_MISS, None)
+
+        if item.timeout:
+            now = time.monotonic()
+            if now > item.timeout:
+                if now > item.timeout + self._stale_ttl:
+                    if self._debug:
+                        self._debug_print("cache timeout:", key)
+                    return (_MISS, None)
+
+                if self._debug:
+                    self._debug_print("stale hit :", key)
+                    self._update_counter(key)
+                return (_STALE, item)
+
+        if self._debug:
+            self._debug_print("cache hit :", key)
+            self._update_counter(key)
+        return (_HIT, item)
+
+    def _fetch_many(self, keys, access=False):
+        """
+        Return a ``dict`` of the items found for ``keys``.  Each shard is
+        locked once.
+
+        :param bool access: Tell the eviction policy that the items were used
+        """
+        by_shard = collections.defaultdict(list)
+        for key in keys:
+            by_shard[self._shard_for(key)].append(key)
+
+        found = {}
+        for shard, shard_keys in by_shard.items():
+            with shard.lock:
+                for key in shard_keys:
+                    item = shard.data.get(key)
+                    if (item is None) or (item is INIT_CACHE_VALUE):
+                        continue
+                    found[key] = item
+                    if access and (shard.policy is not None):
+                        shard.policy.access(key)
+        return found
+
+    def get_many(self, keys):
+        """
+        Return a ``dict`` of the cached items for ``keys``.  Keys that aren't
+        cached are left out.
+        """
+        return self._fetch_many(keys)
+
+    def set_many(self, items, timeout=None):
+        """
+        Store several items at once.  Each shard is locked once.
+
+        :param items: A ``dict``, or an iterable of ``(key, value)``.  Values
+            that are ``CachedItem`` are stored as they are.
+        :param float timeout: The number of seconds until the other values
+            time out.  The default is the cache's ``default_timeout``.
+        """
+        if not _is_valid_timeout(timeout):
+            raise ValueError("timeout can only be a number >= 0")
+
+        if hasattr(items, "items"):
+            items = items.items()
+        timeout = timeout or self._default_timeout
+
+        # Don't hold the locks while calculating the sizes
+        by_shard = collections.defaultdict(list)
+        for key, item in items:
+            if not isinstance(item, CachedItem):
+                item = self._new_item(item, timeout, self._compress_threshold)
+            by_shard[self._shard_for(key)].append((key, item, self._size_of(item)))
+
+        evicted = []
+        for shard, shard_items in by_shard.items():
+            with shard.lock:
+                for key, item, size in shard_items:
+                    evicted.extend(shard.locked_set(key, item, size))
+
+        if self._l2 is not None:
+            self._spill(
+                [key for shard_items in by_shard.values() for key, _, _ in shard_items],
+                evicted,
+            )
+
+    def _map(self, wrapper, function, calculate_key, timeout, iterables, executor):
+        """
+        Call a cached function for each set of arguments in ``iterables``.
+        The items are looked up in one batch, the misses are promoted from
+        the L2 tier or called (once per key), and the results are stored in
+        one batch.
+        """
+        calls = list(zip(*iterables))
+        if not self._cache:
+            return [function(*args) for args in calls]
+
+        keys = [calculate_key(args, {}) for args in calls]
+        found = self._fetch_many(keys, access=True)
+        function_stats = function.__cached_stats__
+
+        results = []
+        misses = {}  # key: args
+        miss_indexes = []
+        for index, (key, args) in enumerate(zip(keys, calls)):
+            state, item = self._state_of(key, found.get(key))
+            if state is _MISS:
+                misses.setdefault(key, args)
+                miss_indexes.append(index)
+                results.append(None)
+                continue
+
+            function_stats.add(stats.HITS)
+
+            if state is _STALE:
+                self._refresh(key, function, args, {}, timeout)
+            results.append(self._value_of(item))
+
+        if not misses:
+            return results
+
+        function_stats.add(stats.MISSES, len(miss_indexes))
+        computed = {}
+        if self._l2 is not None:
+            for key in list(misses):
+                item = self._promote(key)
+                if item is not None:
+                    computed[key] = self._value_of(item)
+                    args = misses.pop(key)
+                    if function.__cached_per_instance__:
+                        self._own(key, args)
+
+        if misses:
+            self._map_misses(wrapper, function, timeout, misses, executor, computed)
+
+        for index in miss_indexes:
+            results[index] = computed[keys[index]]
+        return results
+
+    def _map_misses(self, wrapper, function, timeout, misses, executor, computed):
+        """
+        Call ``function`` for the ``misses`` of ``_map()``, a ``dict`` of
+        ``{key: args}``, and cache the results.  The results are added to
+        ``computed``.
+        """
+        function_stats = function.__cached_stats__
+        if executor is None:
+            results = [_timed_call(function, *args) for args in misses.values()]
+        else:
+            # Other processes can't unpickle the undecorated function.  They
+            # get the decorated one, which caches the result in their cache.
+            target = wrapper if isinstance(executor, ProcessPoolExecutor) else function
+            # Each call is timed where it runs; the batch's time would be
+            # shared by calls that ran in parallel.
+            results = list(
+                executor.map(partial(_timed_call, target), *zip(*misses.values()))
+            )
+        function_stats.add(stats.COMPUTE_TIME, sum(cost for _, cost in results))
+
+        threshold = function.__cached_compress_threshold__
+        admission = function.__cached_admission__
+        get_tags = function.__cached_tags__
+        admitted = []
+        for key, (value, cost) in zip(misses, results):
+            computed[key] = value
+            if (admission is None) or admission(value, cost):
+                tags = get_tags(misses[key], {}) if get_tags else None
+                item = self._new_item(
+                    value, timeout, threshold, function_stats.name, cost, tags
+                )
+                admitted.append((key, item))
+            else:
+                self._reject(key, function_stats)
+        self.set_many(admitted)
+        if function.__cached_per_instance__:
+            for key, _ in admitted:
+                self._own(key, misses[key])
+
+    def _store_result(self, key, function, args, kwargs, value, timeout, cost):
+        """
+        Cache the result of a call to the cached function ``function``, if it
+        passes the function's admission thresholds.
+        """
+        function_stats = function.__cached_stats__
+        admission = function.__cached_admission__
+        if (admission is None) or admission(value, cost):
+            get_tags = function.__cached_tags__
+            self[key] = self._new_item(
+                value,
+                timeout,
+                function.__cached_compress_threshold__,
+                function_stats.name,
+                cost,
+                get_tags(args, kwargs) if get_tags else None,
+            )
+        else:
+            self._reject(key, function_stats)
+
+    def _reject(self, key, function_stats):
+        """
+        Count a result that failed admission, and remove the (stale) item it
+        was meant to replace.
+        """
+        self._debug_print("not admitted :", key)
+        function_stats.add(stats.REJECTIONS)
+
+        if self._l2 is not None:
+            self._discard_l2(key)
+
+        shard = self._shard_for(key)
+        with shard.lock:
+            item = shard.data.get(key)
+            if (item is not None) and (item is not INIT_CACHE_VALUE):
+                shard.locked_pop(key)
+
+    def _call_once(self, key, function, args, kwargs, timeout):
+        """
+        Call ``function`` and cache the result, unless another thread is
+        already doing that for ``key``.  In that case, wait for its result.
+        """
+        with self._flight_lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            if flight.wait(self._flight_timeout):
+                self._debug_print("shared result :", key)
+                return flight.result()
+
+            self._debug_print("flight timeout :", key)
+            return function(*args, **kwargs)
+
+        return self._run_flight(key, flight, function, args, kwargs, timeout)
+
+    def _refresh(self, key, function, args, kwargs, timeout):
+        """
+        Queue a background call to ``function`` to refresh ``key``, unless
+        one is already running.
+        """
+        with self._flight_lock:
+            if self._closed or (key in self._flights):
+                return
+            flight = self._flights[key] = _Flight()
+
+            if self._refresh_executor is None:
+                self._refresh_executor = ThreadPoolExecutor(
+                    max_workers=self._refresh_workers,
+                    thread_name_prefix="yamicache-refresh",
+                )
+            executor = self._refresh_executor
+
+        self._debug_print("refreshing :", key)
+        try:
+            executor.submit(
+                self._run_flight, key, flight, function, args, kwargs, timeout
+            )
+        except RuntimeError:
+            # `close()` shut the executor down since we registered the flight.
+            # Refresh here, so callers waiting on the flight get a result.
+            try:
+                self._run_flight(key, flight, function, args, kwargs, timeout)
+            except Exception:
+                # The waiting callers get the exception; this is a stale hit
+                pass
+
+    def _run_flight(self, key, flight, function, args, kwargs, timeout):
+        """
+        Call ``function``, cache the result, and share it with everyone
+        waiting on ``flight``.
+        """
+        try:
+            # Another leader may have cached the item since our caller missed
+            item = self._fresh_item(key)
+            if item is None:
+                self._debug_print("caching", key)
+                function_stats = function.__cached_stats__
+                start = time.perf_counter()
+                value = function(*args, **kwargs)
+                cost = time.perf_counter() - start
+                function_stats.add(stats.COMPUTE_TIME, cost)
+                self._store_result(
+                    key, function, args, kwargs, value, timeout, cost
+                )
+            else:
+                value = self._value_of(item)
+
+            if function.__cached_per_instance__:
+                self._own(key, args)
+            flight.set_result(value)
+            return value
+        except BaseException as e:
+            flight.set_exception(e)
+            raise
+        finally:
+            with self._flight_lock:
+                del self._flights[key]
+
+    def _fresh_item(self, key):
+        """Return the item for ``key``, or ``None`` if it's missing or stale"""
+        shard = self._shard_for(key)
+        with shard.lock:
+            item = shard.data.get(key)
+
+        if (item is None) and (self._l2 is not None):
+            item = self._promote(key)
+
+        if (
+            item is None
+            or item is INIT_CACHE_VALUE
+            or (item.timeout and time.monotonic() > item.timeout)
+        ):
+            return None
+        return item
+
+    def _spill(self, keys, evicted):
+        """
+        Update the L2 tier after ``keys`` were stored in memory: discard
+        their older values, so they're not promoted later, and demote the
+        ``evicted`` items from ``_Shard.locked_set()``.  This writes to disk,
+        so it's called after releasing the shard locks.
+        """
+        for key in keys:
+            self._discard_l2(key)
+        for key, item in evicted:
+            self._demote(key, item)
+
+    def _demote(self, key, item):
+        """Write an evicted item to the L2 tier"""
+        if (item is INIT_CACHE_VALUE) or (
+            item.timeout and time.monotonic() > item.timeout
+        ):
+            return
+
+        # The times are stored as epoch values, so the tier can be reopened
+        # by another process.
+        item = item._replace(
+            timeout=self._to_epoch(item.timeout) if item.timeout else None,
+            time_added=self._to_epoch(item.time_added),
+        )
+        if self._l2.put(key, item):
+            self._debug_print("demoted :", key)
+            if item.tags or self._l2_key_tags:
+                with self._l2_tags_lock:
+                    self._locked_untag_l2(key)
+                    if item.tags:
+                        self._l2_key_tags[key] = item.tags
+                        for tag in item.tags:
+                            self._l2_tags.setdefault(tag, set()).add(key)
+
+    def _discard_l2(self, key):
+        """Remove ``key`` from the L2 tier, and from its tag index"""
+        self._l2.discard(key)
+        if self._l2_key_tags:
+            with self._l2_tags_lock:
+                self._locked_untag_l2(key)
+
+    def _untag_l2(self, keys):
+        """
+        Remove ``keys`` from the tag index of the L2 tier.  This is also
+        called by the tier with the keys it drops to fit in its ``max_bytes``.
+        """
+        with self._l2_tags_lock:
+            for key in keys:
+                self._locked_untag_l2(key)
+
+    def _locked_untag_l2(self, key):
+        """Like ``_Shard.untag()``; call it while holding ``_l2_tags_lock``"""
+        for tag in self._l2_key_tags.pop(key, ()):
+            keys = self._l2_tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._l2_tags[tag]
+
+    def _promote(self, key):
+        """
+        Move the item for ``key`` from the L2 tier to memory.  Returns the
+        item, or ``None`` if it's not in the tier (or it timed out).
+        """
+        item = self._l2.pop(key)
+        if item is None:
+            return None
+
+        if item.tags:
+            self._untag_l2((key,))
+
+        item = item._replace(
+            timeout=self._from_epoch(item.timeout) if item.timeout else None,
+            time_added=self._from_epoch(item.time_added),
+        )
+        if item.timeout and time.monotonic() > item.timeout:
+            return None
+
+        self._debug_print("promoted :", key)
+        self[key] = item
+        return item
+
+    # asyncio versions of the flight methods.  These are only called from a
+    # running event loop, so they don't need `_flight_lock`.
+    async def _async_call_once(self, key, function, args, kwargs, timeout):
+        """
+        Await ``function`` and cache the result, unless another task on this
+        event loop is already doing that for ``key``.  In that case, wait for
+        its result.
+        """
+        loop = asyncio.get_running_loop()
+        future = self._async_flights.get(key)
+
+        if (future is not None) and (future.get_loop() is loop):
+            try:
+                # `shield()` keeps a cancelled waiter from cancelling the
+                # leader's future.
+                value = await asyncio.wait_for(
+                    asyncio.shield(future), self._flight_timeout
+                )
+                self._debug_print("shared result :", key)
+                return value
+            except asyncio.TimeoutError:
+                self._debug_print("flight timeout :", key)
+                return await function(*args, **kwargs)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                # The leader was cancelled; try again
+                return await self._async_call_once(key, function, args, kwargs, timeout)
+
+        future = loop.create_future()
+        self._async_flights[key] = future
+        return await self._async_run_flight(
+            key, future, function, args, kwargs, timeout
+        )
+
+    def _async_refresh(self, key, function, args, kwargs, timeout):
+        """
+        Schedule a task to refresh ``key``, unless one is already running.
+        """
+        if key in self._async_flights:
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self._async_flights[key] = future
+
+        self._debug_print("refreshing :", key)
+        task = asyncio.ensure_future(
+            self._async_run_flight(key, future, function, args, kwargs, timeout)
+        )
+
+        # The event loop only keeps a weak reference to the task
+        self._async_tasks.add(task)
+        task.add_done_callback(self._async_tasks.discard)
+
+    async def _async_run_flight(self, key, future, function, args, kwargs, timeout):
+        """
+        Await ``function``, cache the result, and share it with everyone
+        waiting on ``future``.
+        """
+        try:
+            item = self._fresh_item(key)
+            if item is None:
+                self._debug_print("caching", key)
+                function_stats = function.__cached_stats__
+                start = time.perf_counter()
+                value = await function(*args, **kwargs)
+                cost = time.perf_counter() - start
+                function_stats.add(stats.COMPUTE_TIME, cost)
+                self._store_result(
+                    key, function, args, kwargs, value, timeout, cost
+                )
+            else:
+                value = self._value_of(item)
+
+            if function.__cached_per_instance__:
+                self._own(key, args)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Nobody may be waiting; don't let asyncio log the exception.
+            future.exception()
+            raise
+        finally:
+            if self._async_flights.get(key) is future:
+                del self._async_flights[key]
+
+    async def _async_gc(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            self.collect()
+
+    def start_async_gc(self, interval=None):
+        """
+        Start an ``asyncio`` task that periodically calls ``collect()``.  This
+        is an alternative to the garbage collection thread for applications
+        that run in an event loop.  It must be called from a coroutine; cancel
+        the returned task to stop it.
+
+        :param float interval: The number of seconds between collections.  The
+            default is the ``gc_thread_wait`` used to create the cache.
+        """
+        interval = interval or self._gc_thread_wait
+        if not interval:
+            raise ValueError("interval must be > 0")
+
+        return asyncio.ensure_future(self._async_gc(interval))
+
     def _update_counter(self, key):
         """Keeps track of cache hits"""
         if not self._debug:
@@ -281,29 +1880,109 @@ class Cache(collections.abc.MutableMapping):
         This is the garbage collection thread that periodically calls our
         collect method.
         """
-        tnext = time.time() + self._gc_thread_wait
-        while self._do_gc_thread:
-            if time.time() > tnext:
-                self.collect()
-                tnext = time.time() + self._gc_thread_wait
+        last_collect = time.monotonic()
+        while True:
+            with self._gc_condition:
+                while True:
+                    if not self._do_gc_thread:
+                        return
+
+                    # Don't collect more often than `gc_thread_wait`
+                    now = time.monotonic()
+                    wait = last_collect + self._gc_thread_wait - now
+
+                    # Taking the shard locks here could deadlock with
+                    # `_wake_gc()`, which is called while holding one.
+                    timeouts = [x.next_timeout() for x in self._shards]
+                    next_timeout = min(
+                        (x for x in timeouts if x is not None), default=None
+                    )
+
+                    if next_timeout is not None:
+                        wait = max(wait, next_timeout + self._stale_ttl - now)
+                    elif wait <= 0:
+                        wait = None  # Nothing to collect until we're notified
+
+                    if (wait is not None) and (wait <= 0):
+                        break
+
+                    self._gc_condition.wait(wait)
+
+            self.collect()
+            last_collect = time.monotonic()
+
+    def close(self):
+        """
+        Stop the garbage collection thread and the background refresh
+        threads, and wait for them to finish.  The cache can still be used,
+        but stale items are no longer refreshed in the background.
+
+        You can also use the cache as a context manager to call this on exit.
+        """
+        with self._flight_lock:
+            # `_refresh()` checks this, and uses the executor, under the lock
+            self._closed = True
+            executor, self._refresh_executor = self._refresh_executor, None
+
+        with self._gc_condition:
+            self._do_gc_thread = False
+            self._gc_condition.notify_all()
 
-            time.sleep(1)
+        if self._gc_thread:
+            self._gc_thread.join()
+            self._gc_thread = None
+
+        if executor:
+            executor.shutdown(wait=True)
+
+        if self._l2 is not None:
+            self._l2.flush()
+
+        log, self._log = self._log, None
+        if log is not None:
+            log.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
 
     def collect(self, since=None):
         """
         Clear any item from the cache that has timed out.
+
+        Timed-out items are found with an index ordered by timeout, so this
+        only costs as much as the number of items removed.  The lock is
+        released every ``COLLECT_BATCH_SIZE`` items to let other threads in.
+
+        :param float since: If used, also clear items added after this epoch
+            value.  This needs to check every item in the cache.
         """
-        remove_keys = []
-        for key, item in self.items():
-            if (
-                item.timeout and (time.time() > self._from_timestamp(item.timeout))
-            ) or (since and (self._from_timestamp(item.time_added) > since)):
-                self._debug_print("collecting : %s" % key)
-                remove_keys.append(key)
+        if self._dead_owners:
+            self._drop_dead_owners()
+
+        now = time.monotonic() - self._stale_ttl
+
+        for shard in self._shards:
+            more = True
+            while more:
+                with shard.lock:
+                    more = shard.locked_collect(now, COLLECT_BATCH_SIZE)
+
+        if not since:
+            return
+
+        since = self._from_epoch(since)
+        remove_keys = [
+            key
+            for key, item in self._snapshot()
+            if item.time_added and (item.time_added > since)
+        ]
 
         for key in remove_keys:
-            if key in self:
-                del self[key]
+            self._debug_print("collecting :", key)
+            self.pop(key, None)
 
     # Decorators ##############################################################
     def clear_cache(self):
@@ -326,12 +2005,55 @@ class Cache(collections.abc.MutableMapping):
 
         return real_decorator
 
-    def cached(self, key=None, timeout=None):
+    def cached(
+        self,
+        key=None,
+        timeout=None,
+        per_instance=False,
+        identity=None,
+        compress_threshold=None,
+        min_compute_time=None,
+        max_value_size=None,
+        admit=None,
+        tags=None,
+    ):
         """
         A decorator used to memoize the return of a function call.
+
+        :param bool per_instance: For methods.  Key ``self`` by the object
+            instead of its ``repr()``, and remove the object's items after it's
+            garbage collected (by the next ``per_instance`` call, or
+            ``collect()``).  The object must support weak references.
+        :param str identity: For methods.  Key ``self`` by this attribute
+            (e.g. ``"id"``), so objects with the same identity share items.
+        :param int compress_threshold: Compress results larger than this many
+            bytes (pickled).  This overrides the ``Cache`` setting.
+        :param float min_compute_time: Only cache results that took at least
+            this many seconds to calculate
+        :param int max_value_size: Only cache results whose size (see
+            ``Cache(sizer=...)``) is at most this many bytes
+        :param callable admit: Only cache results for which ``admit(result)``
+            returns ``True``
+        :param tags: A list of tags for the results, or a function that's
+            called with the function's arguments and returns a list of tags.
+            See ``invalidate_tags()``.
         """
-        if timeout and not isinstance(timeout, int):
-            raise ValueError("timeout can only be `int`")
+        if not _is_valid_timeout(timeout):
+            raise ValueError("timeout can only be a number >= 0")
+        elif not _is_valid_threshold(compress_threshold):
+            raise ValueError("compress_threshold can only be an `int` >= 0")
+        elif not _is_valid_timeout(min_compute_time):
+            raise ValueError("min_compute_time can only be a number >= 0")
+        elif not _is_valid_threshold(max_value_size):
+            raise ValueError("max_value_size can only be an `int` >= 0")
+        elif (admit is not None) and not callable(admit):
+            raise ValueError("admit must be callable")
+        elif isinstance(tags, str):
+            raise ValueError("tags must be a list of tags, or a callable")
+        elif (per_instance or identity) and key:
+            raise ValueError("key can't be used with per_instance or identity")
+        elif per_instance and identity:
+            raise ValueError("per_instance and identity can't be used together")
         elif (key in self) or self._is_key_initialized(key):
             # `key in self` will return False if the key either doesn't exist,
             # or it's set to the INIT value.  Therefore, we need to call
@@ -344,65 +2066,105 @@ class Cache(collections.abc.MutableMapping):
 
         def real_decorator(function, timeout=timeout):
             function.__cached_timeout__ = timeout or self._default_timeout
+            function.__cached_compress_threshold__ = (
+                self._compress_threshold
+                if compress_threshold is None
+                else compress_threshold
+            )
+            function.__cached_admission__ = _admission(
+                min_compute_time, max_value_size, admit, self._sizer or estimate_size
+            )
+            function.__cached_tags__ = _tagger(tags)
+            function.__cached_per_instance__ = per_instance
+
+            name = _qualified_name(function)
+            function_stats = self._stats.get(name)
+            if function_stats is None:
+                function_stats = self._stats[name] = stats.FunctionStats(name)
+            function.__cached_stats__ = function_stats
+            count = function_stats.add
+            calculate_key = self._key_builder(function, key)
+            if per_instance or identity:
+                calculate_key = self._instance_key_builder(
+                    calculate_key, per_instance, identity
+                )
+
+            def get_timeout():
+                # Let `override_timeout` do its thing
+                if self._override_timeout is not None:
+                    return self._override_timeout
+                return function.__cached_timeout__
+
+            if inspect.iscoroutinefunction(function):
+
+                @wraps(function)
+                async def wrapper(*args, **kwargs):
+                    if not self._cache:
+                        return await function(*args, **kwargs)
+
+                    cache_key = calculate_key(args, kwargs)
+                    state, result = self._lookup(cache_key)
+                    if state is _HIT:
+                        count(stats.HITS)
+                        value = result.value
+                        if type(value) is not CompressedValue:
+                            return value
+                        return self._value_of(result)
+
+                    timeout = get_timeout()
+                    if state is _STALE:
+                        count(stats.HITS)
+                        self._async_refresh(cache_key, function, args, kwargs, timeout)
+                        return self._value_of(result)
+
+                    count(stats.MISSES)
+
+                    return await self._async_call_once(
+                        cache_key, function, args, kwargs, timeout
+                    )
+
+                wrapper.stats = function_stats
+                return wrapper
 
             @wraps(function)
             def wrapper(*args, **kwargs):
-                # Check the timeout here, since this is the call and not the
-                # instantiation.
-
                 if not self._cache:
                     return function(*args, **kwargs)
 
-                cache_key = self._calculate_key(function, key, *args, **kwargs)
-
-                # Let `override_timeout` do its thing
-                if self._override_timeout is not None:
-                    timeout = self._override_timeout
-                else:
-                    timeout = function.__cached_timeout__
+                cache_key = calculate_key(args, kwargs)
+                state, result = self._lookup(cache_key)
+                if state is _HIT:
+                    count(stats.HITS)
+                    value = result.value
+                    if type(value) is not CompressedValue:
+                        return value
+                    return self._value_of(result)
 
-                try:
-                    if cache_key in self and (self[cache_key] is not INIT_CACHE_VALUE):
-                        result = self[cache_key]
-                        if (not result.timeout) or (
-                            result.timeout
-                            and (time.time() <= self._from_timestamp(result.timeout))
-                        ):
-                            self._debug_print("cache hit : %s" % cache_key)
-                            self._update_counter(cache_key)
-                            return result.value
-                        elif result.timeout and (
-                            time.time() > self._from_timestamp(result.timeout)
-                        ):
-                            self._debug_print("cache timeout: %s" % cache_key)
-                            result = CachedItem(
-                                value=function(*args, **kwargs),
-                                timeout=self._to_timestamp(time.time() + timeout)
-                                if timeout
-                                else 0,
-                                time_added=self._to_timestamp(),
-                            )
-                            self[cache_key] = result
-                            return self[cache_key].value
-                except KeyError:  # pragma: nocover
-                    # Workaround for threading issues, as opposed to a potential
-                    # lock block.  A thread may have deleted this key, and
-                    # that's fine.  We simply need to cache it again.
-                    # We won't always hit this, so we disable code coverage.
-                    self._debug_print("KeyError %s" % cache_key)
-
-                self._debug_print("caching %s" % cache_key)
-
-                result = CachedItem(
-                    value=function(*args, **kwargs),
-                    timeout=self._to_timestamp(time.time() + timeout)
-                    if timeout
-                    else None,
-                    time_added=self._to_timestamp(),
+                # Check the timeout here, since this is the call and not the
+                # instantiation.
+                timeout = get_timeout()
+
+                if state is _STALE:
+                    count(stats.HITS)
+                    self._refresh(cache_key, function, args, kwargs, timeout)
+                    return self._value_of(result)
+
+                count(stats.MISSES)
+                return self._call_once(cache_key, function, args, kwargs, timeout)
+
+            def cached_map(*iterables, executor=None):
+                """
+                Call the function for each set of arguments, like the built-in
+                ``map()``, and return a ``list`` of the results.  Only the
+                missing items are calculated, optionally on ``executor`` (a
+                ``concurrent.futures`` thread or process pool).
+                """
+                return self._map(
+                    wrapper, function, calculate_key, get_timeout(), iterables, executor
                 )
-                self[cache_key] = result
-                return result.value
 
+            wrapper.map = cached_map
+            wrapper.stats = function_stats
             return wrapper
 
         return real_decorator
@@ -412,13 +2174,68 @@ class Cache(collections.abc.MutableMapping):
         Serialize the cache to a filename.  This process uses ``pickle``; Do
         not use this function if you are caching something that is not
         picklable!
+
+        Expiration times are written as timestamp strings, so the file can be
+        read by another process.
         """
+        items = self._snapshot()
+
         with open(filename, "wb") as fh:
-            pickle.dump(self._data_store, fh, -1)
+            pickle.dump({key: self._export_item(item) for key, item in items}, fh, -1)
 
     def deserialize(self, filename):
         """
         Read the serialized cache data from a file.
+
+        If there's a log of the changes made since (see ``open_log()``), it's
+        replayed on top.
         """
         with open(filename, "rb") as fh:
-            self._data_store = pickle.load(fh)
+            snapshot = fh.read()
+        data = pickle.loads(snapshot)
+
+        log_filename = persistence.log_filename(filename)
+        if os.path.exists(log_filename):
+            persistence.replay(
+                data, log_filename, persistence.snapshot_digest(snapshot)
+            )
+
+        items = [(key, self._import_item(item)) for key, item in data.items()]
+        sizes = [self._size_of(item) for _, item in items]
+
+        with self._all_shards_locked():
+            if self._log is not None:
+                self._log.append(persistence.CLEAR)
+            for shard in self._shards:
+                shard.locked_clear()
+
+            evicted = []
+            for (key, item), size in zip(items, sizes):
+                evicted.extend(self._shard_for(key).locked_set(key, item, size))
+
+        if self._l2 is not None:
+            self._spill([key for key, _ in items], evicted)
+
+    def open_log(self, filename, sync_interval=1.0):
+        """
+        Start writing changes to the cache to an append-only log.
+
+        A snapshot of the cache is written to ``filename`` and the changes
+        are appended to ``<filename>.log``.  They're written, and synced to
+        disk, every ``sync_interval`` seconds by a background thread, which
+        also rewrites the snapshot when the log grows larger than it.  Use
+        ``deserialize(filename)`` to load the snapshot and the log.
+
+        The log is closed by ``close()``.  As with ``serialize()``, the
+        cached values must be picklable.
+
+        :param str filename: The snapshot file name
+        :param float sync_interval: The number of seconds in between writes
+        """
+        if self._log is not None:
+            raise ValueError("a log is already open")
+        elif not sync_interval or sync_interval <= 0:
+            raise ValueError("sync_interval can only be a number > 0")
+
+        self._log = persistence.AppendLog(self, filename, sync_interval)
+        self._log.start()